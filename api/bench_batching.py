@@ -0,0 +1,103 @@
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+
+from fonc_batching import MicroBatcher
+from fonc_inference import parallel_predictor, synthetic_rows
+from fonc_model import LoadedModel, load_predictor, PREDICTORS
+
+
+#=====================================================================
+# HEADER COMMENT BLOCK
+#=====================================================================
+'''
+Benchmark of the micro-batching (fonc_batching.py) : concurrent clients in the process each predicting one row at a
+time, as the /predict requests do, with micro-batching disabled then enabled for several windows.
+Reports the throughput, the latency seen by the clients, the batch sizes and the queue wait.
+
+Usage : python bench_batching.py [--model flight_delay_pipeline.joblib] [--predictor auto]
+        [--clients 1 8 32] [--windows 0 2 5] [--max-rows 64] [--seconds 3] [--json results.json]
+'''
+
+
+def run_clients(batcher, served, rows, clients, seconds):
+    """Clients predicting one row at a time in a loop for a duration, return the latencies (in seconds)"""
+    latencies = [[] for _ in range(clients)]
+    stop = time.perf_counter() + seconds
+
+    def client(index):
+        i = index
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            batcher.predict(served, rows[i % len(rows)])
+            latencies[index].append(time.perf_counter() - start)
+            i += clients
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return np.concatenate([np.array(l) for l in latencies])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du micro-batching des prédictions")
+    parser.add_argument("--model", default="flight_delay_pipeline.joblib", help="Pipeline .joblib")
+    parser.add_argument("--predictor", default="auto", choices=PREDICTORS, help="Prédicteur servi")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32], help="Clients concurrents")
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 2, 5], help="Fenêtres testées (ms, 0 : désactivé)")
+    parser.add_argument("--max-rows", type=int, default=64, help="Lignes max par lot")
+    parser.add_argument("--seconds", type=float, default=3, help="Durée de chaque mesure")
+    parser.add_argument("--json", default=None, help="Fichier de sortie des résultats (JSON)")
+    args = parser.parse_args()
+
+    model = parallel_predictor(load_predictor(args.model, predictor=args.predictor))
+    served = LoadedModel(model, "bench", {})
+    rows = [synthetic_rows(model, 500, seed=1).iloc[[i]] for i in range(500)]
+
+    results = []
+    for clients in args.clients:
+        for window in args.windows:
+            batcher = MicroBatcher(window_ms=window, max_rows=args.max_rows)
+            latencies = run_clients(batcher, served, rows, clients, args.seconds)
+            stats = batcher.stats()
+            result = {
+                "clients": clients,
+                "window_ms": window,
+                "predictions_per_second": len(latencies) / args.seconds,
+                "latency_p50_ms": 1000 * float(np.percentile(latencies, 50)),
+                "latency_p95_ms": 1000 * float(np.percentile(latencies, 95)),
+                "mean_batch_rows": stats["mean_batch_rows"],
+                "queue_wait_p50_ms": stats["queue_wait_ms"]["p50"],
+                "batch_size_histogram": stats["batch_size_histogram"],
+            }
+            results.append(result)
+            print(f"{clients} client(s), fenêtre {window} ms : {result['predictions_per_second']:.0f} prédictions/s")
+
+    # REPORT
+    print("\n" + "=" * 86)
+    print(f"BENCHMARK MICRO-BATCHING (prédicteur {args.predictor}, max {args.max_rows} lignes / lot)")
+    print("=" * 86)
+    print(f"{'Clients':>8}{'Fenêtre ms':>12}{'Prédictions/s':>15}{'p50 ms':>9}{'p95 ms':>9}{'Lot moyen':>11}{'Attente p50 ms':>16}")
+    for r in results:
+        mean_batch = f"{r['mean_batch_rows']:.1f}" if r["mean_batch_rows"] else "-"
+        wait = f"{r['queue_wait_p50_ms']:.2f}" if r["queue_wait_p50_ms"] is not None else "-"
+        print(f"{r['clients']:>8}{r['window_ms']:>12g}{r['predictions_per_second']:>15.0f}{r['latency_p50_ms']:>9.2f}"
+              f"{r['latency_p95_ms']:>9.2f}{mean_batch:>11}{wait:>16}")
+    print("-" * 86)
+    for r in results:
+        if r["window_ms"]:
+            histogram = ", ".join(f"{k}: {v}" for k, v in r["batch_size_histogram"].items() if v)
+            print(f"Lots ({r['clients']} client(s), {r['window_ms']:g} ms) : {histogram}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
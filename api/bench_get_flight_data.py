@@ -0,0 +1,118 @@
+import argparse
+import json
+import time
+from collections import defaultdict
+
+import joblib
+import pandas as pd
+
+from fonc_get_flight_data import get_flight_data
+from fonc_http import configure_http, get_archive, set_reference_time, MODE_OFFLINE
+from fonc_negative_cache import set_negative_cache, NegativeCache
+
+
+#=====================================================================
+# HEADER COMMENT BLOCK
+#=====================================================================
+'''
+Benchmark of the API path (get_flight_data + prediction), fully offline.
+The Flightradar24 pages and Open-Meteo responses recorded with FLIGHT_DELAY_HTTP_MODE=record are replayed
+locally with an artificial latency per exchange. The stages are timed with the progress events of get_flight_data.
+
+Usage : python bench_get_flight_data.py --archive-dir DIR --flights AF1234:30/10/25 TK1822:31/10/25
+        [--latency-ms 80] [--repeat 3] [--model flight_delay_pipeline.joblib] [--json results.json]
+'''
+
+FLIGHT_URL_PREFIX = "https://www.flightradar24.com/data/flights/"
+
+
+def run_flight(flight_number, flight_date, model=None):
+    """Run the API path for one flight and return the duration of each stage (in seconds)"""
+    stage_seconds = {}
+    last = [time.perf_counter()]
+
+    def progress_callback(step, data=None):
+        now = time.perf_counter()
+        stage_seconds[step] = now - last[0]
+        last[0] = now
+
+    # REFERENCE TIME : "now" of the weather requests pinned on the fetch time of the recorded page
+    entry = get_archive().lookup(f"{FLIGHT_URL_PREFIX}{flight_number}")
+    set_reference_time(entry["fetched_at"] if entry else None)
+
+    flight_data = get_flight_data(flight_number, flight_date, progress_callback=progress_callback)
+    if flight_data is None:
+        return None
+
+    if model is not None:
+        features_dict, _ = flight_data
+        start = time.perf_counter()
+        df = pd.DataFrame([features_dict]).reindex(columns=model.feature_names_in_)
+        model.predict(df)
+        stage_seconds["prediction"] = time.perf_counter() - start
+
+    return stage_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hors ligne du chemin API (données de vol + prédiction)")
+    parser.add_argument("--archive-dir", required=True, help="Archive enregistrée (FLIGHT_DELAY_HTTP_MODE=record)")
+    parser.add_argument("--flights", nargs="+", required=True, help="Vols à rejouer, au format CODE:JJ/MM/AA")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latence artificielle par échange rejoué")
+    parser.add_argument("--repeat", type=int, default=1, help="Nombre de passages sur les vols")
+    parser.add_argument("--model", default=None, help="Pipeline .joblib pour inclure l'étape de prédiction")
+    parser.add_argument("--json", default=None, help="Fichier de sortie des résultats (JSON)")
+    args = parser.parse_args()
+
+    # REPLAY : Archive served locally, negative cache disabled (same work for each pass)
+    configure_http(MODE_OFFLINE, args.archive_dir, args.latency_ms)
+    set_negative_cache(NegativeCache(path=None, ttl_hours=0))
+    model = joblib.load(args.model) if args.model else None
+
+    totals = defaultdict(float)
+    latencies = []
+    failures = 0
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for flight in args.flights:
+            flight_number, flight_date = flight.split(":", 1)
+            stage_seconds = run_flight(flight_number, flight_date, model)
+            if stage_seconds is None:
+                failures += 1
+                continue
+            for stage, seconds in stage_seconds.items():
+                totals[stage] += seconds
+            latencies.append(sum(stage_seconds.values()))
+    total_seconds = time.perf_counter() - start
+
+    # REPORT
+    num = len(latencies)
+    print("\n" + "=" * 60)
+    print(f"BENCHMARK API (replay, latence {args.latency_ms} ms / échange)")
+    print("=" * 60)
+    if not num:
+        print(f"Aucun vol traité ({failures} échec(s))")
+        return
+    print(f"{'Etape':<18}{'ms / vol':>12}{'Part':>8}")
+    for stage, seconds in totals.items():
+        print(f"{stage:<18}{1000 * seconds / num:>12.1f}{seconds / sum(totals.values()):>8.1%}")
+    print("-" * 60)
+    latencies.sort()
+    print(f"Vols : {num}  |  Echecs : {failures}  |  Durée : {total_seconds:.2f} s  |  Débit : {num / total_seconds:.2f} vols/s")
+    print(f"Latence p50 : {1000 * latencies[num // 2]:.1f} ms  |  max : {1000 * latencies[-1]:.1f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "flights": num,
+                "failures": failures,
+                "total_seconds": total_seconds,
+                "flights_per_second": num / total_seconds,
+                "stages_ms_per_flight": {s: 1000 * v / num for s, v in totals.items()},
+                "latency_p50_ms": 1000 * latencies[num // 2],
+                "latency_max_ms": 1000 * latencies[-1],
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
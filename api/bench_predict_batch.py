@@ -0,0 +1,171 @@
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import joblib
+import msgpack
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from fonc_batch_formats import JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, ARROW_MEDIA_TYPE
+from fonc_inference import synthetic_rows
+
+
+#=====================================================================
+# HEADER COMMENT BLOCK
+#=====================================================================
+'''
+Benchmark of the offline scoring through the API : the same rows scored by one /predict call per row, then by
+/predict-batch calls of several sizes (one vectorized validation and one predict per call) in each request format
+(JSON items, columnar JSON, MessagePack columns, Arrow IPC), over one keep-alive HTTP connection to a local
+uvicorn server.
+Reports the throughput (rows/s) of each mode and checks that the batch predictions are the single ones.
+
+Usage : python bench_predict_batch.py [--model flight_delay_pipeline.joblib] [--input rows.csv] [--rows 10000]
+        [--batch-sizes 10000 1000 100] [--formats items columns msgpack arrow] [--json results.json]
+'''
+
+
+def start_server(model_path, port, boot_timeout=600):
+    """Start uvicorn on the API and wait until /ready answers 200"""
+    env = dict(os.environ, FLIGHT_DELAY_MODEL_PATH=os.path.abspath(model_path))
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                              cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    deadline = time.perf_counter() + boot_timeout
+    while time.perf_counter() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            connection.request("GET", "/ready")
+            if connection.getresponse().status == 200:
+                return server
+        except OSError:
+            pass
+        if server.poll() is not None:
+            raise RuntimeError("Le serveur s'est arrêté au démarrage")
+        time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("Modèle non prêt dans le délai")
+
+
+def post(connection, path, body, media_type=JSON_MEDIA_TYPE):
+    """POST a body on a keep-alive connection, return the raw answer"""
+    connection.request("POST", path, body=body, headers={"Content-Type": media_type})
+    response = connection.getresponse()
+    answer = response.read()
+    if response.status != 200:
+        raise RuntimeError(f"{path} : HTTP {response.status} {answer[:200]!r}")
+    return answer
+
+
+def arrow_stream(df):
+    """Arrow IPC stream of a DataFrame"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+# FORMATS : Encoding of a chunk of rows (DataFrame) and decoding of the predictions of the answer
+FORMATS = {
+    "items": (
+        JSON_MEDIA_TYPE,
+        lambda df: json.dumps({"items": json.loads(df.to_json(orient="records"))}),
+        lambda answer: [r.get("predicted_delay_min", np.nan) for r in json.loads(answer)["results"]],
+    ),
+    "columns": (
+        JSON_MEDIA_TYPE,
+        lambda df: json.dumps({"columns": {c: df[c].tolist() for c in df.columns}}),
+        lambda answer: json.loads(answer)["predicted_delay_min"],
+    ),
+    "msgpack": (
+        MSGPACK_MEDIA_TYPE,
+        lambda df: msgpack.packb({"columns": {c: df[c].tolist() for c in df.columns}}),
+        lambda answer: msgpack.unpackb(answer)["predicted_delay_min"],
+    ),
+    "arrow": (
+        ARROW_MEDIA_TYPE,
+        arrow_stream,
+        lambda answer: pa.ipc.open_stream(answer).read_all().column("predicted_delay_min").to_numpy(zero_copy_only=False),
+    ),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de /predict-batch contre des appels /predict unitaires")
+    parser.add_argument("--model", default="flight_delay_pipeline.joblib", help="Pipeline .joblib servi")
+    parser.add_argument("--input", default=None, help="CSV de lignes d'entrée (défaut : lignes synthétiques)")
+    parser.add_argument("--rows", type=int, default=10000, help="Lignes scorées dans chaque mode")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[10000, 1000, 100], help="Tailles de lot testées")
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=list(FORMATS), help="Formats testés")
+    parser.add_argument("--port", type=int, default=8766, help="Port local du serveur de test")
+    parser.add_argument("--json", default=None, help="Fichier de sortie des résultats (JSON)")
+    args = parser.parse_args()
+
+    # ROWS : Input file resampled to the number of rows, or synthetic rows
+    pipeline = joblib.load(args.model)
+    if args.input:
+        rows = pd.read_csv(args.input, keep_default_na=False, na_values=[""])[list(pipeline.feature_names_in_)]
+        rows = rows.sample(args.rows, replace=len(rows) < args.rows, random_state=0).reset_index(drop=True)
+    else:
+        rows = synthetic_rows(pipeline, args.rows)
+    items = [json.dumps(item) for item in json.loads(rows.to_json(orient="records"))]
+    del pipeline
+
+    server = start_server(args.model, args.port)
+    try:
+        connection = http.client.HTTPConnection("127.0.0.1", args.port, timeout=600)
+        post(connection, "/predict", items[0])
+
+        # SINGLE : One /predict call per row
+        start = time.perf_counter()
+        single = np.array([json.loads(post(connection, "/predict", item))["predicted_delay_min"] for item in items])
+        results = [{"mode": "predict", "format": "json", "batch_size": 1, "calls": len(items),
+                    "seconds": time.perf_counter() - start, "max_abs_diff": 0.0}]
+        print(f"/predict unitaire : {results[0]['seconds']:.2f} s")
+
+        # BATCH : Rows cut in /predict-batch calls, encoding and decoding by the client included
+        for name in args.formats:
+            media_type, encode, decode = FORMATS[name]
+            for size in args.batch_sizes:
+                start = time.perf_counter()
+                predictions = []
+                for offset in range(0, len(rows), size):
+                    body = encode(rows.iloc[offset:offset + size])
+                    predictions.extend(decode(post(connection, "/predict-batch", body, media_type)))
+                seconds = time.perf_counter() - start
+                diff = float(np.nanmax(np.abs(np.array(predictions, dtype=float) - single)))
+                results.append({"mode": "predict-batch", "format": name, "batch_size": size,
+                                "calls": -(-len(rows) // size), "seconds": seconds, "max_abs_diff": diff})
+                print(f"/predict-batch {name} par {size} : {seconds:.2f} s (écart max {diff:.1e} min)")
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(60)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    # REPORT
+    print("\n" + "=" * 81)
+    print(f"BENCHMARK SCORING PAR LOT ({len(items)} lignes, {os.path.basename(args.model)})")
+    print("=" * 81)
+    print(f"{'Mode':<16}{'Format':<9}{'Taille lot':>11}{'Appels':>9}{'Durée s':>10}{'Lignes/s':>11}{'Gain':>8}"
+          f"{'Ecart min':>11}")
+    for r in results:
+        r["rows_per_second"] = len(items) / r["seconds"]
+        print(f"{r['mode']:<16}{r['format']:<9}{r['batch_size']:>11}{r['calls']:>9}{r['seconds']:>10.2f}"
+              f"{r['rows_per_second']:>11.0f}{results[0]['seconds'] / r['seconds']:>7.1f}x{r['max_abs_diff']:>11.1e}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
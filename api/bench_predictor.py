@@ -0,0 +1,102 @@
+import argparse
+import json
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from fonc_compiled_forest import AutoPredictor, compile_pipeline, check_compiled, COMPILED_TOLERANCE_MIN
+from fonc_inference import ParallelPredictor, single_threaded, synthetic_rows, INFERENCE_THREADS
+
+
+#=====================================================================
+# HEADER COMMENT BLOCK
+#=====================================================================
+'''
+Benchmark of the predictors of the API : scikit-learn pipeline, compiled predictor (fonc_compiled_forest.py, from a
+DataFrame and from a plain 2-D array), "auto" mode and the predictor served by the API ("auto" at n_jobs=1 on the
+bounded inference pool, cut-over calibrated : fonc_inference.py), for batch sizes 1 to 10,000.
+The compiled predictor is first checked against the pipeline on every row used.
+
+Usage : python bench_predictor.py [--model flight_delay_pipeline.joblib] [--input rows.csv]
+        [--sizes 1 10 100 1000 10000] [--single-threaded] [--threads 4] [--json results.json]
+'''
+
+
+def time_call(function, min_seconds=0.5, max_repeat=200):
+    """Median duration (in seconds) of a call, repeated for at least min_seconds"""
+    durations = []
+    start = time.perf_counter()
+    while len(durations) < 3 or (time.perf_counter() - start < min_seconds and len(durations) < max_repeat):
+        t = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - t)
+    return float(np.median(durations))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des prédicteurs (scikit-learn, compilé, auto)")
+    parser.add_argument("--model", default="flight_delay_pipeline.joblib", help="Pipeline .joblib")
+    parser.add_argument("--input", default=None, help="CSV de lignes d'entrée (défaut : lignes synthétiques)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000], help="Tailles de lot")
+    parser.add_argument("--single-threaded", action="store_true", help="Pipeline forcé à n_jobs=1 (comme dans l'API)")
+    parser.add_argument("--threads", type=int, default=INFERENCE_THREADS, help="Threads du pool d'inférence servi")
+    parser.add_argument("--json", default=None, help="Fichier de sortie des résultats (JSON)")
+    args = parser.parse_args()
+
+    pipeline = single_threaded(joblib.load(args.model)) if args.single_threaded else joblib.load(args.model)
+    start = time.perf_counter()
+    compiled = compile_pipeline(pipeline)
+    compile_seconds = time.perf_counter() - start
+    auto = AutoPredictor(pipeline, compiled)
+    served = ParallelPredictor(AutoPredictor(joblib.load(args.model), compiled), threads=args.threads)
+
+    # ROWS : Input file resampled to the largest batch, or synthetic rows
+    max_rows = max(args.sizes)
+    if args.input:
+        rows = pd.read_csv(args.input, keep_default_na=False, na_values=[""])[list(pipeline.feature_names_in_)]
+        rows = rows.sample(max_rows, replace=len(rows) < max_rows, random_state=0).reset_index(drop=True)
+    else:
+        rows = synthetic_rows(compiled, max_rows)
+
+    # CHECK : Same predictions as scikit-learn
+    diff = check_compiled(pipeline, compiled, rows)
+    if diff > COMPILED_TOLERANCE_MIN:
+        raise SystemExit(f"Prédicteur compilé différent de scikit-learn (écart max {diff:.2e} min)")
+    served.calibrate(rows)
+    print(f"Pool d'inférence : {served.threads} thread(s), découpage à partir de {served.min_rows} ligne(s)")
+
+    results = []
+    for size in args.sizes:
+        batch = rows.head(size)
+        array = batch.to_numpy(dtype=object)
+        timings = {
+            "sklearn": time_call(lambda: pipeline.predict(batch)),
+            "compiled": time_call(lambda: compiled.predict(batch)),
+            "compiled_array": time_call(lambda: compiled.predict(array)),
+            "auto": time_call(lambda: auto.predict(batch)),
+            "served": time_call(lambda: served.predict(batch)),
+        }
+        results.append({"rows": size, **{f"{k}_ms": 1000 * v for k, v in timings.items()}})
+        print(f"{size} ligne(s) : " + " | ".join(f"{k} {1000 * v:.2f} ms" for k, v in timings.items()))
+
+    # REPORT
+    print("\n" + "=" * 84)
+    print(f"BENCHMARK PREDICTEURS ({compiled.n_trees} arbres, {len(compiled.left)} noeuds, "
+          f"compilation {compile_seconds:.2f} s, écart max {diff:.1e} min)")
+    print("=" * 84)
+    print(f"{'Lignes':>8}{'sklearn ms':>13}{'compilé ms':>13}{'compilé array':>15}{'auto ms':>11}{'servi ms':>11}"
+          f"{'gain compilé':>14}")
+    for r in results:
+        print(f"{r['rows']:>8}{r['sklearn_ms']:>13.2f}{r['compiled_ms']:>13.2f}{r['compiled_array_ms']:>15.2f}"
+              f"{r['auto_ms']:>11.2f}{r['served_ms']:>11.2f}{r['sklearn_ms'] / r['compiled_ms']:>13.1f}x")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"compile_seconds": compile_seconds, "max_abs_diff": diff, "inference": served.describe(),
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+
+#=====================================================================
+# HEADER COMMENT BLOCK
+#=====================================================================
+'''
+Benchmark of the multi-worker serving (gunicorn.conf.py) : boot time and resident memory of the host
+for 1, 2, 4 and 8 workers, in three modes :
+    per_worker   : each worker imports main.py and loads its own copy of the model (no preload)
+    preload      : the master loads the model before forking, the workers share it copy-on-write
+    preload_mmap : same, arrays of the uncompressed artifact mapped from the OS page cache (joblib mmap_mode='r')
+Memory is read in /proc (Linux) : RSS counts the shared pages in every process, PSS splits them between
+the processes sharing them (sum = real memory of the host), USS is the memory private to each process.
+
+Usage : python bench_workers.py [--workers 1 2 4 8] [--modes per_worker preload preload_mmap]
+        [--model flight_delay_pipeline.joblib] [--requests 20] [--json results.json]
+'''
+
+MODES = {
+    "per_worker": {"FLIGHT_DELAY_API_PRELOAD": "0", "FLIGHT_DELAY_MODEL_MMAP": "0"},
+    "preload": {"FLIGHT_DELAY_API_PRELOAD": "1", "FLIGHT_DELAY_MODEL_MMAP": "0"},
+    "preload_mmap": {"FLIGHT_DELAY_API_PRELOAD": "1", "FLIGHT_DELAY_MODEL_MMAP": "1"},
+}
+
+# PAYLOAD : Example values of PredictionInput (warm-up requests of the workers)
+PAYLOAD = {
+    "DS_AIRLINE_CODE": "AF", "DS_DEPARTURE_AIRPORT_CODE": "CDG", "DS_ARRIVAL_AIRPORT_CODE": "NCE",
+    "DS_DEPARTURE_AIRPORT_TEMP_CEL": 15.5, "DS_DEPARTURE_AIRPORT_RAIN_MMHOUR": 0.0,
+    "DS_DEPARTURE_AIRPORT_WIND_KMH": 12.0, "DS_DEPARTURE_AIRPORT_VIS_KM": 10.0,
+    "DS_ARRIVAL_AIRPORT_TEMP_CEL": 18.2, "DS_ARRIVAL_AIRPORT_RAIN_MMHOUR": 0.2,
+    "DS_ARRIVAL_AIRPORT_WIND_KMH": 8.0, "DS_ARRIVAL_AIRPORT_VIS_KM": 9.5,
+    "DS_PREV_DELAY_MIN": 35, "DS_FLIGHT_DURATION_MIN": 90, "DS_AIRLINE_RATING_NORM": 0.75,
+    "DS_DEPARTURE_AIRPORT_RATING_NORM": 0.8, "DS_ARRIVAL_AIRPORT_RATING_NORM": 0.85,
+}
+
+# LOG : Lines counted to detect the end of the boot (workers started, model loaded in each worker or in the master)
+READY_LINE = "Application startup complete"
+MODEL_LOADED_LINE = "Modèle chargé"
+
+
+def process_memory_kb(pid):
+    """RSS, PSS and USS (in kB) of a process, from /proc/<pid>/smaps_rollup"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": values.get("Rss", 0),
+        "pss": values.get("Pss", 0),
+        "uss": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+    }
+
+
+def child_pids(pid):
+    """Direct children of a process (gunicorn workers of the master)"""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="utf-8") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # STAT : "pid (comm) state ppid ..." (comm may contain spaces)
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+            children.append(int(entry))
+    return children
+
+
+def run_case(mode, workers, port, model_path, requests_per_worker, boot_timeout=600):
+    """Start gunicorn in a mode, wait for every worker, warm them up and read the memory of the host"""
+    env = dict(os.environ, **MODES[mode],
+               FLIGHT_DELAY_API_WORKERS=str(workers),
+               FLIGHT_DELAY_API_BIND=f"127.0.0.1:{port}",
+               FLIGHT_DELAY_MODEL_PATH=os.path.abspath(model_path))
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+                              cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+
+    # BOOT : Time until every worker has completed its startup and the model is loaded (once in the master with preload)
+    ready = threading.Event()
+    booted = [0]
+    loaded = [0]
+    models_expected = 1 if MODES[mode]["FLIGHT_DELAY_API_PRELOAD"] == "1" else workers
+
+    def watch_log():
+        for line in server.stdout:
+            booted[0] += line.count(READY_LINE)
+            loaded[0] += line.count(MODEL_LOADED_LINE)
+            if booted[0] >= workers and loaded[0] >= models_expected:
+                ready.set()
+
+    threading.Thread(target=watch_log, daemon=True).start()
+    try:
+        if not ready.wait(boot_timeout):
+            raise RuntimeError(f"{mode} / {workers} worker(s) : démarrage incomplet ({booted[0]} prêt(s), {loaded[0]} modèle(s))")
+        boot_seconds = time.perf_counter() - start
+
+        # WARM-UP : Predictions spread on the workers (memory touched by the prediction path)
+        body = json.dumps(PAYLOAD).encode()
+        for _ in range(requests_per_worker * workers):
+            request = urllib.request.Request(f"http://127.0.0.1:{port}/predict", data=body,
+                                             headers={"Content-Type": "application/json"})
+            urllib.request.urlopen(request, timeout=60).read()
+
+        # MEMORY : Master + workers
+        pids = [server.pid] + child_pids(server.pid)
+        per_process = [process_memory_kb(pid) for pid in pids]
+        total = {k: sum(p[k] for p in per_process) / 1024 for k in ("rss", "pss", "uss")}
+        return {
+            "mode": mode,
+            "workers": workers,
+            "boot_seconds": boot_seconds,
+            "rss_mb": total["rss"],
+            "pss_mb": total["pss"],
+            "uss_mb": total["uss"],
+            "worker_uss_mb": sum(p["uss"] for p in per_process[1:]) / 1024 / max(1, len(per_process) - 1),
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(60)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du service multi-workers (démarrage et mémoire)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Nombres de workers testés")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES), help="Modes de chargement testés")
+    parser.add_argument("--model", default="flight_delay_pipeline.joblib", help="Pipeline .joblib servi")
+    parser.add_argument("--requests", type=int, default=20, help="Prédictions de chauffe par worker")
+    parser.add_argument("--port", type=int, default=8765, help="Port local des serveurs de test")
+    parser.add_argument("--json", default=None, help="Fichier de sortie des résultats (JSON)")
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes:
+        for workers in args.workers:
+            result = run_case(mode, workers, args.port, args.model, args.requests)
+            results.append(result)
+            print(f"{mode:<13} {workers} worker(s) : démarrage {result['boot_seconds']:.2f} s | PSS {result['pss_mb']:.0f} Mo")
+
+    # REPORT
+    print("\n" + "=" * 78)
+    print(f"BENCHMARK WORKERS ({os.path.basename(args.model)}, {os.path.getsize(args.model) / 2**20:.0f} Mo)")
+    print("=" * 78)
+    print(f"{'Mode':<14}{'Workers':>8}{'Démarrage s':>13}{'RSS Mo':>10}{'PSS Mo':>10}{'USS Mo':>10}{'USS/worker':>12}")
+    for r in results:
+        print(f"{r['mode']:<14}{r['workers']:>8}{r['boot_seconds']:>13.2f}{r['rss_mb']:>10.0f}"
+              f"{r['pss_mb']:>10.0f}{r['uss_mb']:>10.0f}{r['worker_uss_mb']:>12.1f}")
+    print("-" * 78)
+    print("RSS : pages partagées comptées dans chaque processus | PSS : mémoire réelle de l'hôte | USS : mémoire privée")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import json
+from collections import namedtuple
+
+import msgpack
+import numpy as np
+import pyarrow as pa
+
+
+#=====================================================================
+# HEADER COMMENT BLOCK
+#=====================================================================
+'''
+Request and response formats of /predict-batch, chosen by the Content-Type of the request :
+    application/json                    : {"items": [{feature: value}, ...]} (rows) or {"columns": {feature: [values]}}
+    application/msgpack                 : same two layouts, MessagePack encoded
+    application/vnd.apache.arrow.stream : Arrow IPC stream, one column per feature
+The columnar layouts reach the validation as one array per feature (no per-row object). The response uses the format
+and the layout of the request.
+'''
+
+# MEDIA TYPES : Content-Type of the request -> format (answered with the same Content-Type)
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+MEDIA_TYPES = {
+    JSON_MEDIA_TYPE: JSON_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE: MSGPACK_MEDIA_TYPE,
+    "application/x-msgpack": MSGPACK_MEDIA_TYPE,
+    ARROW_MEDIA_TYPE: ARROW_MEDIA_TYPE,
+}
+
+# LAYOUTS : One object per item, or one array per feature
+LAYOUT_ROWS = "items"
+LAYOUT_COLUMNS = "columns"
+
+# BATCH : Decoded body (items for the rows layout, columns and their common length for the columnar layouts)
+BatchRequest = namedtuple("BatchRequest", ["media_type", "layout", "items", "columns", "rows"])
+
+
+class BatchFormatError(ValueError):
+    """Body not readable in its declared format"""
+
+
+def batch_media_type(content_type):
+    """Format of a Content-Type header (parameters such as charset ignored), None if not supported"""
+    return MEDIA_TYPES.get((content_type or JSON_MEDIA_TYPE).split(";")[0].strip().lower())
+
+
+def _decode_document(document, media_type):
+    """Rows or columnar layout of a decoded JSON / MessagePack document"""
+    if not isinstance(document, dict) or (LAYOUT_ROWS in document) == (LAYOUT_COLUMNS in document):
+        raise BatchFormatError(f"Objet attendu avec une clé '{LAYOUT_ROWS}' ou '{LAYOUT_COLUMNS}'")
+    if LAYOUT_ROWS in document:
+        return BatchRequest(media_type, LAYOUT_ROWS, document[LAYOUT_ROWS], None, None)
+    columns = document[LAYOUT_COLUMNS]
+    if not isinstance(columns, dict) or not all(isinstance(v, list) for v in columns.values()):
+        raise BatchFormatError(f"'{LAYOUT_COLUMNS}' doit associer chaque variable à une liste de valeurs")
+    lengths = {len(v) for v in columns.values()}
+    if len(lengths) > 1:
+        raise BatchFormatError("Colonnes de longueurs différentes")
+    return BatchRequest(media_type, LAYOUT_COLUMNS, None, columns, lengths.pop() if lengths else 0)
+
+
+def _decode_arrow(body):
+    """Columns of an Arrow IPC stream as NumPy arrays (dictionary-encoded columns decoded, nulls as NaN / None)"""
+    table = pa.ipc.open_stream(body).read_all()
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        if pa.types.is_dictionary(column.type):
+            column = column.cast(column.type.value_type)
+        columns[name] = column.to_numpy(zero_copy_only=False)
+    return BatchRequest(ARROW_MEDIA_TYPE, LAYOUT_COLUMNS, None, columns, table.num_rows)
+
+
+def decode_batch(body, media_type):
+    """
+    PURPOSE :
+        Decode the body of a /predict-batch request
+    ARGS:
+        body (bytes) : Raw body
+        media_type (str) : Format of the body (batch_media_type)
+    RETURNS:
+        BatchRequest: Format, layout and content of the batch
+    """
+    try:
+        if media_type == ARROW_MEDIA_TYPE:
+            return _decode_arrow(body)
+        if media_type == MSGPACK_MEDIA_TYPE:
+            return _decode_document(msgpack.unpackb(body), media_type)
+        return _decode_document(json.loads(body), media_type)
+    except BatchFormatError:
+        raise
+    except Exception as e:
+        raise BatchFormatError(f"Corps illisible ({media_type}) : {e}") from e
+
+
+def encode_results(batch, predictions, errors, summary):
+    """
+    PURPOSE :
+        Encode the results of a batch in the format and the layout of its request
+    ARGS:
+        batch (BatchRequest) : Decoded request
+        predictions (ndarray) : Prediction of every row (NaN for the rejected rows)
+        errors (dict) : Position of a rejected row -> its validation errors
+        summary (dict) : model_version, items, predicted, rejected
+    RETURNS:
+        bytes: Body of the response
+    """
+    # ARROW : predicted_delay_min (null if rejected) and errors (JSON text, null if predicted), summary in metadata
+    if batch.media_type == ARROW_MEDIA_TYPE:
+        rejected = np.isnan(predictions)
+        error_texts = [json.dumps(errors[i], ensure_ascii=False) if i in errors else None for i in range(len(predictions))]
+        table = pa.table({
+            "predicted_delay_min": pa.array(predictions, mask=rejected, type=pa.float64()),
+            "errors": pa.array(error_texts, type=pa.string()),
+        }).replace_schema_metadata({k: json.dumps(v) for k, v in summary.items()})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    values = predictions.astype(object)
+    values[np.isnan(predictions)] = None
+    values = values.tolist()
+    if batch.layout == LAYOUT_ROWS:
+        results = [{"errors": errors[i]} if i in errors else {"predicted_delay_min": p} for i, p in enumerate(values)]
+        document = {**summary, "results": results}
+    else:
+        document = {**summary, "predicted_delay_min": values, "errors": {str(i): errors[i] for i in sorted(errors)}}
+    if batch.media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack.packb(document)
+    return json.dumps(document, ensure_ascii=False).encode()
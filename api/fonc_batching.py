@@ -0,0 +1,177 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+
+#=====================================================================
+# CONFIGURATION MICRO-BATCHING
+#=====================================================================
+
+# WINDOW : Rows of concurrent requests gathered for up to BATCH_WINDOW_MS after the first one, or until BATCH_MAX_ROWS
+# rows (window at 0 : micro-batching disabled, each request predicts its own rows)
+BATCH_WINDOW_MS = float(os.environ.get("FLIGHT_DELAY_BATCH_WINDOW_MS", 2))
+BATCH_MAX_ROWS = int(os.environ.get("FLIGHT_DELAY_BATCH_MAX_ROWS", 64))
+
+# STATS : Batch size buckets reported, number of recent waits kept for the percentiles
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+STATS_WINDOW = 10000
+
+
+class MicroBatcher:
+    """
+    PURPOSE :
+        Coalesce the predictions of concurrent requests : a collector thread gathers the rows queued during a short
+        window, runs one vectorized predict per served model (a hot-swap never mixes two versions in a batch) and
+        hands each caller its own predictions. The window is only waited while other callers are inside predict()
+        without being in the batch yet : a lone request is predicted at once
+    ARGS:
+        window_ms (float) : Time (in ms) a batch waits for other rows after its first one (0 : disabled)
+        max_rows (int) : Rows after which a batch is predicted without waiting for the end of the window
+    """
+
+    def __init__(self, window_ms=BATCH_WINDOW_MS, max_rows=BATCH_MAX_ROWS):
+        self.window_ms = window_ms
+        self.max_rows = max_rows
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_pid = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self.reset_stats()
+
+    @property
+    def enabled(self):
+        return self.window_ms > 0 and self.max_rows > 1
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.batches = 0
+            self.rows = 0
+            self.requests = 0
+            self.predict_seconds = 0.0
+            self.size_counts = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS + (None,)}
+            self.waits = deque(maxlen=STATS_WINDOW)
+
+    def _ensure_thread(self):
+        # FORK : Threads do not survive the fork of the gunicorn workers, one collector per process
+        with self._lock:
+            if self._thread is None or self._thread_pid != os.getpid() or not self._thread.is_alive():
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._collect, name="micro-batcher", daemon=True)
+                self._thread_pid = os.getpid()
+                self._thread.start()
+
+    def predict(self, served, X):
+        """
+        PURPOSE :
+            Predictions of the rows of one request, through the next batch (or directly if disabled)
+        ARGS:
+            served (LoadedModel) : Model captured by the request (pipeline, version, metadata)
+            X (DataFrame) : Rows of the request
+        RETURNS:
+            ndarray: Predictions of the rows, in order
+        """
+        if not self.enabled or len(X) >= self.max_rows:
+            return served.model.predict(X)
+        self._ensure_thread()
+        future = Future()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            self._queue.put((served, X, future, time.perf_counter()))
+            return future.result()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _collect(self):
+        while True:
+            items = [self._queue.get()]
+            rows = len(items[0][1])
+            deadline = items[0][3] + self.window_ms / 1000
+            while rows < self.max_rows:
+                # DRAIN : Rows already queued are always taken, the window is only waited for callers still coming
+                timeout = deadline - time.perf_counter()
+                try:
+                    if timeout <= 0 or len(items) >= self._in_flight:
+                        item = self._queue.get_nowait()
+                    else:
+                        item = self._queue.get(timeout=min(timeout, 0.0005))
+                except queue.Empty:
+                    if timeout <= 0 or len(items) >= self._in_flight:
+                        break
+                    continue
+                items.append(item)
+                rows += len(item[1])
+
+            # GROUPS : One predict per served model (identity of the LoadedModel captured by the requests)
+            groups = {}
+            for item in items:
+                groups.setdefault(id(item[0]), []).append(item)
+            for group in groups.values():
+                self._predict_group(group)
+
+    def _predict_group(self, group):
+        start = time.perf_counter()
+        served = group[0][0]
+        try:
+            X = pd.concat([item[1] for item in group], ignore_index=True) if len(group) > 1 else group[0][1]
+            predictions = np.asarray(served.model.predict(X))
+        except Exception as e:
+            if len(group) == 1:
+                group[0][2].set_exception(e)
+                return
+            # ISOLATION : Rows of a request rejected by the model do not fail the other requests of the batch
+            for item in group:
+                self._predict_group([item])
+            return
+        end = time.perf_counter()
+        offset = 0
+        for _, X, future, _ in group:
+            future.set_result(predictions[offset:offset + len(X)])
+            offset += len(X)
+        self._record(group, offset, start, end)
+
+    def _record(self, group, rows, start, end):
+        bucket = next((b for b in BATCH_SIZE_BUCKETS if rows <= b), None)
+        with self._stats_lock:
+            self.batches += 1
+            self.rows += rows
+            self.requests += len(group)
+            self.predict_seconds += end - start
+            self.size_counts[bucket] += 1
+            self.waits.extend(start - item[3] for item in group)
+
+    def stats(self):
+        """Batch size distribution, queue wait and predict time, reported by /inference-stats"""
+        with self._stats_lock:
+            waits = np.array(self.waits) * 1000
+            labels = {b: f"<={b}" for b in BATCH_SIZE_BUCKETS}
+            labels[None] = f">{BATCH_SIZE_BUCKETS[-1]}"
+            return {
+                "enabled": self.enabled,
+                "window_ms": self.window_ms,
+                "max_rows": self.max_rows,
+                "batches": self.batches,
+                "requests": self.requests,
+                "rows": self.rows,
+                "mean_batch_rows": self.rows / self.batches if self.batches else None,
+                "batch_size_histogram": {labels[b]: n for b, n in self.size_counts.items()},
+                "queue_wait_ms": {
+                    "p50": float(np.percentile(waits, 50)) if waits.size else None,
+                    "p95": float(np.percentile(waits, 95)) if waits.size else None,
+                    "max": float(waits.max()) if waits.size else None,
+                },
+                "predict_ms_per_batch": 1000 * self.predict_seconds / self.batches if self.batches else None,
+            }
+
+
+# BATCHER : Shared by the prediction endpoints of the process
+micro_batcher = MicroBatcher()
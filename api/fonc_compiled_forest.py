@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder
+
+from fonc_model_registry import file_sha256
+
+
+#=====================================================================
+# HEADER COMMENT BLOCK
+#=====================================================================
+'''
+Compiled predictor of the pipeline (OneHotEncoder + RandomForest) for the API.
+The trees are flattened into contiguous NumPy arrays (feature, threshold, children, value), traversed for all trees
+(and all rows) at once. The one-hot step is replaced by a category -> column lookup : a node testing a one-hot column
+compares the code of the category of its block instead of reading a wide 0/1 matrix.
+Same decisions as scikit-learn : inputs cast to float32 before the comparisons, NaN sent to the side learnt at training.
+
+Usage : python fonc_compiled_forest.py --model flight_delay_pipeline.joblib --output flight_delay_compiled.npz
+        [--check sample.csv]
+'''
+
+# ARTIFACT : Default name of the compiled predictor next to the joblib artifact
+COMPILED_NAME = "flight_delay_compiled.npz"
+
+# CHECK : Tolerance (in minutes) between the compiled predictor and scikit-learn
+COMPILED_TOLERANCE_MIN = 1e-6
+
+# AUTO : Largest batch predicted by the compiled predictor in "auto" mode (pipeline beyond, see bench_predictor.py)
+COMPILED_MAX_ROWS = int(os.environ.get("FLIGHT_DELAY_COMPILED_MAX_ROWS", 100))
+
+TREE_LEAF = -1
+
+
+def compiled_path(artifact_path):
+    """Path of the compiled predictor associated to a joblib artifact (same directory)"""
+    return os.path.join(os.path.dirname(artifact_path), COMPILED_NAME)
+
+
+def load_compiled(artifact_path, artifact_sha256=None):
+    """
+    PURPOSE :
+        Compiled predictor exported next to a joblib artifact, only if it was compiled from this artifact
+        (SHA-256 stored in the export) : an export left by a previous model is ignored
+    ARGS:
+        artifact_path (str) : joblib artifact of the pipeline
+        artifact_sha256 (str) : SHA-256 of the artifact (computed if not given)
+    RETURNS:
+        CompiledForest: Compiled predictor, or None if missing or compiled from another artifact
+    """
+    exported = compiled_path(artifact_path)
+    if not os.path.exists(exported):
+        return None
+    compiled = CompiledForest.load(exported)
+    if compiled.source_sha256 != (artifact_sha256 or file_sha256(artifact_path)):
+        print(f"⚠️ '{exported}' compilé depuis un autre artefact que '{artifact_path}' : ignoré, compilation au chargement")
+        return None
+    return compiled
+
+
+class CompiledForest:
+    """
+    PURPOSE :
+        Forest of regression trees in flat arrays, with the lookup of the categories of the one-hot step.
+        Row encoding : one column per categorical input (column index of its category in the one-hot output, -1 if
+        unknown) followed by the numeric inputs (float32 values)
+    ARGS:
+        feature_names (list) : Input columns of the pipeline, in order
+        categories (dict) : Categorical input -> {category: column index in the output of the preprocessing}
+        arrays (dict) : feature, threshold, left, right, value, missing_left, is_cat, cat_code, roots
+        source_sha256 (str) : SHA-256 of the joblib artifact compiled (stored in the export)
+    """
+
+    ARRAYS = ["feature", "threshold", "left", "right", "value", "missing_left", "is_cat", "cat_code", "roots"]
+
+    def __init__(self, feature_names, categories, arrays, source_sha256=None):
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.categories = categories
+        self.source_sha256 = source_sha256
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.cat_inputs = [i for i, c in enumerate(feature_names) if c in categories]
+        self.num_inputs = [i for i, c in enumerate(feature_names) if c not in categories]
+        self.n_trees = len(self.roots)
+
+    def encode(self, X):
+        """
+        PURPOSE :
+            Encode rows of inputs (DataFrame, 2-D array or one feature vector, columns in feature_names_in_ order)
+        RETURNS:
+            ndarray: Encoded rows (n_rows, n_categorical + n_numeric), float64
+        """
+        if isinstance(X, pd.DataFrame):
+            X = X[list(self.feature_names_in_)].to_numpy(dtype=object)
+        else:
+            X = np.asarray(X, dtype=object)
+            if X.ndim == 1:
+                X = X.reshape(1, -1)
+        if X.shape[1] != len(self.feature_names_in_):
+            raise ValueError(f"{X.shape[1]} colonnes reçues, {len(self.feature_names_in_)} attendues")
+        encoded = np.empty((X.shape[0], len(self.cat_inputs) + len(self.num_inputs)), dtype=np.float64)
+        for j, i in enumerate(self.cat_inputs):
+            lookup = self.categories[self.feature_names_in_[i]]
+            encoded[:, j] = [lookup.get(v, -1) for v in X[:, i]]
+        # FLOAT32 : Inputs of the trees cast as scikit-learn does before comparing them to the thresholds
+        encoded[:, len(self.cat_inputs):] = X[:, self.num_inputs].astype(np.float32)
+        return encoded
+
+    def predict_encoded(self, encoded):
+        """Mean of the leaf values of every tree, for encoded rows"""
+        n = encoded.shape[0]
+        node = np.tile(self.roots, n)
+        row = np.repeat(np.arange(n), self.n_trees)
+        active = np.flatnonzero(self.left[node] != TREE_LEAF)
+        while active.size:
+            current = node[active]
+            values = encoded[row[active], self.feature[current]]
+            # ONE-HOT : Value of the column tested = 1 if the category of the block is the column of the node
+            values = np.where(self.is_cat[current], values == self.cat_code[current], values)
+            go_left = np.where(np.isnan(values), self.missing_left[current], values <= self.threshold[current])
+            node[active] = np.where(go_left, self.left[current], self.right[current])
+            active = active[self.left[node[active]] != TREE_LEAF]
+        return self.value[node].reshape(n, self.n_trees).mean(axis=1)
+
+    def predict(self, X):
+        """Predictions for a DataFrame, a 2-D array or one feature vector (same interface as the pipeline)"""
+        return self.predict_encoded(self.encode(X))
+
+    def save(self, path):
+        """Write the compiled predictor (uncompressed npz)"""
+        np.savez(path, feature_names=json.dumps(list(self.feature_names_in_)), categories=json.dumps(self.categories),
+                 source_sha256=self.source_sha256 or "", **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            source_sha256 = str(data["source_sha256"]) if "source_sha256" in data.files else ""
+            return cls(json.loads(str(data["feature_names"])), json.loads(str(data["categories"])),
+                       {name: data[name] for name in cls.ARRAYS}, source_sha256 or None)
+
+
+class AutoPredictor:
+    """
+    PURPOSE :
+        Compiled predictor for the small batches (no pandas / ColumnTransformer / joblib overhead per call), pipeline
+        for the large ones (compiled traversal in NumPy slower than the C loops of scikit-learn beyond a few hundred rows)
+    ARGS:
+        pipeline (Pipeline) : Fitted scikit-learn pipeline
+        compiled (CompiledForest) : Compiled predictor of the same pipeline
+        max_rows (int) : Largest batch predicted by the compiled predictor
+    """
+
+    def __init__(self, pipeline, compiled, max_rows=COMPILED_MAX_ROWS):
+        self.pipeline = pipeline
+        self.compiled = compiled
+        self.max_rows = max_rows
+        self.feature_names_in_ = compiled.feature_names_in_
+
+    def predict(self, X):
+        if np.ndim(X) == 1 or len(X) <= self.max_rows:
+            return self.compiled.predict(X)
+        if not isinstance(X, pd.DataFrame):
+            X = pd.DataFrame(X, columns=list(self.feature_names_in_))
+        return self.pipeline.predict(X)
+
+
+def _input_columns(columns, feature_names):
+    """Input columns of a transformer (names, positions or boolean mask) as names"""
+    if isinstance(columns, str):
+        columns = [columns]
+    columns = list(columns)
+    if columns and isinstance(columns[0], (bool, np.bool_)):
+        return [feature_names[i] for i, keep in enumerate(columns) if keep]
+    return [feature_names[c] if isinstance(c, (int, np.integer)) else c for c in columns]
+
+
+def compile_pipeline(pipeline):
+    """
+    PURPOSE :
+        Compile a fitted pipeline (ColumnTransformer of OneHotEncoder / passthrough columns + forest of regression
+        trees) into a CompiledForest
+    ARGS:
+        pipeline (Pipeline) : Fitted scikit-learn pipeline
+    RETURNS:
+        CompiledForest: Compiled predictor
+    """
+    preprocessor, regressor = pipeline.steps[0][1], pipeline.steps[-1][1]
+    if len(pipeline.steps) != 2 or not isinstance(preprocessor, ColumnTransformer):
+        raise NotImplementedError("Pipeline attendu : ColumnTransformer puis forêt d'arbres")
+    feature_names = list(preprocessor.feature_names_in_)
+
+    # PREPROCESSING : Output column -> (position in the encoded row, one-hot column or not)
+    categories = {}
+    output_source = []
+    for name, transformer, columns in preprocessor.transformers_:
+        columns = _input_columns(columns, feature_names)
+        if transformer == "drop" or not columns:
+            continue
+        if isinstance(transformer, OneHotEncoder):
+            if transformer.drop_idx_ is not None or getattr(transformer, "_infrequent_enabled", False):
+                raise NotImplementedError("OneHotEncoder avec drop ou catégories rares non supporté")
+            for column, column_categories in zip(columns, transformer.categories_):
+                lookup = {}
+                for category in column_categories:
+                    lookup[category.item() if hasattr(category, "item") else category] = len(output_source)
+                    output_source.append(("cat", column))
+                categories[column] = lookup
+        elif transformer == "passthrough" or (isinstance(transformer, FunctionTransformer) and transformer.func is None):
+            for column in columns:
+                output_source.append(("num", column))
+        else:
+            raise NotImplementedError(f"Transformation non supportée : {name}")
+
+    # ROW ENCODING : Categorical inputs then numeric inputs, in the order of the pipeline inputs
+    cat_order = [c for c in feature_names if c in categories]
+    num_order = [c for c in feature_names if c not in categories]
+    position = {c: j for j, c in enumerate(cat_order)}
+    position.update({c: len(cat_order) + j for j, c in enumerate(num_order)})
+    source_position = np.array([position[c] for _, c in output_source], dtype=np.int64)
+    source_is_cat = np.array([kind == "cat" for kind, _ in output_source])
+    if len(output_source) != regressor.n_features_in_:
+        raise ValueError(f"{len(output_source)} colonnes après prétraitement, {regressor.n_features_in_} attendues")
+
+    # TREES : Concatenated, children as global node indices
+    trees = [e.tree_ for e in getattr(regressor, "estimators_", [regressor])]
+    if any(t.n_outputs != 1 for t in trees):
+        raise NotImplementedError("Régression à une seule sortie uniquement")
+    offsets = np.cumsum([0] + [t.node_count for t in trees])
+    left = np.concatenate([np.where(t.children_left == TREE_LEAF, TREE_LEAF, t.children_left + o)
+                           for t, o in zip(trees, offsets)]).astype(np.int64)
+    right = np.concatenate([np.where(t.children_right == TREE_LEAF, TREE_LEAF, t.children_right + o)
+                            for t, o in zip(trees, offsets)]).astype(np.int64)
+    output_feature = np.concatenate([np.maximum(t.feature, 0) for t in trees])
+    arrays = {
+        "feature": source_position[output_feature],
+        "threshold": np.concatenate([t.threshold for t in trees]).astype(np.float64),
+        "left": left,
+        "right": right,
+        "value": np.concatenate([t.value[:, 0, 0] for t in trees]).astype(np.float64),
+        "missing_left": np.concatenate([t.missing_go_to_left.astype(bool) for t in trees]),
+        "is_cat": source_is_cat[output_feature],
+        "cat_code": output_feature.astype(np.float64),
+        "roots": offsets[:-1].astype(np.int64),
+    }
+    return CompiledForest(feature_names, categories, arrays)
+
+
+def check_compiled(pipeline, compiled, X):
+    """Max absolute difference (in minutes) between the compiled predictor and the pipeline on rows X"""
+    return float(np.max(np.abs(compiled.predict(X) - pipeline.predict(X)), initial=0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compilation du pipeline en prédicteur à tableaux plats")
+    parser.add_argument("--model", default="flight_delay_pipeline.joblib", help="Pipeline .joblib à compiler")
+    parser.add_argument("--output", default=None, help=f"Prédicteur compilé (défaut : {COMPILED_NAME} à côté du modèle)")
+    parser.add_argument("--check", default=None, help="CSV de lignes pour comparer avec scikit-learn")
+    args = parser.parse_args()
+
+    pipeline = joblib.load(args.model)
+    compiled = compile_pipeline(pipeline)
+    compiled.source_sha256 = file_sha256(args.model)
+    if args.check:
+        X = pd.read_csv(args.check, keep_default_na=False, na_values=[""])[list(pipeline.feature_names_in_)]
+        diff = check_compiled(pipeline, compiled, X)
+        print(f"Ecart max avec scikit-learn sur {len(X)} lignes : {diff:.2e} min")
+        if diff > COMPILED_TOLERANCE_MIN:
+            raise SystemExit("Prédicteur compilé différent de scikit-learn, non exporté")
+    output = args.output or compiled_path(args.model)
+    compiled.save(output)
+    print(f"{compiled.n_trees} arbres, {len(compiled.left)} noeuds compilés sous '{output}'")
+
+
+if __name__ == "__main__":
+    main()
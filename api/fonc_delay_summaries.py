@@ -0,0 +1,78 @@
+import json
+import os
+
+
+#=====================================================================
+# CONFIGURATION DELAY SUMMARIES
+#=====================================================================
+
+# FILE : Summaries of the final delay per airline, airport and route (data_warehousing/dashboard_summaries.py --api-export)
+SUMMARIES_PATH = os.environ.get("FLIGHT_DELAY_SUMMARIES_PATH", "Data/Flight-delay_delay-summaries.json")
+
+# THRESHOLD : Minimum number of flights for a level to be trusted (else the next, broader level is used)
+MIN_FLIGHTS = int(os.environ.get("FLIGHT_DELAY_SUMMARIES_MIN_FLIGHTS", 30))
+
+# LEVELS : From the most specific to the broadest
+FALLBACK_LEVELS = ["route", "departure_airport", "airline", "arrival_airport", "all"]
+
+
+def load_summaries(path=SUMMARIES_PATH):
+    """
+    PURPOSE :
+        Load the delay summaries exported by the warehouse
+    ARGS:
+        path (str) : JSON file of the summaries
+    RETURNS:
+        dict | None : Summaries per level ({level: {value: {n, mean, min, max, p10, median, p90}}}), None if unavailable
+    """
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)["levels"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _level_key(level, airline, departure, arrival):
+    """Value of the flight for a level (None if a code is missing)"""
+    codes = {"airline": airline, "departure_airport": departure, "arrival_airport": arrival}
+    if level == "all":
+        return "*"
+    if level == "route":
+        if not (airline and departure and arrival):
+            return None
+        return f"{airline}-{departure}-{arrival}"
+    return codes[level] or None
+
+
+def fallback_delay(summaries, airline, departure, arrival, min_flights=MIN_FLIGHTS):
+    """
+    PURPOSE :
+        Historical delay of the most specific level with enough flights (route, then departure airport, airline,
+        arrival airport and all flights), used when the model cannot predict (missing features, model error)
+    ARGS:
+        summaries (dict) : Summaries returned by load_summaries
+        airline (str) : Airline code
+        departure (str) : Departure airport code
+        arrival (str) : Arrival airport code
+        min_flights (int) : Minimum number of flights of the level
+    RETURNS:
+        dict | None : Median delay of the level (predicted_delay_min), level, key, n, p10 and p90, None if no level matches
+    """
+    if not summaries:
+        return None
+    airline, departure, arrival = [str(c).strip().upper() if c else None for c in (airline, departure, arrival)]
+    best = None
+    for level in FALLBACK_LEVELS:
+        key = _level_key(level, airline, departure, arrival)
+        entry = summaries.get(level, {}).get(key) if key else None
+        if entry is None:
+            continue
+        result = {"predicted_delay_min": entry["median"], "level": level, "key": key,
+                  "n": entry["n"], "p10": entry["p10"], "p90": entry["p90"]}
+        if entry["n"] >= min_flights:
+            return result
+        # LAST RESORT : Keep the most specific level found if none reaches the threshold
+        best = best or result
+    return best
@@ -1,12 +1,13 @@
 import requests
 import pandas as pd
 import time
-import random
 import json
 from urllib.parse import urljoin
 import logging
 import numpy as np
 import os
+import queue
+import threading
 from bs4 import BeautifulSoup
 from datetime import datetime
 
@@ -17,6 +18,12 @@ from fonc_weather import weather_dep_temp, weather_dep_vis, weather_dep_wind, we
 from fonc_weather import weather_arr_temp, weather_arr_vis, weather_arr_wind, weather_arr_rain
 from fonc_flight_duration import flight_duration
 from fonc_prev_delay import prev_delay
+from fonc_negative_cache import get_negative_cache, OUTCOME_NO_DATA, OUTCOME_NOT_FOUND
+from fonc_http import http_session, pause
+
+
+# STREAM : Step of the last event of stream_flight_data (its data is the result of get_flight_data)
+FLIGHT_DATA_RESULT = "result"
 
 
 
@@ -42,6 +49,8 @@ def get_flight_data(flight_number: str, flight_date: str,progress_callback=None)
     ARGS:
         flight_number (str) : flight code
         flight_date (str) : flight date
+        progress_callback (callable) : Called as progress_callback(step, data) at the end of each stage (data : route
+        of the flight for "scraping_fr24", None for the other stages)
     RETURNS:
         dict : Data dict of the flight as input of the API for prediction    
     '''
@@ -57,6 +66,7 @@ def get_flight_data(flight_number: str, flight_date: str,progress_callback=None)
 
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
+    negative_cache = get_negative_cache()
 
 
     #=====================================================================
@@ -65,7 +75,7 @@ def get_flight_data(flight_number: str, flight_date: str,progress_callback=None)
 
     class SimpleFlightScraper:
             def __init__(self):
-                self.session = requests.Session()
+                self.session = http_session(requests.Session())
                 # Headers to look like a browser
                 self.session.headers.update({
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -81,9 +91,11 @@ def get_flight_data(flight_number: str, flight_date: str,progress_callback=None)
                 """Try to scrap flight data with requests/BeautifulSoup"""
                 try:
                     logger.info(f"Récupération de la page: {url}")
-                    time.sleep(random.uniform(2, 5))
+                    pause(2, 5)
 
                     response = self.session.get(url, timeout=15)
+                    if response.status_code in (404, 410):
+                        negative_cache.record_failure(url, OUTCOME_NOT_FOUND)
                     response.raise_for_status()
                     
                     soup = BeautifulSoup(response.content, 'html.parser')
@@ -109,6 +121,7 @@ def get_flight_data(flight_number: str, flight_date: str,progress_callback=None)
                         return self._extract_from_elements(flight_elements)
                     
                     logger.warning("Aucune donnée trouvée avec BeautifulSoup")
+                    negative_cache.record_failure(url, OUTCOME_NO_DATA)
                     return None
                     
                 except Exception as e:
@@ -232,6 +245,12 @@ def get_flight_data(flight_number: str, flight_date: str,progress_callback=None)
                     
                     # SCRAPING SOURCE : Injection of the flight code in the following url for data extraction
                     url = f"https://www.flightradar24.com/data/flights/{flight_number}"
+
+                    # NEGATIVE CACHE : Flight code without data recently, immediate "not found" without fetch
+                    cached_outcome = negative_cache.lookup(url)
+                    if cached_outcome:
+                        print(f"Vol {flight_number} introuvable : échec récent en cache ({cached_outcome})")
+                        return None
                 
                     print("=== Tentative avec l'approche simple (requests/BeautifulSoup) ===")
                     simple_scraper = SimpleFlightScraper()
@@ -244,8 +263,6 @@ def get_flight_data(flight_number: str, flight_date: str,progress_callback=None)
                         # TRANSFORM 1 : Dataframe creation
                         #--------------------
                         df_data_prov = pd.DataFrame(simple_data)
-                        if progress_callback:
-                            progress_callback("scraping_fr24")
 
             
                         #--------------------
@@ -326,6 +343,18 @@ def get_flight_data(flight_number: str, flight_date: str,progress_callback=None)
                         #--------------------
                         df_data_prov = df_data_prov[df_data_prov['ds_flight_date'] == flight_date]
 
+                        # ROUTE : Sent with the end of the scraping (shown by the client before the enrichment)
+                        if progress_callback and not df_data_prov.empty:
+                            first = df_data_prov.iloc[0]
+                            route = {
+                                "DS_DEPARTURE_AIRPORT_CODE": first["ds_departure_airport_code"],
+                                "DS_ARRIVAL_AIRPORT_CODE": first["ds_arrival_airport_code"],
+                                "DS_AIRLINE_CODE": flight_number.upper()[:2],
+                                "DS_DEPARTURE_AIRPORT": first["ds_departure_airport"],
+                                "DS_ARRIVAL_AIRPORT": first["ds_arrival_airport"],
+                            }
+                            progress_callback("scraping_fr24", {k: None if pd.isna(v) else v for k, v in route.items()})
+
 
                         #--------------------
                         # EXTRACT 2 : Extraction of airports coordinates (from csv)
@@ -335,7 +364,7 @@ def get_flight_data(flight_number: str, flight_date: str,progress_callback=None)
                         # Recherche coordonnées et creation des colonnes (ds_departure_airport_lat,ds_departure_airport_long,'ds_arrival_airport_longds_arrival_airport_long)
                         df_data_prov = airport_coordinate(df_data_prov, airport_coord_csv)
                         if progress_callback:
-                            progress_callback("extract_gps")
+                            progress_callback("extract_gps", None)
 
                         #--------------------
                         # EXTRACT 3 : Extraction of airports poncutality rating (from csv)
@@ -343,7 +372,7 @@ def get_flight_data(flight_number: str, flight_date: str,progress_callback=None)
                         airport_rating_csv = pd.read_csv("Data/Flight-delay_airports-ratings.csv", encoding="latin-1", sep=";" ) 
                         df_data_prov = airport_rating(df_data_prov, airport_rating_csv)
                         if progress_callback:
-                            progress_callback("extract_airports")
+                            progress_callback("extract_airports", None)
 
                         #--------------------
                         # EXTRACT 4 : Extraction of airlines poncutality rating (from csv)
@@ -351,7 +380,7 @@ def get_flight_data(flight_number: str, flight_date: str,progress_callback=None)
                         airline_rating_csv = pd.read_csv("Data/Flight-delay_airlines-ratings.csv", encoding="latin-1", sep=";" ) 
                         df_data_prov = airline_rating(df_data_prov, airline_rating_csv)
                         if progress_callback:
-                            progress_callback("extract_airline")
+                            progress_callback("extract_airline", None)
 
 
                         #--------------------
@@ -381,7 +410,7 @@ def get_flight_data(flight_number: str, flight_date: str,progress_callback=None)
                                                                                         row['ds_departure_airport_lat'],
                                                                                         row['ds_departure_airport_long']),axis=1)
                         if progress_callback:
-                            progress_callback("meteo_dep")
+                            progress_callback("meteo_dep", None)
                     
                       
                         df_data_prov['ds_arrival_airport_temp_cel'] = df_data_prov.apply(lambda row: weather_arr_temp(row['ds_flight_date'],
@@ -408,7 +437,7 @@ def get_flight_data(flight_number: str, flight_date: str,progress_callback=None)
                                                                                         row['ds_arrival_airport_long']),axis=1)
                     
                         if progress_callback:
-                            progress_callback("meteo_arr")
+                            progress_callback("meteo_arr", None)
                         
 
                         #--------------------
@@ -421,7 +450,7 @@ def get_flight_data(flight_number: str, flight_date: str,progress_callback=None)
                                                                                         row['ds_arrival_airport_long']),axis=1)
                                 
                         if progress_callback:
-                            progress_callback("calc_flighttime")  
+                            progress_callback("calc_flighttime", None)  
 
                         #--------------------
                         # TRANSFORM 4 : Previous delay calculation per flight
@@ -432,7 +461,7 @@ def get_flight_data(flight_number: str, flight_date: str,progress_callback=None)
                                                                                     row['ds_flight_code']),axis=1)
                         
                         if progress_callback:
-                            progress_callback("calc_prevdelay")
+                            progress_callback("calc_prevdelay", None)
 
                         #--------------------
                         # TRANSFORM 5 : Ratings normalization
@@ -518,7 +547,7 @@ def get_flight_data(flight_number: str, flight_date: str,progress_callback=None)
 
                         features_dict = df_data_prov[selected_cols].iloc[0].to_dict()
                         if progress_callback:
-                            progress_callback("data_prep")
+                            progress_callback("data_prep", None)
                 
                         
                         try:
@@ -546,3 +575,35 @@ def get_flight_data(flight_number: str, flight_date: str,progress_callback=None)
             
 
 
+def stream_flight_data(flight_number: str, flight_date: str):
+    '''
+    PURPOSE :
+        Run get_flight_data in a thread and yield its progress events as soon as each stage ends (instead of after
+        the whole scraping and enrichment)
+    ARGS:
+        flight_number (str) : flight code
+        flight_date (str) : flight date
+    RETURNS:
+        generator : (step, data) for each stage, then (FLIGHT_DATA_RESULT, result of get_flight_data)
+    '''
+    events = queue.Queue()
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = get_flight_data(flight_number, flight_date,
+                                                progress_callback=lambda step, data=None: events.put((step, data)))
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            events.put(None)
+
+    threading.Thread(target=run, name="flight-data", daemon=True).start()
+    while True:
+        event = events.get()
+        if event is None:
+            break
+        yield event
+    if "error" in outcome:
+        raise outcome["error"]
+    yield FLIGHT_DATA_RESULT, outcome.get("result")
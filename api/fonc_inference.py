@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+#=====================================================================
+# CONFIGURATION INFERENCE PARALLELISM
+#=====================================================================
+
+# THREADS : Inference threads of the process, shared by every request (bounded : no oversubscription of the CPU)
+INFERENCE_THREADS = int(os.environ.get("FLIGHT_DELAY_INFERENCE_THREADS", os.cpu_count() or 1))
+
+# CUT-OVER : Calibrated at load time by a micro-benchmark (FLIGHT_DELAY_INFERENCE_CALIBRATE=1), or fixed (0 : never split)
+INFERENCE_CALIBRATE = os.environ.get("FLIGHT_DELAY_INFERENCE_CALIBRATE", "1") == "1"
+PARALLEL_MIN_ROWS = int(os.environ.get("FLIGHT_DELAY_PARALLEL_MIN_ROWS", 0))
+
+# CALIBRATION : Batch sizes tried, gain required to split a batch (parallel time / single-thread time)
+CALIBRATION_SIZES = (64, 256, 1024, 4096)
+CALIBRATION_GAIN = 0.8
+CALIBRATION_REPEAT = 3
+
+
+def single_threaded(model):
+    """Force n_jobs=1 on every step of a scikit-learn pipeline (the n_jobs=-1 of the training travels with the
+    pickle : one row would spin up joblib threads on every core)"""
+    if hasattr(model, "get_params"):
+        params = {k: 1 for k, v in model.get_params().items() if k.endswith("n_jobs") and v not in (None, 1)}
+        if params:
+            model.set_params(**params)
+    for attribute in ("pipeline", "compiled"):
+        if hasattr(model, attribute):
+            single_threaded(getattr(model, attribute))
+    return model
+
+
+def input_categories(model):
+    """Categories known by the one-hot step of a predictor ({column: [categories]}), for synthetic rows"""
+    if hasattr(model, "categories"):
+        return {c: list(lookup) for c, lookup in model.categories.items()}
+    for attribute in ("compiled", "predictor"):
+        if hasattr(model, attribute):
+            return input_categories(getattr(model, attribute))
+    categories = {}
+    preprocessor = model.steps[0][1] if hasattr(model, "steps") else None
+    for _, transformer, columns in getattr(preprocessor, "transformers_", []):
+        if hasattr(transformer, "categories_"):
+            categories.update({c: list(v) for c, v in zip(columns, transformer.categories_)})
+    return categories
+
+
+def synthetic_rows(model, rows, seed=0):
+    """Rows drawn from the categories known by the model, numeric inputs around typical values"""
+    rng = np.random.default_rng(seed)
+    categories = input_categories(model)
+    data = {}
+    for column in model.feature_names_in_:
+        if column in categories:
+            data[column] = rng.choice(np.asarray(categories[column], dtype=object), rows)
+        else:
+            data[column] = rng.normal(20, 30, rows)
+    return pd.DataFrame(data)
+
+
+class ParallelPredictor:
+    """
+    PURPOSE :
+        Serving-side parallelism of the predictions : every call runs on a thread pool of the process bounded to
+        INFERENCE_THREADS (concurrent requests queue instead of oversubscribing the CPU); the batches of at least
+        min_rows rows are split in one chunk per thread, the smaller ones run in one task
+    ARGS:
+        predictor : Object with a predict(X) method (Pipeline, CompiledForest, AutoPredictor), forced to n_jobs=1
+        threads (int) : Size of the pool
+        min_rows (int) : Smallest batch split across the pool (None : never split)
+    """
+
+    def __init__(self, predictor, threads=INFERENCE_THREADS, min_rows=None):
+        self.predictor = single_threaded(predictor)
+        self.feature_names_in_ = predictor.feature_names_in_
+        self.threads = max(1, threads)
+        self.min_rows = min_rows
+        self.calibration = []
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        # FORK : Threads do not survive the fork of the gunicorn workers, one pool per process
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="inference")
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _run(self, X, chunks):
+        pool = self._get_pool()
+        if chunks <= 1:
+            return pool.submit(self.predictor.predict, X).result()
+        bounds = np.linspace(0, len(X), chunks + 1).astype(int)
+        parts = [X.iloc[a:b] if isinstance(X, pd.DataFrame) else X[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+        return np.concatenate(list(pool.map(self.predictor.predict, parts)))
+
+    def predict(self, X):
+        rows = 1 if np.ndim(X) == 1 else len(X)
+        split = self.min_rows is not None and self.threads > 1 and rows >= self.min_rows
+        return self._run(X, self.threads if split else 1)
+
+    def calibrate(self, rows=None, sizes=CALIBRATION_SIZES):
+        """
+        PURPOSE :
+            Micro-benchmark of the cut-over : smallest batch size for which the split across the pool is faster than
+            one thread by CALIBRATION_GAIN (never split with one thread, or if no size gains enough)
+        ARGS:
+            rows (DataFrame) : Input rows (default : synthetic rows from the categories of the model)
+            sizes (tuple) : Batch sizes tried, increasing
+        RETURNS:
+            int | None: Cut-over retained (min_rows)
+        """
+        self.calibration = []
+        if self.threads < 2:
+            self.min_rows = None
+            return None
+        rows = rows if rows is not None else synthetic_rows(self.predictor, max(sizes))
+        self.min_rows = None
+        for size in sizes:
+            batch = rows.head(size)
+            timings = {}
+            for label, chunks in (("single_ms", 1), ("parallel_ms", self.threads)):
+                durations = []
+                for _ in range(CALIBRATION_REPEAT):
+                    start = time.perf_counter()
+                    self._run(batch, chunks)
+                    durations.append(time.perf_counter() - start)
+                timings[label] = 1000 * min(durations)
+            self.calibration.append({"rows": size, **timings})
+            if timings["parallel_ms"] < CALIBRATION_GAIN * timings["single_ms"]:
+                self.min_rows = size
+                break
+        return self.min_rows
+
+    def describe(self):
+        """Parallelism settings reported by /ready"""
+        return {"threads": self.threads, "parallel_min_rows": self.min_rows, "calibration": self.calibration}
+
+
+def parallel_predictor(predictor, calibrate=INFERENCE_CALIBRATE):
+    """Wrap a predictor in a ParallelPredictor, with the cut-over calibrated or taken from the configuration"""
+    parallel = ParallelPredictor(predictor, min_rows=PARALLEL_MIN_ROWS or None)
+    if calibrate:
+        parallel.calibrate()
+    return parallel
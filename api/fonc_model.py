@@ -0,0 +1,266 @@
+import os
+import threading
+import time
+from collections import namedtuple
+
+import joblib
+
+from fonc_model_registry import ModelRegistry, file_sha256
+from fonc_compiled_forest import AutoPredictor, compile_pipeline, load_compiled
+from fonc_inference import parallel_predictor
+
+
+#=====================================================================
+# CONFIGURATION MODEL LOADING
+#=====================================================================
+
+# FILE : Complete pipeline (OneHotEncoder + RandomForest) exported by machine_learning/main.py
+MODEL_PATH = os.environ.get("FLIGHT_DELAY_MODEL_PATH", "flight_delay_pipeline.joblib")
+
+# MMAP : Arrays of the artifact mapped read-only from the file instead of read in memory (uncompressed artifact only,
+# the default of joblib.dump : the pages come from the OS page cache, shared by every process of the host)
+MODEL_MMAP = os.environ.get("FLIGHT_DELAY_MODEL_MMAP", "0") == "1"
+
+# PREDICTOR : "sklearn" (pipeline), "compiled" (flat arrays only, fonc_compiled_forest.py) or "auto" (compiled for the
+# small batches, pipeline for the large ones)
+PREDICTORS = ("sklearn", "compiled", "auto")
+MODEL_PREDICTOR = os.environ.get("FLIGHT_DELAY_PREDICTOR", "auto")
+
+# STATES : Loading lifecycle reported by /ready
+STATUS_PENDING = "pending"
+STATUS_LOADING = "loading"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+# WATCHER : Polling interval (in seconds) of the CURRENT pointer of the registry
+MODEL_WATCH_INTERVAL_SECONDS = float(os.environ.get("FLIGHT_DELAY_MODEL_WATCH_INTERVAL_SECONDS", 10))
+
+# SERVED MODEL : Pipeline, version and metadata always swapped together (one reference)
+LoadedModel = namedtuple("LoadedModel", ["model", "version", "metadata"])
+
+
+class ModelNotReadyError(Exception):
+    """Prediction requested while the model is not loaded (yet)"""
+
+
+def load_model(path=MODEL_PATH, mmap=MODEL_MMAP):
+    """
+    PURPOSE :
+        Load the prediction pipeline. Under gunicorn with preload_app (gunicorn.conf.py), called once in the master
+        before the fork : the workers share the trees copy-on-write instead of loading their own copy
+    ARGS:
+        path (str) : joblib artifact of the pipeline
+        mmap (bool) : Memory-map the numpy arrays of the artifact (joblib mmap_mode='r')
+    RETURNS:
+        Pipeline: Fitted scikit-learn pipeline
+    """
+    try:
+        return joblib.load(path, mmap_mode="r" if mmap else None)
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors du chargement du modèle : {e}") from e
+
+
+def load_predictor(path=MODEL_PATH, mmap=MODEL_MMAP, predictor=MODEL_PREDICTOR):
+    """
+    PURPOSE :
+        Load the predictor served : pipeline, compiled predictor (exported next to the artifact, else compiled at
+        load time) or both
+    ARGS:
+        path (str) : joblib artifact of the pipeline
+        mmap (bool) : Memory-map the numpy arrays of the artifact
+        predictor (str) : "sklearn", "compiled" or "auto"
+    RETURNS:
+        Object with a predict(X) method (Pipeline, CompiledForest or AutoPredictor)
+    """
+    if predictor not in PREDICTORS:
+        raise ValueError(f"Prédicteur inconnu : {predictor} ({', '.join(PREDICTORS)})")
+    if predictor == "sklearn":
+        return load_model(path, mmap)
+    # EXPORT : Used only if compiled from this artifact, else compiled again from the pipeline
+    artifact_sha256 = file_sha256(path)
+    compiled = load_compiled(path, artifact_sha256)
+    if predictor == "compiled" and compiled is not None:
+        return compiled
+    pipeline = load_model(path, mmap)
+    if compiled is None:
+        compiled = compile_pipeline(pipeline)
+        compiled.source_sha256 = artifact_sha256
+    return compiled if predictor == "compiled" else AutoPredictor(pipeline, compiled)
+
+
+def file_version(path, length=12):
+    """Version of an artifact outside the registry : start of the SHA-256 of the file"""
+    return file_sha256(path)[:length]
+
+
+class ModelHolder:
+    """
+    PURPOSE :
+        Hold the model of the process and its loading state : the server accepts connections right away and the
+        model is loaded in a background thread (or once in the gunicorn master with preload_app, before the fork).
+        With a registry, the version of its CURRENT pointer is served; a new version is loaded and checked next to
+        the served one, then swapped in one reference assignment (requests already started finish on the old one),
+        and the previous version is kept in memory for a one-step rollback.
+    ARGS:
+        path (str) : joblib artifact of the pipeline (used when the registry has no CURRENT version)
+        mmap (bool) : Memory-map the numpy arrays of the artifact
+        registry (ModelRegistry) : Registry of the versioned artifacts
+        predictor (str) : "sklearn", "compiled" or "auto" (see load_predictor)
+    """
+
+    def __init__(self, path=MODEL_PATH, mmap=MODEL_MMAP, registry=None, predictor=MODEL_PREDICTOR):
+        self.path = path
+        self.mmap = mmap
+        self.predictor = predictor
+        self.registry = registry or ModelRegistry()
+        self._lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self._thread = None
+        self._watcher = None
+        self._active = None
+        self._previous = None
+        self.status = STATUS_PENDING
+        self.load_seconds = None
+        self.error = None
+        self.last_swap = None
+
+    @property
+    def model(self):
+        return self._active.model if self._active else None
+
+    @property
+    def version(self):
+        return self._active.version if self._active else None
+
+    @property
+    def metadata(self):
+        return self._active.metadata if self._active else None
+
+    def _load_version(self, version):
+        """Load (and check) a version of the registry, or the artifact of self.path if version is None"""
+        # PARALLELISM : Owned by the serving layer (n_jobs=1, bounded pool, cut-over calibrated at load time)
+        if version is None:
+            model = parallel_predictor(load_predictor(self.path, self.mmap, self.predictor))
+            return LoadedModel(model, file_version(self.path), {"path": self.path}), None
+        model = parallel_predictor(load_predictor(self.registry.artifact_path(version), self.mmap, self.predictor))
+        check = self.registry.check(version, model)
+        return LoadedModel(model, version, self.registry.metadata(version)), check
+
+    def load(self):
+        """Load the model synchronously (no-op if already loaded or loading in another thread)"""
+        with self._lock:
+            if self.status in (STATUS_LOADING, STATUS_READY):
+                return
+            self.status = STATUS_LOADING
+        start = time.perf_counter()
+        try:
+            self._active, _ = self._load_version(self.registry.current())
+        except Exception as e:
+            self.error = str(e)
+            self.status = STATUS_FAILED
+            print(f"Echec du chargement du modèle : {e}", flush=True)
+            return
+        self.error = None
+        self.load_seconds = time.perf_counter() - start
+        self.status = STATUS_READY
+        print(f"Modèle chargé ({self.version}) en {self.load_seconds:.2f} s", flush=True)
+
+    def start_background_load(self):
+        """Start the loading in a daemon thread, return immediately"""
+        with self._lock:
+            if self.status in (STATUS_LOADING, STATUS_READY) or self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self.load, name="model-loader", daemon=True)
+        self._thread.start()
+
+    def swap(self, version, publish=False):
+        """
+        PURPOSE :
+            Serve another version of the registry : loaded and checked (hash, golden set) while the current one keeps
+            serving, then swapped atomically. The version replaced becomes the rollback target
+        ARGS:
+            version (str) : Version of the registry
+            publish (bool) : Point CURRENT of the registry to the version once swapped (the other workers follow)
+        RETURNS:
+            dict: Result of the swap (version, status "swapped"/"unchanged"/"failed", seconds, golden, error)
+        """
+        with self._swap_lock:
+            start = time.perf_counter()
+            result = {"version": version, "previous_version": self.version, "started_at": time.time()}
+            try:
+                if self._active is not None and version == self.version:
+                    result["status"] = "unchanged"
+                elif self._previous is not None and version == self._previous.version:
+                    # IN MEMORY : Back to the previous version, no reload
+                    self._active, self._previous = self._previous, self._active
+                    result["status"] = "swapped"
+                else:
+                    candidate, result["golden"] = self._load_version(version)
+                    self._active, self._previous = candidate, self._active
+                    result["status"] = "swapped"
+                if publish:
+                    self.registry.set_current(version)
+            except Exception as e:
+                result.update(status="failed", error=str(e))
+                print(f"Echec du changement de modèle ({version}) : {e}", flush=True)
+            else:
+                if result["status"] == "swapped":
+                    self.status, self.error = STATUS_READY, None
+                    print(f"Modèle servi : {version} (précédent : {result['previous_version']})", flush=True)
+            result["seconds"] = time.perf_counter() - start
+            self.last_swap = result
+            return result
+
+    def start_swap(self, version, publish=False):
+        """Run swap() in a daemon thread, return immediately (progress in state()["last_swap"])"""
+        threading.Thread(target=self.swap, args=(version, publish), name="model-swap", daemon=True).start()
+
+    def rollback(self):
+        """Serve again the version replaced by the last swap (kept in memory), and point CURRENT to it"""
+        previous = self._previous
+        if previous is None:
+            raise ModelNotReadyError("Aucune version précédente en mémoire")
+        return self.swap(previous.version, publish=previous.version in self.registry.versions())
+
+    def watch(self, interval=MODEL_WATCH_INTERVAL_SECONDS):
+        """Start a daemon thread following the CURRENT pointer of the registry (one per worker, after the fork)"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+
+        def follow():
+            seen = None
+            while True:
+                time.sleep(interval)
+                current = self.registry.current()
+                # CHANGE ONLY : A version rejected is not retried until CURRENT points elsewhere
+                if current and current != seen and self.status != STATUS_LOADING and current != self.version:
+                    self.swap(current)
+                seen = current
+
+        self._watcher = threading.Thread(target=follow, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def require(self):
+        """Return the served model (pipeline, version, metadata), raise ModelNotReadyError while it is not loaded"""
+        active = self._active
+        if self.status != STATUS_READY or active is None:
+            raise ModelNotReadyError(self.status)
+        return active
+
+    def state(self):
+        """Loading state reported by /ready and /health"""
+        return {
+            "status": self.status,
+            "ready": self.status == STATUS_READY,
+            "model_version": self.version,
+            "predictor": self.predictor,
+            "inference": self.model.describe() if hasattr(self.model, "describe") else None,
+            "previous_version": self._previous.version if self._previous else None,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+            "last_swap": self.last_swap,
+        }
+
+
+# HOLDER : Model of the process (API, gunicorn master)
+model_holder = ModelHolder()
@@ -0,0 +1,209 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+#=====================================================================
+# HEADER COMMENT BLOCK
+#=====================================================================
+'''
+Registry of the versioned models served by the API (hot-swap without restart).
+Layout :
+    <registry>/CURRENT                                 : version served (shared by every worker of the host)
+    <registry>/<version>/flight_delay_pipeline.joblib  : artifact
+    <registry>/<version>/metadata.json                 : version, trained_at, mae, features, sha256
+    <registry>/<version>/golden.csv                    : optional golden set (features + PREDICTION of the trained model)
+
+Usage : python fonc_model_registry.py --list
+        python fonc_model_registry.py --publish flight_delay_pipeline.joblib [--mae 12.3] [--golden X_test.csv] [--activate]
+        python fonc_model_registry.py --activate-version 20251030-101500
+'''
+
+#=====================================================================
+# CONFIGURATION MODEL REGISTRY
+#=====================================================================
+
+# DIRECTORY : Root of the registry (no registry : the API serves FLIGHT_DELAY_MODEL_PATH)
+MODEL_REGISTRY_DIR = os.environ.get("FLIGHT_DELAY_MODEL_REGISTRY_DIR", "models")
+
+# FILES : Names inside a version directory
+ARTIFACT_NAME = "flight_delay_pipeline.joblib"
+METADATA_NAME = "metadata.json"
+GOLDEN_NAME = "golden.csv"
+CURRENT_NAME = "CURRENT"
+
+# GOLDEN SET : Column of the expected prediction, tolerance of the check, rows kept at publication
+GOLDEN_PREDICTION_COL = "PREDICTION"
+GOLDEN_TOLERANCE_MIN = 1e-6
+GOLDEN_ROWS = 200
+
+
+class ModelCheckError(Exception):
+    """Candidate version rejected (hash mismatch, golden set not reproduced)"""
+
+
+def file_sha256(path):
+    """SHA-256 of a file, read by chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, text):
+    """Write a file through a temporary file + rename (readers never see a truncated file)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    """
+    PURPOSE :
+        Versioned artifacts of the pipeline with their metadata, and the pointer to the version served
+    ARGS:
+        root (str) : Directory of the registry
+    """
+
+    def __init__(self, root=MODEL_REGISTRY_DIR):
+        self.root = root
+
+    def exists(self):
+        return os.path.isdir(self.root)
+
+    def versions(self):
+        """Published versions (directories with a metadata file), oldest first"""
+        if not self.exists():
+            return []
+        return sorted(v for v in os.listdir(self.root) if os.path.exists(os.path.join(self.root, v, METADATA_NAME)))
+
+    def artifact_path(self, version):
+        return os.path.join(self.root, version, ARTIFACT_NAME)
+
+    def metadata(self, version):
+        with open(os.path.join(self.root, version, METADATA_NAME), encoding="utf-8") as f:
+            return json.load(f)
+
+    def current(self):
+        """Version served (None if no pointer)"""
+        try:
+            with open(os.path.join(self.root, CURRENT_NAME), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def set_current(self, version):
+        """Point the registry to a published version (picked up by the watchers of every worker)"""
+        if version not in self.versions():
+            raise KeyError(f"Version inconnue : {version}")
+        _write_atomic(os.path.join(self.root, CURRENT_NAME), version + "\n")
+
+    def publish(self, artifact_path, mae=None, features=None, golden=None, trained_at=None, version=None):
+        """
+        PURPOSE :
+            Copy an artifact in the registry as a new version, with its metadata (not served until activated)
+        ARGS:
+            artifact_path (str) : joblib artifact of the pipeline
+            mae (float) : Mean absolute error on the test set
+            features (list) : Input columns of the pipeline (default : feature_names_in_ of the golden set)
+            golden (DataFrame) : Features + PREDICTION column of the trained model (optional golden set)
+            trained_at (str) : ISO date of the training (default : modification date of the artifact)
+            version (str) : Name of the version (default : date of the training, YYYYMMDD-HHMMSS)
+        RETURNS:
+            str: Version published
+        """
+        trained = datetime.fromisoformat(trained_at) if trained_at else datetime.fromtimestamp(os.path.getmtime(artifact_path))
+        version = version or trained.strftime("%Y%m%d-%H%M%S")
+        directory = os.path.join(self.root, version)
+        if os.path.exists(directory):
+            raise FileExistsError(f"Version déjà publiée : {version}")
+        os.makedirs(f"{directory}.tmp", exist_ok=True)
+        shutil.copyfile(artifact_path, os.path.join(f"{directory}.tmp", ARTIFACT_NAME))
+        if golden is not None:
+            golden.to_csv(os.path.join(f"{directory}.tmp", GOLDEN_NAME), index=False)
+            features = features or [c for c in golden.columns if c != GOLDEN_PREDICTION_COL]
+        metadata = {
+            "version": version,
+            "trained_at": trained.isoformat(timespec="seconds"),
+            "published_at": datetime.now().isoformat(timespec="seconds"),
+            "mae": mae,
+            "features": features,
+            "sha256": file_sha256(artifact_path),
+        }
+        _write_atomic(os.path.join(f"{directory}.tmp", METADATA_NAME), json.dumps(metadata, indent=2))
+        # RENAME : The version appears complete to the watchers
+        os.replace(f"{directory}.tmp", directory)
+        return version
+
+    def check(self, version, model):
+        """
+        PURPOSE :
+            Check a loaded candidate before it is served : hash of the artifact, then predictions of the golden set
+        ARGS:
+            version (str) : Version checked
+            model : Pipeline loaded from the artifact of the version
+        RETURNS:
+            dict: Result of the golden set check (rows, max_abs_diff), None if the version has no golden set
+        """
+        metadata = self.metadata(version)
+        if metadata.get("sha256") and file_sha256(self.artifact_path(version)) != metadata["sha256"]:
+            raise ModelCheckError(f"Empreinte SHA-256 différente des métadonnées ({version})")
+        golden_path = os.path.join(self.root, version, GOLDEN_NAME)
+        if not os.path.exists(golden_path):
+            return None
+        # CODES : "NA" and similar codes kept as text, only empty cells are missing values
+        golden = pd.read_csv(golden_path, keep_default_na=False, na_values=[""])
+        features = metadata.get("features") or [c for c in golden.columns if c != GOLDEN_PREDICTION_COL]
+        predictions = np.asarray(model.predict(golden[features]), dtype=float)
+        diff = np.abs(predictions - golden[GOLDEN_PREDICTION_COL].to_numpy(dtype=float))
+        if not np.isfinite(predictions).all() or diff.max(initial=0) > GOLDEN_TOLERANCE_MIN:
+            raise ModelCheckError(f"Golden set non reproduit ({version}) : écart max {diff.max(initial=0):.6f} min")
+        return {"rows": len(golden), "max_abs_diff": float(diff.max(initial=0))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registre des versions du modèle servi par l'API")
+    parser.add_argument("--registry", default=MODEL_REGISTRY_DIR, help="Répertoire du registre")
+    parser.add_argument("--list", action="store_true", help="Lister les versions publiées")
+    parser.add_argument("--publish", default=None, help="Artefact .joblib à publier comme nouvelle version")
+    parser.add_argument("--mae", type=float, default=None, help="MAE du modèle publié (minutes)")
+    parser.add_argument("--golden", default=None, help="CSV des features du golden set (prédictions calculées à la publication)")
+    parser.add_argument("--activate", action="store_true", help="Servir la version publiée")
+    parser.add_argument("--activate-version", default=None, help="Servir une version déjà publiée")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    os.makedirs(args.registry, exist_ok=True)
+
+    if args.publish:
+        golden = None
+        if args.golden:
+            import joblib
+            model = joblib.load(args.publish)
+            golden = pd.read_csv(args.golden).head(GOLDEN_ROWS)[list(model.feature_names_in_)]
+            golden[GOLDEN_PREDICTION_COL] = model.predict(golden)
+        version = registry.publish(args.publish, mae=args.mae, golden=golden)
+        print(f"Version publiée : {version}")
+        if args.activate:
+            registry.set_current(version)
+            print(f"Version servie : {version}")
+    if args.activate_version:
+        registry.set_current(args.activate_version)
+        print(f"Version servie : {args.activate_version}")
+    if args.list or not (args.publish or args.activate_version):
+        current = registry.current()
+        for version in registry.versions():
+            metadata = registry.metadata(version)
+            print(f"{'*' if version == current else ' '} {version}  entraîné {metadata.get('trained_at')}  MAE {metadata.get('mae')}")
+
+
+if __name__ == "__main__":
+    main()
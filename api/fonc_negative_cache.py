@@ -0,0 +1,111 @@
+import fcntl
+import json
+import os
+import threading
+import time
+
+
+#=====================================================================
+# CONFIGURATION NEGATIVE CACHE
+#=====================================================================
+
+# FILE : Local storage of the failed lookups (one entry per URL)
+NEGATIVE_CACHE_PATH = os.environ.get("FLIGHT_DELAY_NEGATIVE_CACHE_PATH", "Flight-delay_negative-cache.json")
+
+# TTL : Duration (in hours) during which a failed URL is not fetched again
+NEGATIVE_CACHE_TTL_HOURS = float(os.environ.get("FLIGHT_DELAY_NEGATIVE_CACHE_TTL_HOURS", 24))
+
+# OUTCOMES : Only definitive failures are cached (network errors and 429 are retried)
+OUTCOME_NO_DATA = "no_data"        # Page fetched but no table/JSON/flight element (JS-only page, unknown code)
+OUTCOME_NOT_FOUND = "not_found"    # HTTP 404/410 (code or registration does not exist anymore)
+
+
+class NegativeCache:
+    """
+    PURPOSE :
+        Remember the URLs (flight codes, aircraft registrations) whose scraping returned no data,
+        to skip them until the TTL expires instead of paying again the fetch and the breaks.
+    ARGS:
+        path (str) : JSON file used to persist the cache between runs
+        ttl_hours (float) : Duration of validity of a failure
+    """
+
+    def __init__(self, path=NEGATIVE_CACHE_PATH, ttl_hours=NEGATIVE_CACHE_TTL_HOURS):
+        self.path = path
+        self.ttl_seconds = ttl_hours * 3600
+        self._lock = threading.Lock()
+        self._entries = self._load()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        """Load the entries still valid from the JSON file"""
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        now = time.time()
+        return {url: e for url, e in entries.items() if now - e.get("failed_at", 0) < self.ttl_seconds}
+
+    def _save(self):
+        """
+        Write the entries on disk, merged with the entries written by the other processes (API workers, ETL
+        workers sharing the file) : file read again under a lock, most recent failure kept for each URL, then
+        written through a temporary file of the process + rename (never a truncated file)
+        """
+        if not self.path:
+            return
+        with open(f"{self.path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            merged = self._load()
+            for url, entry in self._entries.items():
+                if url not in merged or merged[url]["failed_at"] < entry["failed_at"]:
+                    merged[url] = entry
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(merged, f)
+            os.replace(tmp_path, self.path)
+        self._entries = merged
+
+    def lookup(self, url):
+        """Return the outcome of the last failure of the URL if still valid, else None"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.time() - entry["failed_at"] >= self.ttl_seconds:
+                del self._entries[url]
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry["outcome"]
+
+    def record_failure(self, url, outcome):
+        """Store a definitive failure of the URL"""
+        with self._lock:
+            self._entries[url] = {"outcome": outcome, "failed_at": time.time()}
+            self._save()
+
+
+_negative_cache = None
+_negative_cache_lock = threading.Lock()
+
+
+def get_negative_cache():
+    """Return the negative cache shared by all the scrapers of the process"""
+    global _negative_cache
+    with _negative_cache_lock:
+        if _negative_cache is None:
+            _negative_cache = NegativeCache()
+        return _negative_cache
+
+
+def set_negative_cache(cache):
+    """Replace the negative cache shared by the scrapers of the process (e.g. disabled cache when re-processing)"""
+    global _negative_cache
+    with _negative_cache_lock:
+        _negative_cache = cache
@@ -1,7 +1,6 @@
 import pandas as pd
 from bs4 import BeautifulSoup
 import time
-import random
 import json
 from urllib.parse import urljoin
 import logging
@@ -9,6 +8,9 @@ import numpy as np
 from datetime import datetime, timedelta
 import requests
 
+from fonc_negative_cache import get_negative_cache, OUTCOME_NO_DATA, OUTCOME_NOT_FOUND
+from fonc_http import http_session, pause
+
 
                 
 
@@ -47,6 +49,7 @@ def prev_delay(ds_flight_aircraft,ds_flight_date,ds_departure_airport_code,ds_fl
 
         logging.basicConfig(level=logging.INFO)
         logger = logging.getLogger(__name__)
+        negative_cache = get_negative_cache()
 
 
         #=====================================================================
@@ -56,7 +59,7 @@ def prev_delay(ds_flight_aircraft,ds_flight_date,ds_departure_airport_code,ds_fl
 
         class SimpleFlightScraper:
             def __init__(self):
-                self.session = requests.Session()
+                self.session = http_session(requests.Session())
                 # Headers pour ressembler à un navigateur normal
                 self.session.headers.update({
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -74,6 +77,8 @@ def prev_delay(ds_flight_aircraft,ds_flight_date,ds_departure_airport_code,ds_fl
                 try:
                     logger.info(f"Récupération de la page: {url}")
                     response = self.session.get(url, timeout=10)
+                    if response.status_code in (404, 410):
+                        negative_cache.record_failure(url, OUTCOME_NOT_FOUND)
                     response.raise_for_status()
             
                     soup = BeautifulSoup(response.content, 'html.parser')
@@ -99,6 +104,7 @@ def prev_delay(ds_flight_aircraft,ds_flight_date,ds_departure_airport_code,ds_fl
                         return self._extract_from_elements(flight_elements)
             
                     logger.warning("Aucune donnée trouvée avec BeautifulSoup")
+                    negative_cache.record_failure(url, OUTCOME_NO_DATA)
                     return None
             
                 except Exception as e:
@@ -220,10 +226,15 @@ def prev_delay(ds_flight_aircraft,ds_flight_date,ds_departure_airport_code,ds_fl
             simple_scraper = SimpleFlightScraper()
       
             url = f"https://www.flightradar24.com/data/aircraft/{ds_flight_aircraft}"
+
+            # NEGATIVE CACHE : Registration without data recently, skipped without fetch nor break
+            if negative_cache.lookup(url):
+                print(f"Immatriculation {ds_flight_aircraft} ignorée : échec récent en cache")
+                return None
             print(f"=== Scraping des données du vol {ds_flight_aircraft} ===")
         
             simple_data = simple_scraper.scrape_flight_data(url)  
-            time.sleep(random.uniform(3, 7))  # pause anti-bannissemen
+            pause(3, 7)  # pause anti-bannissemen
 
             
             if simple_data:
@@ -1,8 +1,18 @@
 import openmeteo_requests
+import niquests
 import pandas as pd
 from datetime import datetime
 import numpy as np
 
+from fonc_http import http_session, is_live, reference_now
+
+
+def openmeteo_client():
+    """Open-Meteo client following the HTTP mode of the API (live, record or replay of the archive)"""
+    if is_live():
+        return openmeteo_requests.Client()
+    return openmeteo_requests.Client(session=http_session(niquests.Session()))
+
 
 
 #=============================
@@ -32,10 +42,10 @@ def weather_dep_temp(ds_flight_date, ds_departure_plan, ds_departure_airport_lat
         hour = date_obj.hour
         
         # CLIENT API
-        openmeteo = openmeteo_requests.Client()
+        openmeteo = openmeteo_client()
         
         # URL : Definition of the URL depending of the historic date
-        days_diff = (datetime.now() - date_obj).days
+        days_diff = (reference_now() - date_obj).days
         
         if days_diff > 92:
             # DATA : Historical
@@ -113,10 +123,10 @@ def weather_dep_vis(ds_flight_date, ds_departure_plan, ds_departure_airport_lat,
         hour = date_obj.hour
         
         # CLIENT API
-        openmeteo = openmeteo_requests.Client()
+        openmeteo = openmeteo_client()
         
         # URL : Definition of the URL depending of the historic date
-        days_diff = (datetime.now() - date_obj).days
+        days_diff = (reference_now() - date_obj).days
         
         if days_diff > 92:
             # DATA : Historical
@@ -198,10 +208,10 @@ def weather_dep_wind(ds_flight_date, ds_departure_plan, ds_departure_airport_lat
         hour = date_obj.hour
         
         # CLIENT API
-        openmeteo = openmeteo_requests.Client()
+        openmeteo = openmeteo_client()
         
         # URL : Definition of the URL depending of the historic date
-        days_diff = (datetime.now() - date_obj).days
+        days_diff = (reference_now() - date_obj).days
         
         if days_diff > 92:
             # DATA : Historical
@@ -279,10 +289,10 @@ def weather_dep_rain(ds_flight_date, ds_departure_plan, ds_departure_airport_lat
         hour = date_obj.hour
         
         # CLIENT API
-        openmeteo = openmeteo_requests.Client()
+        openmeteo = openmeteo_client()
         
         # URL : Definition of the URL depending of the historic date
-        days_diff = (datetime.now() - date_obj).days
+        days_diff = (reference_now() - date_obj).days
         
         if days_diff > 92:
             # DATA : Historical
@@ -356,10 +366,10 @@ def weather_arr_temp(ds_flight_date, ds_arrival_plan, ds_arrival_airport_lat, ds
         hour = date_obj.hour
         
         # CLIENT API
-        openmeteo = openmeteo_requests.Client()
+        openmeteo = openmeteo_client()
         
         # URL : Definition of the URL depending of the historic date
-        days_diff = (datetime.now() - date_obj).days
+        days_diff = (reference_now() - date_obj).days
         
         if days_diff > 92:
             # DATA : Historical
@@ -428,10 +438,10 @@ def weather_arr_vis(ds_flight_date, ds_arrival_plan, ds_arrival_airport_lat, ds_
         hour = date_obj.hour
         
         # CLIENT API
-        openmeteo = openmeteo_requests.Client()
+        openmeteo = openmeteo_client()
         
         # URL : Definition of the URL depending of the historic date
-        days_diff = (datetime.now() - date_obj).days
+        days_diff = (reference_now() - date_obj).days
         
         if days_diff > 92:
             # DATA : Historical
@@ -504,10 +514,10 @@ def weather_arr_wind(ds_flight_date, ds_arrival_plan, ds_arrival_airport_lat, ds
         hour = date_obj.hour
         
         # CLIENT API
-        openmeteo = openmeteo_requests.Client()
+        openmeteo = openmeteo_client()
         
         # URL : Definition of the URL depending of the historic date
-        days_diff = (datetime.now() - date_obj).days
+        days_diff = (reference_now() - date_obj).days
         
         if days_diff > 92:
             # DATA : Historical
@@ -576,10 +586,10 @@ def weather_arr_rain(ds_flight_date, ds_arrival_plan, ds_arrival_airport_lat, ds
         hour = date_obj.hour
         
         # CLIENT API
-        openmeteo = openmeteo_requests.Client()
+        openmeteo = openmeteo_client()
         
         # URL : Definition of the URL depending of the historic date
-        days_diff = (datetime.now() - date_obj).days
+        days_diff = (reference_now() - date_obj).days
         
         if days_diff > 92:
             # DATA : Historical
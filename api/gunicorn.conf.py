@@ -0,0 +1,36 @@
+import gc
+import os
+
+
+#=====================================================================
+# HEADER COMMENT BLOCK
+#=====================================================================
+'''
+Multi-worker serving of the API : gunicorn master + uvicorn workers.
+With preload_app, the master imports main.py and loads the model once before forking : the workers share the
+trees copy-on-write instead of each loading its own copy, and start without reading the artifact.
+FLIGHT_DELAY_MODEL_MMAP=1 additionally maps the arrays of the (uncompressed) artifact from the OS page cache.
+
+Without preload, each worker loads its model in background after startup (/ready answers 503 meanwhile).
+
+Usage : gunicorn -c gunicorn.conf.py main:app
+        FLIGHT_DELAY_API_WORKERS=4 FLIGHT_DELAY_API_PRELOAD=0 gunicorn -c gunicorn.conf.py main:app   (one load per worker)
+'''
+
+# SERVER
+bind = os.environ.get("FLIGHT_DELAY_API_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("FLIGHT_DELAY_API_WORKERS", 2))
+worker_class = "uvicorn_worker.UvicornWorker"
+timeout = int(os.environ.get("FLIGHT_DELAY_API_TIMEOUT", 120))
+
+# PRELOAD : Application (and model) loaded by the master before the fork
+preload_app = os.environ.get("FLIGHT_DELAY_API_PRELOAD", "1") == "1"
+
+
+def when_ready(server):
+    """Load the model in the master (synchronously : threads do not survive the fork) and freeze its objects before
+    the fork : the GC of the workers never writes their headers, so their pages stay shared"""
+    if preload_app:
+        from fonc_model import model_holder
+        model_holder.load()
+        gc.freeze()
@@ -1,13 +1,25 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, ConfigDict, Field
-from typing import List, Any, Dict
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from typing import List, Any, Dict, Optional
 from datetime import date
+import numpy as np
 import pandas as pd
-import joblib
+import os
 
 
-from fonc_get_flight_data import get_flight_data
+from fonc_get_flight_data import stream_flight_data, FLIGHT_DATA_RESULT
+from fonc_http import configure_http_from_env
+from fonc_delay_summaries import load_summaries, fallback_delay
+from fonc_model import model_holder, ModelNotReadyError
+from fonc_batching import micro_batcher
+from fonc_batch_formats import (
+    batch_media_type, decode_batch, encode_results, BatchFormatError, LAYOUT_ROWS,
+    JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, ARROW_MEDIA_TYPE,
+)
 
 
 # ==============================================================
@@ -71,12 +83,30 @@ class PredictionInput(BaseModel):
     model_config = ConfigDict(extra="allow")
 
 
+# EXAMPLE : One item with the example values of PredictionInput
+PREDICTION_EXAMPLE = {
+    name: (field.json_schema_extra or {}).get("example") for name, field in PredictionInput.model_fields.items()
+}
+
+
 class BatchPredictionInput(BaseModel):
-    items: List[PredictionInput]
+    # ITEMS : Fields of PredictionInput, checked column by column (validate_and_prepare_batch) : an invalid item gets
+    # its own errors in the response instead of rejecting the whole batch
+    items: List[Dict[str, Any]] = Field(..., example=[PREDICTION_EXAMPLE])
+
+
+class ColumnarPredictionInput(BaseModel):
+    # COLUMNS : One array per field of PredictionInput, same length (also as MessagePack or Arrow IPC, fonc_batch_formats.py)
+    columns: Dict[str, List[Any]] = Field(..., example={name: [value] for name, value in PREDICTION_EXAMPLE.items()})
 
 
 class PredictionOutput(BaseModel):
     predicted_delay_min: float
+    model_version: Optional[str] = None
+
+
+class ModelActivation(BaseModel):
+    version: str = Field(..., example="20251030-101500")
 
 
 class FlightRequest(BaseModel):
@@ -88,7 +118,15 @@ class FlightRequest(BaseModel):
 # API INITIALISATION
 # ==============================================================
 
-app = FastAPI(title="✈️ Flight delay prediction API", version="1.0")
+@asynccontextmanager
+async def lifespan(app):
+    # LOADING : Model loaded in background, connections accepted right away (/ready reports the state)
+    model_holder.start_background_load()
+    # HOT-SWAP : Versions of the registry followed by each worker (CURRENT pointer)
+    model_holder.watch()
+    yield
+
+app = FastAPI(title="✈️ Flight delay prediction API", version="1.0", lifespan=lifespan)
 
 # CORS : Activation
 app.add_middleware(
@@ -99,17 +137,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# LOADING : Complete pipeline (OneHotEncoder + RandomForest)
-try:
-    model = joblib.load("flight_delay_pipeline.joblib")
-except Exception as e:
-    raise RuntimeError(f"Erreur lors du chargement du modèle : {e}") from e
+# HTTP MODE : Live by default, record/replay of the exchanges (FR24, Open-Meteo) for offline benchmarks
+configure_http_from_env()
+
+# LOADING : Historical delay summaries of the warehouse (fallback predictions, None if not exported)
+delay_summaries = load_summaries()
 
 
 # ==============================================================
 # DATA CHECK/PREP
 # ==============================================================
 
+# RETRY : Delay (in seconds) suggested to the clients while the model is loading
+MODEL_RETRY_AFTER_SECONDS = 5
+
+
+# BATCH : Largest number of items accepted by /predict-batch (413 beyond)
+BATCH_MAX_ITEMS = int(os.environ.get("FLIGHT_DELAY_BATCH_MAX_ITEMS", 10000))
+
+
+# ADMIN : Token expected in the X-Admin-Token header of the admin endpoints (not set : admin endpoints disabled)
+ADMIN_TOKEN = os.environ.get("FLIGHT_DELAY_ADMIN_TOKEN")
+
+
+def get_model():
+    """Return the served model (pipeline, version, metadata), 503 while it is loading (or if its loading failed)"""
+    try:
+        return model_holder.require()
+    except ModelNotReadyError:
+        raise HTTPException(
+            status_code=503,
+            detail={"error": "Modèle non disponible", "model": model_holder.state()},
+            headers={"Retry-After": str(MODEL_RETRY_AFTER_SECONDS)},
+        )
+
+
 def validate_and_prepare(payloads: List[Dict[str, Any]]) -> pd.DataFrame:
     """Validate and prepare input data on dataframe format"""
     # CHECK : Missing columns
@@ -130,6 +192,89 @@ def validate_and_prepare(payloads: List[Dict[str, Any]]) -> pd.DataFrame:
     return df
 
 
+def numeric_column(values):
+    """Column as float64 (NaN if missing) and mask of the values that are not numbers (numbers as text accepted,
+    nested values such as lists, objects or Arrow lists flagged item by item)"""
+    try:
+        numbers = np.asarray(values, dtype=np.float64)
+        if numbers.ndim == 1:
+            return numbers, None
+    except (TypeError, ValueError):
+        pass
+    values = pd.Series(values, dtype=object)
+    scalar = np.fromiter((pd.api.types.is_scalar(v) for v in values), dtype=bool, count=len(values))
+    numbers = pd.to_numeric(values.where(scalar, None), errors="coerce").to_numpy(dtype=np.float64)
+    return numbers, (values.notna().to_numpy() & np.isnan(numbers)) | ~scalar
+
+
+def text_column(values):
+    """Column as an object array, mask of the missing values and mask of the values that are not text"""
+    values = pd.Series(values, dtype=object)
+    missing = values.isna().to_numpy()
+    # DTYPE : Column of text (or empty) checked at once, value by value only if it mixes types
+    if pd.api.types.infer_dtype(values, skipna=True) in ("string", "empty"):
+        return values.to_numpy(), missing, None
+    is_text = np.fromiter((isinstance(v, str) for v in values), dtype=bool, count=len(values))
+    return values.to_numpy(), missing, ~missing & ~is_text
+
+
+def validate_and_prepare_columns(columns: Dict[str, Any], rows: int):
+    """
+    PURPOSE :
+        Vectorized validation of a batch given as one array per feature, with the rules of PredictionInput (every
+        field required, categorical fields as text, numeric fields as numbers) : one dtype check per column, value
+        by value only for the columns that fail it
+    ARGS:
+        columns (dict) : Feature -> values (list or NumPy array)
+        rows (int) : Number of items of the batch
+    RETURNS:
+        tuple: DataFrame of the valid items (REQUIRED_COLUMNS, index = position in the batch), {position: [errors]}
+    """
+    # CHECK : Missing columns (whole batch rejected, as by validate_and_prepare)
+    missing_columns = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing_columns:
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "error": "Colonnes manquantes",
+                "missing_columns": missing_columns,
+                "required_columns": REQUIRED_COLUMNS,
+            },
+        )
+
+    invalid = np.zeros(rows, dtype=bool)
+    errors = {}
+
+    def flag(mask, column, message):
+        if mask is None or not mask.any():
+            return
+        for i in np.flatnonzero(mask):
+            errors.setdefault(int(i), []).append({"field": column, "error": message})
+        invalid[mask] = True
+
+    # CHECK : Missing values (field absent or null) and types, column by column
+    data = {}
+    for column in REQUIRED_COLUMNS:
+        if column in CATEGORICAL_COLS:
+            data[column], missing, wrong_type = text_column(columns[column])
+            message = "Texte attendu"
+        else:
+            data[column], wrong_type = numeric_column(columns[column])
+            missing = np.isnan(data[column]) if wrong_type is None else np.isnan(data[column]) & ~wrong_type
+            message = "Nombre attendu"
+        flag(missing, column, "Valeur manquante")
+        flag(wrong_type, column, message)
+
+    df = pd.DataFrame(data, columns=REQUIRED_COLUMNS)
+    return (df[~invalid] if invalid.any() else df), errors
+
+
+def validate_and_prepare_batch(payloads: List[Dict[str, Any]]):
+    """Vectorized validation of the items of a batch (one object per item), see validate_and_prepare_columns"""
+    df = pd.DataFrame.from_records(payloads, columns=REQUIRED_COLUMNS)
+    return validate_and_prepare_columns({column: df[column] for column in REQUIRED_COLUMNS}, len(df))
+
+
 
 
 # ==============================================================
@@ -142,8 +287,25 @@ import time
 # CHECK ENDPOINT
 @app.get("/health")
 def health():
-    """Check if API and model are operational"""
-    return {"status": "ok", "model_loaded": True}
+    """Check if API is operational and report the real state of the model"""
+    state = model_holder.state()
+    return {"status": "ok", "model_loaded": state["ready"], "model_status": state["status"]}
+
+# INFERENCE STATS ENDPOINT
+@app.get("/inference-stats")
+def inference_stats():
+    """Micro-batching of the predictions (batch sizes, queue wait) and parallelism of the served model"""
+    return {
+        "micro_batching": micro_batcher.stats(),
+        "parallelism": model_holder.model.describe() if hasattr(model_holder.model, "describe") else None,
+    }
+
+# READINESS ENDPOINT
+@app.get("/ready")
+def ready():
+    """Readiness probe : 200 once the model is loaded, 503 before (load balancers, container orchestrators)"""
+    state = model_holder.state()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
 
 # INFO ENDPOINT
 @app.get("/model-info")
@@ -157,75 +319,191 @@ def model_info():
             "Les nouvelles catégories non vues pendant l’entraînement "
             "sont automatiquement gérées par handle_unknown='ignore'."
         ),
+        "model_version": model_holder.version,
+        "model_metadata": model_holder.metadata,
+        "registry_versions": model_holder.registry.versions(),
     }
 
+# ADMIN ENDPOINTS : Hot-swap of the model (versions of the registry)
+def check_admin_token(token):
+    """403 if the admin endpoints are disabled or the token does not match"""
+    if not ADMIN_TOKEN or token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Accès administrateur refusé")
+
+@app.post("/admin/model/activate", status_code=202)
+def admin_model_activate(request: ModelActivation, x_admin_token: Optional[str] = Header(None)):
+    """Load and check a version of the registry in background, then serve it (CURRENT updated, other workers follow)"""
+    check_admin_token(x_admin_token)
+    if request.version not in model_holder.registry.versions():
+        raise HTTPException(status_code=404, detail=f"Version inconnue : {request.version}")
+    model_holder.start_swap(request.version, publish=True)
+    return {"swap": "started", "version": request.version, "model": model_holder.state()}
+
+@app.post("/admin/model/rollback")
+def admin_model_rollback(x_admin_token: Optional[str] = Header(None)):
+    """Serve again the version replaced by the last swap"""
+    check_admin_token(x_admin_token)
+    try:
+        result = model_holder.rollback()
+    except ModelNotReadyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if result["status"] == "failed":
+        raise HTTPException(status_code=500, detail=result)
+    return result
+
+@app.get("/admin/model")
+def admin_model_state(x_admin_token: Optional[str] = Header(None)):
+    """State of the served model and of the last swap"""
+    check_admin_token(x_admin_token)
+    return model_holder.state()
+
+# SUMMARY ENDPOINT
+@app.get("/delay-summary")
+def delay_summary(airline: str = None, departure: str = None, arrival: str = None):
+    """Historical delay of the most specific level (route, airport, airline) with enough flights"""
+    if delay_summaries is None:
+        raise HTTPException(status_code=503, detail="Résumés des retards non disponibles")
+    summary = fallback_delay(delay_summaries, airline, departure, arrival)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Aucun résumé pour ce vol")
+    return summary
+
 # DEBUG/TEST ENDPOINT
 @app.post("/predict", response_model=PredictionOutput)
 def predict_one(data: PredictionInput):
     """Unique prediction"""
+    served = get_model()
     df = validate_and_prepare([data.model_dump()])
     try:
-        pred = model.predict(df)
+        pred = micro_batcher.predict(served, df)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur pendant la prédiction : {e}")
-    return {"predicted_delay_min": float(pred[0])}
+    return {"predicted_delay_min": float(pred[0]), "model_version": served.version}
+
+# BATCH ENDPOINT
+def score_batch(body: bytes, content_type: Optional[str]) -> Response:
+    """Decode, validate and predict a batch, results encoded in the format of the request"""
+    media_type = batch_media_type(content_type)
+    if media_type is None:
+        raise HTTPException(
+            status_code=415,
+            detail={"error": "Format non supporté", "supported": [JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, ARROW_MEDIA_TYPE]},
+        )
+    try:
+        batch = decode_batch(body, media_type)
+    except BatchFormatError as e:
+        raise HTTPException(status_code=422, detail={"error": str(e)})
+
+    # SIZE : Checked on the decoded batch, before any validation pass over its items
+    if batch.layout == LAYOUT_ROWS:
+        rows = len(batch.items) if isinstance(batch.items, list) else 0
+    else:
+        rows = batch.rows
+    if rows > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail={"error": "Lot trop grand", "items": rows, "max_items": BATCH_MAX_ITEMS},
+        )
+    if batch.layout == LAYOUT_ROWS:
+        try:
+            batch = batch._replace(items=BatchPredictionInput.model_validate({"items": batch.items}).items)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    served = get_model()
+    if batch.layout == LAYOUT_ROWS:
+        df, errors = validate_and_prepare_batch(batch.items)
+    else:
+        df, errors = validate_and_prepare_columns(batch.columns, rows)
+
+    predictions = np.full(rows, np.nan)
+    if len(df):
+        try:
+            predictions[df.index.to_numpy()] = micro_batcher.predict(served, df)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erreur pendant la prédiction : {e}")
+    summary = {"model_version": served.version, "items": rows, "predicted": len(df), "rejected": len(errors)}
+    # RESPONSE : Encoded directly (no response model re-validating every item)
+    return Response(encode_results(batch, predictions, errors, summary), media_type=media_type)
+
+
+@app.post(
+    "/predict-batch",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                JSON_MEDIA_TYPE: {"schema": {"anyOf": [
+                    BatchPredictionInput.model_json_schema(), ColumnarPredictionInput.model_json_schema(),
+                ]}},
+                MSGPACK_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}},
+                ARROW_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}},
+            },
+        }
+    },
+)
+async def predict_batch(request: Request):
+    """Batch prediction (offline scoring) : items (JSON rows) or columns (JSON, MessagePack, Arrow IPC), one predict for
+    every valid item, results in the order of the items and in the format of the request"""
+    body = await request.body()
+    # THREADPOOL : Decoding, validation and prediction off the event loop (as the sync endpoints)
+    return await run_in_threadpool(score_batch, body, request.headers.get("content-type"))
 
 # MAIN ENDPOINT 
 @app.post("/predict-flight")
 def predict_flight_stream(request: FlightRequest):
+    # MODEL : Version fixed for the whole request (a hot-swap during the scraping does not affect it)
+    served = get_model()
+
     def generate():
 
         yield json.dumps({"step": "connexion_api", "status": "ok"}) + "\n"
 
-        # DATA : Scraping + enrichment
-        generator_yield = []
-        features_dict, df_data_prov = get_flight_data(
-            request.flight_number,
-            request.flight_date,
-            progress_callback=lambda s: generator_yield.append(
-                json.dumps({"step": s, "status": "ok"}) + "\n"
-            )
-        )
-
-        # STREAMLIT : Data transfer to Streamlit app
-        dep_code = None
-        arr_code = None
-        airline_name = None
-        departure_name = None
-        arrival_name = None
-
-        if df_data_prov is not None and not df_data_prov.empty:
-            airline_name = df_data_prov.iloc[0].get("DS_AIRLINE_CODE")
-            departure_name = df_data_prov.iloc[0].get("DS_DEPARTURE_AIRPORT")
-            arrival_name = df_data_prov.iloc[0].get("DS_ARRIVAL_AIRPORT")
-            arr_code = df_data_prov.iloc[0].get("DS_ARRIVAL_AIRPORT_CODE")
-            dep_code = df_data_prov.iloc[0].get("DS_DEPARTURE_AIRPORT_CODE")
-
-        yield json.dumps({
-            "step": "scraping_fr24",
-            "status": "ok",
-            "DS_DEPARTURE_AIRPORT_CODE": dep_code,
-            "DS_ARRIVAL_AIRPORT_CODE": arr_code,
-            "DS_AIRLINE_CODE": airline_name,
-            "DS_DEPARTURE_AIRPORT": departure_name,
-            "DS_ARRIVAL_AIRPORT": arrival_name}) + "\n"
-
-
-        # STREAMLIT : Forward progress in real time of all API steps
-        for y in generator_yield:
-            yield y
+        # DATA : Scraping + enrichment, each stage forwarded in real time (route of the flight with the scraping)
+        flight_data = None
+        for step, data in stream_flight_data(request.flight_number, request.flight_date):
+            if step == FLIGHT_DATA_RESULT:
+                flight_data = data
+            else:
+                yield json.dumps({"step": step, "status": "ok", **(data or {})}) + "\n"
+
+        # NOT FOUND : No data for this flight (unknown code, JS-only page or recent failure in negative cache)
+        if flight_data is None:
+            yield json.dumps({
+                "step": "scraping_fr24",
+                "status": "not_found",
+                "flight_number": request.flight_number}) + "\n"
+            return
+        features_dict, _ = flight_data
 
         # PREPARATION : Final preparation before prediction
         df = validate_and_prepare([features_dict])
         yield json.dumps({"step": "api_preparation", "status": "ok"}) + "\n"
 
-        # PREDICTION
-        pred = model.predict(df)
-        delay = float(pred[0])
-        yield json.dumps({
-            "step": "prediction",
-            "status": "done",
-            "predicted_delay_min": delay
-        }) + "\n"
+        # PREDICTION : Model if every feature is known, else historical delay of the route/airport/airline (summaries)
+        delay = None
+        if not df[NUMERIC_COLS].isna().any(axis=None):
+            try:
+                delay = float(micro_batcher.predict(served, df)[0])
+            except Exception:
+                delay = None
+        if delay is not None:
+            yield json.dumps({
+                "step": "prediction",
+                "status": "done",
+                "predicted_delay_min": delay,
+                "model_version": served.version
+            }) + "\n"
+            return
+
+        summary = fallback_delay(
+            delay_summaries,
+            features_dict.get("DS_AIRLINE_CODE"),
+            features_dict.get("DS_DEPARTURE_AIRPORT_CODE"),
+            features_dict.get("DS_ARRIVAL_AIRPORT_CODE"),
+        )
+        if summary is None:
+            yield json.dumps({"step": "prediction", "status": "error"}) + "\n"
+            return
+        yield json.dumps({"step": "prediction", "status": "fallback", **summary}) + "\n"
 
     return StreamingResponse(generate(), media_type="application/json")
@@ -0,0 +1,341 @@
+import argparse
+import filecmp
+import json
+import os
+import re
+import tempfile
+import time
+
+import duckdb
+
+from transformation import transform, register_ratings, AIRLINE_RATINGS_PATH, AIRPORT_RATINGS_PATH
+
+
+#=====================================================================
+# HEADER COMMENT BLOCK
+#=====================================================================
+'''
+Benchmark of the local transformation (transformation.py, one query) against a replay of setup.sql and
+transformation.sql as written, statement by statement (one full-table DELETE/UPDATE per step, as on Snowflake),
+both on DuckDB. The replay shares no code with transformation.py : only the Snowflake dialect is rewritten.
+The two outputs are compared byte for byte. The inputs are the raw dataset given (--input) and/or synthetic raw
+datasets with the columns, empty values and outliers of the ETL output.
+
+Usage : python bench_transformation.py [--input Flight-delay_dataset_pre_traitement.csv] [--rows 25000 10000000] [--json results.json]
+'''
+
+
+#=====================================================================
+# SYNTHETIC DATASET
+#=====================================================================
+
+# RAW COLUMNS : Columns of the ETL output (pipeline_etl/main.py)
+RAW_COLUMNS = [
+    "ds_flight_code", "ds_airline_code", "ds_airline_rating", "ds_flight_date", "ds_flight_aircraft", "ds_departure_airport",
+    "ds_arrival_airport", "ds_departure_airport_code", "ds_arrival_airport_code", "ds_flight_duration", "ds_departure_plan",
+    "ds_departure_real", "ds_arrival_plan", "ds_arrival_real", "ds_departure_airport_rating", "ds_arrival_airport_rating",
+    "ds_departure_airport_lat", "ds_departure_airport_long", "ds_arrival_airport_lat", "ds_arrival_airport_long",
+    "ds_departure_airport_temp_cel", "ds_departure_airport_rain_mmHour", "ds_departure_airport_wind_kmh", "ds_departure_airport_vis_km",
+    "ds_arrival_airport_temp_cel", "ds_arrival_airport_rain_mmHour", "ds_arrival_airport_wind_kmh", "ds_arrival_airport_vis_km",
+    "ds_flight_status", "ds_prev_delay_min", "ds_final_delay_min",
+]
+
+# EMPTY VALUES : Share of the rows without previous delay (about a fifth in the real dataset) / without a weather value
+PREV_DELAY_EMPTY_RATE = 0.19
+WEATHER_EMPTY_RATE = 0.01
+
+
+def make_synthetic(path, rows, seed=42, con=None):
+    """
+    PURPOSE :
+        Write a synthetic raw dataset (';' separated, as the ETL output) : codes of the ratings files and unknown codes,
+        empty values, delays beyond the outlier limits, durations "h:mm"
+    ARGS:
+        path (str) : CSV written
+        rows (int) : Number of rows
+        seed (int) : Seed of the random values
+        con (duckdb.DuckDBPyConnection) : Connection used
+    """
+    con = con or duckdb.connect()
+    con.execute(f"SELECT setseed({(seed % 1000) / 1000})")
+    register_ratings(con)
+    airlines = "(SELECT list(IATA_airline_code) || ['ZZ', 'Q9'] FROM airline_ratings_raw)"
+    airports = "(SELECT list(IATA_airport_code) || ['XXA', 'XXB', 'XXC'] FROM airport_ratings_raw)"
+
+    def maybe_empty(expr, rate):
+        return f"CASE WHEN random() < {rate} THEN '' ELSE CAST({expr} AS VARCHAR) END"
+
+    weather = {
+        "temp_cel": "round(random() * 45 - 10, 1)",
+        "rain_mmHour": "round(CASE WHEN random() < 0.8 THEN 0 ELSE random() * 12 END, 1)",
+        "wind_kmh": "round(random() * 60, 1)",
+        "vis_km": "round(random() * 80, 1)",
+    }
+    columns = {
+        "ds_flight_code": "a.code || CAST(100 + (i % 9000) AS VARCHAR)",
+        "ds_airline_code": "a.code",
+        "ds_airline_rating": "''",
+        "ds_flight_date": "strftime(DATE '2025-01-01' + CAST(i % 300 AS INTEGER), '%d %b %Y')",
+        "ds_flight_aircraft": "'A320'",
+        "ds_departure_airport": "'Airport ' || dep.code",
+        "ds_arrival_airport": "'Airport ' || arr.code",
+        "ds_departure_airport_code": "dep.code",
+        "ds_arrival_airport_code": "arr.code",
+        "ds_flight_duration": maybe_empty("CAST(d // 60 AS VARCHAR) || ':' || lpad(CAST(d % 60 AS VARCHAR), 2, '0')", 0.002),
+        "ds_departure_plan": "'10:00'", "ds_departure_real": "'10:05'", "ds_arrival_plan": "'12:00'", "ds_arrival_real": "'12:10'",
+        "ds_departure_airport_rating": "''", "ds_arrival_airport_rating": "''",
+        "ds_departure_airport_lat": "round(random() * 120 - 60, 6)", "ds_departure_airport_long": "round(random() * 340 - 170, 6)",
+        "ds_arrival_airport_lat": "round(random() * 120 - 60, 6)", "ds_arrival_airport_long": "round(random() * 340 - 170, 6)",
+        "ds_flight_status": "'Landed'",
+        # DELAYS : Mostly around 0, a few beyond the outlier limits
+        "ds_prev_delay_min": maybe_empty("round(CASE WHEN random() < 0.01 THEN random() * 1200 - 600 ELSE random() * 90 - 20 END, 0)",
+                                         PREV_DELAY_EMPTY_RATE),
+        "ds_final_delay_min": maybe_empty("round(CASE WHEN random() < 0.02 THEN random() * 1600 - 800 ELSE random() * 90 - 25 END, 0)",
+                                          0.001),
+    }
+    for side in ["departure", "arrival"]:
+        for name, expr in weather.items():
+            columns[f"ds_{side}_airport_{name}"] = maybe_empty(expr, WEATHER_EMPTY_RATE)
+
+    select = ",\n".join(f"{columns[c]} AS {c}" for c in RAW_COLUMNS)
+    query = f"""
+        WITH codes AS (SELECT {airlines} AS airlines, {airports} AS airports),
+        draws AS (
+            SELECT i, CAST(40 + random() * 700 AS INTEGER) AS d,
+                   airlines[1 + CAST(floor(random() * len(airlines)) AS INTEGER)] AS airline,
+                   airports[1 + CAST(floor(random() * len(airports)) AS INTEGER)] AS departure,
+                   airports[1 + CAST(floor(random() * len(airports)) AS INTEGER)] AS arrival
+            FROM range({rows}) t(i), codes
+        )
+        SELECT {select}
+        FROM (SELECT i, d, airline AS code FROM draws) a
+        JOIN (SELECT i, departure AS code FROM draws) dep USING (i)
+        JOIN (SELECT i, arrival AS code FROM draws) arr USING (i)
+        ORDER BY i
+    """
+    path = path.replace("'", "''")
+    con.execute(f"COPY ({query}) TO '{path}' (HEADER, DELIMITER ';')")
+
+
+#=====================================================================
+# REPLAY OF SETUP.SQL + TRANSFORMATION.SQL
+#=====================================================================
+
+# SCRIPTS : Snowflake scripts replayed as written (ingestion, then cleaning)
+SETUP_SQL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "setup.sql")
+TRANSFORMATION_SQL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "transformation.sql")
+
+# SKIPPED : Statements without effect on the data (account objects, session, checks only displayed)
+SKIPPED_STATEMENT = re.compile(r"^(USE|SELECT|CREATE\s+(OR\s+REPLACE\s+)?(WAREHOUSE|DATABASE|SCHEMA|STAGE))\b", re.I)
+
+
+def split_statements(script):
+    """Statements of a SQL script, comments removed (';' and '--' inside quotes kept)"""
+    statements, current, quoted, i = [], [], False, 0
+    while i < len(script):
+        char = script[i]
+        if char == "'":
+            quoted = not quoted
+        elif not quoted and script.startswith("--", i):
+            i = script.find("\n", i) if "\n" in script[i:] else len(script)
+            continue
+        elif not quoted and char == ";":
+            statements.append("".join(current).strip())
+            current = []
+            i += 1
+            continue
+        current.append(char)
+        i += 1
+    statements.append("".join(current).strip())
+    return [statement for statement in statements if statement]
+
+
+class SnowflakeReplay:
+    """
+    PURPOSE :
+        Replay of the Snowflake scripts on DuckDB, statement by statement as written (a full-table pass per
+        UPDATE / DELETE). Only the dialect is rewritten :
+            - types NUMBER(p,s) / NUMBER / FLOAT, TO_NUMBER(x, p, s), TRIM of a number (implicit cast of Snowflake)
+            - session variables (SET name = ... / $name)
+            - COPY INTO from the stage : local file, file format of the script, rows not fitting the types or
+              the VARCHAR(n) skipped (ON_ERROR = 'CONTINUE')
+            - PRIMARY KEY / FOREIGN KEY dropped (not enforced by Snowflake)
+            - account objects, USE and the checks (SELECT) skipped
+    ARGS:
+        con (duckdb.DuckDBPyConnection) : Connection used
+        stage_files (dict) : File of the stage -> local path (UTF-8)
+    """
+
+    def __init__(self, con, stage_files):
+        self.con = con
+        self.stage_files = stage_files
+        self.file_format = {}
+        self.code_lengths = {}  # Table -> {column: n of VARCHAR(n)}
+        self.statements = 0
+
+    def run_script(self, path):
+        with open(path, encoding="utf-8") as f:
+            for statement in split_statements(f.read()):
+                sql = self.translate(statement)
+                if sql is not None:
+                    self.con.execute(sql)
+                    self.statements += 1
+
+    def translate(self, statement):
+        """DuckDB statement of a Snowflake statement (None if skipped)"""
+        if re.match(r"CREATE\s+(OR\s+REPLACE\s+)?FILE\s+FORMAT", statement, re.I):
+            self._read_file_format(statement)
+            return None
+        if SKIPPED_STATEMENT.match(statement):
+            return None
+        if re.match(r"COPY\s+INTO", statement, re.I):
+            return self._copy_into(statement)
+        if re.match(r"CREATE\s+(OR\s+REPLACE\s+)?TABLE\s+\w+\s*\(", statement, re.I):
+            statement = self._create_table(statement)
+        statement = re.sub(r"\bNUMBER\s*\((\d+)\s*,\s*(\d+)\)", r"DECIMAL(\1,\2)", statement, flags=re.I)
+        statement = re.sub(r"\bNUMBER\b", "DECIMAL(38,0)", statement, flags=re.I)
+        statement = re.sub(r"\bFLOAT\b", "DOUBLE", statement, flags=re.I)
+        statement = re.sub(r"\bTO_NUMBER\((.+?),\s*(\d+),\s*(\d+)\)", r"CAST(\1 AS DECIMAL(\2,\3))", statement, flags=re.I)
+        statement = re.sub(r"\bTRIM\((\w+)\)", r"TRIM(CAST(\1 AS VARCHAR))", statement, flags=re.I)
+        statement = re.sub(r"^SET\s+(\w+)\s*=", r"SET VARIABLE \1 =", statement, flags=re.I)
+        return re.sub(r"\$(\w+)", r"getvariable('\1')", statement)
+
+    def _read_file_format(self, statement):
+        """Options of the file format used by the COPY INTO"""
+        options = dict(re.findall(r"(\w+)\s*=\s*('[^']*'|\([^)]*\)|\w+)", statement))
+        self.file_format = {
+            "delimiter": options.get("FIELD_DELIMITER", "','").strip("'"),
+            "header": int(options.get("SKIP_HEADER", 0)) > 0,
+            "quote": options.get("FIELD_OPTIONALLY_ENCLOSED_BY", "''").strip("'"),
+            "nulls": re.findall(r"'([^']*)'", options.get("NULL_IF", "()")),
+        }
+
+    def _create_table(self, statement):
+        """Constraints dropped, lengths of the VARCHAR(n) kept for the ingestion"""
+        table = re.match(r"CREATE\s+(?:OR\s+REPLACE\s+)?TABLE\s+(\w+)", statement, re.I).group(1).lower()
+        self.code_lengths[table] = {c.lower(): int(n) for c, n in re.findall(r"(\w+)\s+VARCHAR\s*\((\d+)\)", statement, re.I)}
+        statement = re.sub(r",\s*FOREIGN\s+KEY\s*\([^)]*\)\s*REFERENCES\s+\w+\s*\([^)]*\)", "", statement, flags=re.I)
+        return re.sub(r"\s*PRIMARY\s+KEY", "", statement, flags=re.I)
+
+    def _copy_into(self, statement):
+        """INSERT of the local file of the stage, columns by position, rows not fitting skipped if ON_ERROR = 'CONTINUE'"""
+        table, file_name = re.match(r"COPY\s+INTO\s+(\w+)\s+FROM\s+@\w+/(\S+)", statement, re.I).groups()
+        table = table.lower()
+        path = self.stage_files[file_name]
+        columns = [(name.lower(), column_type) for name, column_type, *_ in self.con.execute(f"DESCRIBE {table}").fetchall()]
+        lengths = self.code_lengths.get(table, {})
+        fmt = self.file_format
+        nulls = ", ".join(f"'{v}'" for v in fmt["nulls"])
+        names = ", ".join(f"'{c}'" for c, _ in columns)
+        path = path.replace("'", "''")
+        source = (f"read_csv('{path}', delim='{fmt['delimiter']}', quote='{fmt['quote']}', header={str(fmt['header']).lower()}, "
+                  f"all_varchar=true, nullstr=[{nulls}], names=[{names}])")
+        values = ", ".join(c if t == "VARCHAR" else f"TRY_CAST({c} AS {t})" for c, t in columns)
+        sql = f"INSERT INTO {table} SELECT {values} FROM {source}"
+        if re.search(r"ON_ERROR\s*=\s*'CONTINUE'", statement, re.I):
+            fits = [f"({c} IS NULL OR TRY_CAST({c} AS {t}) IS NOT NULL)" for c, t in columns if t != "VARCHAR"]
+            fits += [f"({c} IS NULL OR length({c}) <= {lengths[c]})" for c, _ in columns if c in lengths]
+            sql += f" WHERE {' AND '.join(fits)}"
+        return sql
+
+
+def stage_copy(path, workdir, encoding="latin-1"):
+    """File of the stage : UTF-8 copy of a local file (the ratings files are latin-1, read as the ETL does)"""
+    staged_path = os.path.join(workdir, os.path.basename(path))
+    with open(path, encoding=encoding, newline="") as source, open(staged_path, "w", encoding="utf-8", newline="") as staged:
+        staged.write(source.read())
+    return staged_path
+
+
+def export_table(con, table, path):
+    """UNLOAD : Table written as the Snowflake export (',' separated, header in upper case, FLOAT with 7 decimals at most)"""
+    columns = []
+    for name, column_type, *_ in con.execute(f"DESCRIBE {table}").fetchall():
+        if column_type == "DOUBLE":
+            columns.append(f"rtrim(rtrim(CAST(CAST(ROUND({name}, 7) AS DECIMAL(8,7)) AS VARCHAR), '0'), '.') AS {name.upper()}")
+        else:
+            columns.append(f"{name} AS {name.upper()}")
+    path = path.replace("'", "''")
+    con.execute(f"COPY (SELECT {', '.join(columns)} FROM {table}) TO '{path}' (HEADER, DELIMITER ',', QUOTE '')")
+
+
+def replay_statements(dataset_path, output_path, con=None):
+    """
+    PURPOSE :
+        Reference : setup.sql (tables, ingestion) and transformation.sql replayed statement by statement on DuckDB,
+        as written (dialect rewrites only, see SnowflakeReplay), then export of dataset_table
+    ARGS:
+        dataset_path (str) : Raw dataset
+        output_path (str) : Cleaned dataset written
+        con (duckdb.DuckDBPyConnection) : Connection used
+    RETURNS:
+        float: Duration in seconds
+    """
+    con = con or duckdb.connect()
+    with tempfile.TemporaryDirectory() as stage_dir:
+        replay = SnowflakeReplay(con, {
+            "Flight-delay_dataset.csv": dataset_path,
+            "Flight-delay_airlines-ratings.csv": stage_copy(AIRLINE_RATINGS_PATH, stage_dir),
+            "Flight-delay_airports-ratings.csv": stage_copy(AIRPORT_RATINGS_PATH, stage_dir),
+        })
+        start = time.perf_counter()
+        replay.run_script(SETUP_SQL_PATH)
+        replay.run_script(TRANSFORMATION_SQL_PATH)
+        export_table(con, "dataset_table", output_path)
+        return time.perf_counter() - start
+
+
+#=====================================================================
+# BENCHMARK
+#=====================================================================
+
+def run_benchmark(dataset_path, workdir, replay=True):
+    """Time both engines on a raw dataset and compare their outputs"""
+    size_mb = os.path.getsize(dataset_path) / 1e6
+    one_pass_path = os.path.join(workdir, "one_pass.csv")
+    replay_path = os.path.join(workdir, "replay.csv")
+    result = transform(dataset_path, one_pass_path)
+    result["size_mb"] = size_mb
+    if replay:
+        result["replay_seconds"] = replay_statements(dataset_path, replay_path)
+        result["identical"] = filecmp.cmp(one_pass_path, replay_path, shallow=False)
+    return result
+
+
+def print_report(name, r):
+    replay = f"{r['replay_seconds']:>10.2f}{r['replay_seconds'] / r['seconds']:>9.1f}x{'oui' if r['identical'] else 'NON':>10}" \
+        if "replay_seconds" in r else f"{'-':>10}{'-':>10}{'-':>10}"
+    print(f"{name:<28}{r['rows_in']:>11}{r['rows_out']:>11}{r['size_mb']:>9.0f}{r['seconds']:>10.2f}{replay}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la transformation locale (une requête) contre transformation.sql rejoué")
+    parser.add_argument("--input", default=None, help="Dataset brut réel de l'ETL (csv ';')")
+    parser.add_argument("--rows", type=int, nargs="*", default=[25_000, 10_000_000], help="Tailles des datasets synthétiques")
+    parser.add_argument("--no-replay", action="store_true", help="Sans le rejeu requête par requête (transformation locale seule)")
+    parser.add_argument("--json", default=None, help="Fichier de sortie des résultats (JSON)")
+    args = parser.parse_args()
+
+    results = {}
+    print("\n" + "=" * 89)
+    print("BENCHMARK TRANSFORMATION (DuckDB : une requête / transformation.sql rejoué)")
+    print("=" * 89)
+    print(f"{'Dataset':<28}{'Lignes':>11}{'Gardées':>11}{'Mo':>9}{'1 req (s)':>10}{'Rejeu (s)':>10}{'Gain':>10}{'Identique':>10}")
+    with tempfile.TemporaryDirectory() as workdir:
+        inputs = [(os.path.basename(args.input), args.input)] if args.input else []
+        for rows in args.rows:
+            path = os.path.join(workdir, f"synthetic_{rows}.csv")
+            make_synthetic(path, rows)
+            inputs.append((f"synthétique {rows}", path))
+        for name, path in inputs:
+            results[name] = run_benchmark(path, workdir, replay=not args.no_replay)
+            print_report(name, results[name])
+            if path.startswith(workdir):
+                os.remove(path)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
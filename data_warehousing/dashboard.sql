@@ -1,4 +1,5 @@
 -- LISTE DE COMMANDES POUR ANALYSE DU DATASET POST-TRAITEMENT (via dashabord Snowflake)
+-- Lecture des résumés matérialisés (dashboard_summaries.sql) : aucune requête ne parcourt la table des vols
 
 
 
@@ -8,11 +9,12 @@ USE DATABASE flight_delay_db;
 USE SCHEMA flight_delay_sch;
 
 SELECT 
-    AVG(ds_final_delay_min) AS moyenne,
-    MEDIAN(ds_final_delay_min) AS mediane,
-    MIN(ds_final_delay_min) AS valeur_min,
-    MAX(ds_final_delay_min) AS valeur_max
-FROM dataset_table;
+    final_sum / nb_vols AS moyenne,
+    APPROX_PERCENTILE_ESTIMATE(final_sketch, 0.5) AS mediane,
+    final_min AS valeur_min,
+    final_max AS valeur_max
+FROM dashboard_summary_table
+WHERE dimension = 'all';
 
 
 
@@ -22,11 +24,12 @@ USE DATABASE flight_delay_db;
 USE SCHEMA flight_delay_sch;
 
 SELECT 
-    AVG(ds_prev_delay_min) AS moyenne,
-    MEDIAN(ds_prev_delay_min) AS mediane,
-    MIN(ds_prev_delay_min) AS valeur_min,
-    MAX(ds_prev_delay_min) AS valeur_max
-FROM dataset_table;
+    prev_sum / nb_vols AS moyenne,
+    APPROX_PERCENTILE_ESTIMATE(prev_sketch, 0.5) AS mediane,
+    prev_min AS valeur_min,
+    prev_max AS valeur_max
+FROM dashboard_summary_table
+WHERE dimension = 'all';
 
 
 
@@ -36,11 +39,12 @@ USE DATABASE flight_delay_db;
 USE SCHEMA flight_delay_sch;
 
 SELECT 
-    AVG(ds_flight_duration_min) AS moyenne,
-    MEDIAN(ds_flight_duration_min) AS mediane,
-    MIN(ds_flight_duration_min) AS valeur_min,
-    MAX(ds_flight_duration_min) AS valeur_max
-FROM dataset_table;
+    duration_sum / nb_vols AS moyenne,
+    APPROX_PERCENTILE_ESTIMATE(duration_sketch, 0.5) AS mediane,
+    duration_min AS valeur_min,
+    duration_max AS valeur_max
+FROM dashboard_summary_table
+WHERE dimension = 'all';
 
 
 
@@ -50,8 +54,9 @@ USE DATABASE flight_delay_db;
 USE SCHEMA flight_delay_sch;
 
 
-SELECT COUNT(*) AS nombre_de_lignes
-FROM dataset_table;
+SELECT nb_vols AS nombre_de_lignes
+FROM dashboard_summary_table
+WHERE dimension = 'all';
 
 
 -- NOMBRE D'AEROPORT UNIQUE LISTÉ
@@ -60,12 +65,9 @@ USE DATABASE flight_delay_db;
 USE SCHEMA flight_delay_sch;
 
 
-SELECT COUNT(DISTINCT airport) AS nb_aeroports_uniques
-FROM (
-    SELECT ds_departure_airport_code AS airport FROM dataset_table
-    UNION
-    SELECT ds_arrival_airport_code AS airport FROM dataset_table
-) AS all_airports;
+SELECT COUNT(DISTINCT dimension_value) AS nb_aeroports_uniques
+FROM dashboard_summary_table
+WHERE dimension IN ('departure_airport', 'arrival_airport');
 
 
 
@@ -76,8 +78,9 @@ USE SCHEMA flight_delay_sch;
 
 
 SELECT
-    COUNT(DISTINCT ds_airline_code) AS nb_compagnie,
-FROM dataset_table;
+    COUNT(*) AS nb_compagnie
+FROM dashboard_summary_table
+WHERE dimension = 'airline';
 
 
 
@@ -87,8 +90,9 @@ USE DATABASE flight_delay_db;
 USE SCHEMA flight_delay_sch;
 
 
-SELECT COUNT(DISTINCT ds_airline_code || '-' || ds_departure_airport_code || '-' || ds_arrival_airport_code) AS nb_routes_uniques
-FROM dataset_table;
+SELECT COUNT(*) AS nb_routes_uniques
+FROM dashboard_summary_table
+WHERE dimension = 'route';
 
 
 
@@ -99,10 +103,10 @@ USE SCHEMA flight_delay_sch;
 
 
 SELECT 
-    ds_airline_code,
-    COUNT(*) AS nb_vols
-FROM dataset_table
-GROUP BY ds_airline_code
+    dimension_value AS ds_airline_code,
+    nb_vols
+FROM dashboard_summary_table
+WHERE dimension = 'airline'
 ORDER BY nb_vols DESC
 LIMIT 3;
 
@@ -113,14 +117,9 @@ USE DATABASE flight_delay_db;
 USE SCHEMA flight_delay_sch;
 
 
-SELECT airport_code, COUNT(*) AS nb_vols
-FROM (
-    SELECT ds_departure_airport_code AS airport_code
-    FROM dataset_table
-    UNION ALL
-    SELECT ds_arrival_airport_code AS airport_code
-    FROM dataset_table
-) AS all_airports
-GROUP BY airport_code
+SELECT dimension_value AS airport_code, SUM(nb_vols) AS nb_vols
+FROM dashboard_summary_table
+WHERE dimension IN ('departure_airport', 'arrival_airport')
+GROUP BY dimension_value
 ORDER BY nb_vols DESC
 LIMIT 3;
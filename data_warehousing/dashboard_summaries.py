@@ -0,0 +1,329 @@
+import argparse
+import json
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from incremental_load import IncrementalWarehouse, WAREHOUSE_PATH
+
+
+#=====================================================================
+# HEADER COMMENT BLOCK
+#=====================================================================
+'''
+Local stand-in (DuckDB) of dashboard_summaries.sql : the aggregates of dashboard.sql (count, mean, median, min, max of
+the delays and flight durations, per airline, airport and route) are kept in a summary table updated with the flights
+added by each refresh of the curated table only. The medians and quantiles come from mergeable sketches (KLL here,
+APPROX_PERCENTILE_ACCUMULATE on Snowflake). The summaries are exported to the API for the fallback predictions.
+
+Usage : python dashboard_summaries.py [--db Flight-delay_warehouse.duckdb] [--api-export ../api/Data/Flight-delay_delay-summaries.json]
+'''
+
+
+#=====================================================================
+# CONFIGURATION SUMMARIES
+#=====================================================================
+
+# MEASURES : Columns of the curated table summarized (name in the summary table -> column)
+MEASURES = {"final": "ds_final_delay_min", "prev": "ds_prev_delay_min", "duration": "ds_flight_duration_min"}
+
+# DIMENSIONS : Breakdowns of the dashboard (name -> SQL expression of the value)
+DIMENSIONS = {
+    "all": "'*'",
+    "airline": "ds_airline_code",
+    "departure_airport": "ds_departure_airport_code",
+    "arrival_airport": "ds_arrival_airport_code",
+    "route": "ds_airline_code || '-' || ds_departure_airport_code || '-' || ds_arrival_airport_code",
+}
+
+# SKETCH : Items kept by the top compactor of the KLL sketches (rank error about 1.7 / k)
+SKETCH_K = 200
+
+# API : Summaries of the final delay exported for the fallback predictions
+API_SUMMARIES_PATH = os.path.join(os.path.dirname(__file__), "..", "api", "Data", "Flight-delay_delay-summaries.json")
+API_QUANTILES = {"p10": 0.1, "median": 0.5, "p90": 0.9}
+
+
+#=====================================================================
+# KLL SKETCH
+#=====================================================================
+
+class KllSketch:
+    """
+    PURPOSE :
+        Mergeable quantile sketch (KLL) : the values are kept in compactors of growing weight (2^level); a full compactor
+        sorts its items and promotes one out of two to the next level. The size stays in O(k) whatever the number of values,
+        two sketches merge into the sketch of the union, and the quantiles are exact while fewer than k values were added.
+    ARGS:
+        k (int) : Capacity of the top compactor (accuracy)
+    """
+
+    def __init__(self, k=SKETCH_K):
+        self.k = k
+        self.n = 0
+        self.levels = [[]]
+        self._flip = 0
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append([])
+                items = sorted(items)
+                # ODD : One item stays at its level, the others are paired and one of each pair promoted
+                kept = [items.pop()] if len(items) % 2 else []
+                # OFFSET : Alternated (deterministic) instead of random, the errors of the compactions cancel out
+                self._flip ^= 1
+                self.levels[level + 1].extend(items[self._flip::2])
+                self.levels[level] = kept
+                level = 0  # Capacities changed with the new level
+                continue
+            level += 1
+
+    def update(self, values):
+        """Add values (iterable of numbers, the missing values are ignored)"""
+        values = [float(v) for v in values if v is not None and not (isinstance(v, float) and math.isnan(v))]
+        self.levels[0].extend(values)
+        self.n += len(values)
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Add the values summarized by another sketch"""
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append([])
+            self.levels[level].extend(items)
+        self.n += other.n
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        """Value at the rank q (0..1) of the values added (None if empty)"""
+        if not self.n:
+            return None
+        if len(self.levels) == 1:
+            return float(np.quantile(self.levels[0], q))  # Exact, interpolated as MEDIAN
+        values = np.concatenate([np.asarray(items, dtype=float) for items in self.levels])
+        weights = np.concatenate([np.full(len(items), 2 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        index = int(np.searchsorted(cumulative, q * cumulative[-1], side="left"))
+        return float(values[order][min(index, len(values) - 1)])
+
+    def to_json(self):
+        return json.dumps({"k": self.k, "n": self.n, "levels": self.levels, "flip": self._flip})
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        sketch = cls(data["k"])
+        sketch.n = data["n"]
+        sketch.levels = data["levels"]
+        sketch._flip = data["flip"]
+        return sketch
+
+
+#=====================================================================
+# SUMMARIES
+#=====================================================================
+
+class DashboardSummaries:
+    """
+    PURPOSE :
+        Summary table of the dashboard kept up to date with the flights added to the curated table
+        (one row per dimension value : count, sum, min, max and sketch of each measure)
+    ARGS:
+        warehouse (IncrementalWarehouse) : Local warehouse of the curated table
+    """
+
+    def __init__(self, warehouse):
+        self.con = warehouse.con
+        measures = ",\n".join(f"{m}_sum DOUBLE, {m}_min DOUBLE, {m}_max DOUBLE, {m}_sketch VARCHAR" for m in MEASURES)
+        self.con.execute(f"""
+            CREATE TABLE IF NOT EXISTS dashboard_summary_table (
+                dimension VARCHAR,
+                dimension_value VARCHAR,
+                nb_vols BIGINT,
+                {measures},
+                PRIMARY KEY (dimension, dimension_value)
+            )""")
+        # WATERMARK : Last refresh of the curated table summarized (flights inserted after it are new)
+        self.con.execute("CREATE TABLE IF NOT EXISTS dashboard_watermark_table (load_sequence BIGINT)")
+
+    def watermark(self):
+        return self.con.execute("SELECT COALESCE(MAX(load_sequence), 0) FROM dashboard_watermark_table").fetchone()[0]
+
+    def refresh(self):
+        """
+        PURPOSE :
+            Add the flights inserted in the curated table since the last refresh to the summaries
+            (flights replaced afterwards are not counted twice; rebuild() to take the new values of a replaced flight)
+        RETURNS:
+            dict: New flights, summary rows updated, duration
+        """
+        start = time.perf_counter()
+        watermark = self.watermark()
+        last = self.con.execute("SELECT COALESCE(MAX(ds_first_sequence), 0) FROM dataset_curated_table").fetchone()[0]
+        result = {"new_flights": 0, "groups": 0}
+        if last > watermark:
+            self.con.begin()
+            try:
+                result = self._add(f"ds_first_sequence > {watermark} AND ds_first_sequence <= {last}")
+                self.con.execute("INSERT INTO dashboard_watermark_table VALUES (?)", [last])
+                self.con.commit()
+            except Exception:
+                self.con.rollback()
+                raise
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    def rebuild(self):
+        """Summaries computed again from the whole curated table"""
+        self.con.execute("DELETE FROM dashboard_summary_table")
+        self.con.execute("DELETE FROM dashboard_watermark_table")
+        return self.refresh()
+
+    def _add(self, condition):
+        """Aggregate the new flights per dimension value and merge them into the summary rows of these values only"""
+        dims = " UNION ALL ".join(
+            f"SELECT '{name}' AS dimension, {expr} AS dimension_value, {', '.join(MEASURES.values())} FROM new_rows"
+            for name, expr in DIMENSIONS.items())
+        aggregates = ", ".join(f"SUM({c}) AS {m}_sum, MIN({c}) AS {m}_min, MAX({c}) AS {m}_max, list({c}) AS {m}_values"
+                               for m, c in MEASURES.items())
+        batch = self.con.execute(f"""
+            WITH new_rows AS (SELECT * FROM dataset_curated_table WHERE {condition})
+            SELECT dimension, dimension_value, COUNT(*) AS nb_vols, {aggregates}
+            FROM ({dims})
+            GROUP BY dimension, dimension_value""").fetchdf()
+        new_flights = int(batch.loc[batch["dimension"] == "all", "nb_vols"].sum())
+        if batch.empty:
+            return {"new_flights": 0, "groups": 0}
+
+        # MERGE : Existing rows of the values touched by the batch only
+        self.con.register("dashboard_batch_keys", batch[["dimension", "dimension_value"]])
+        stored = self.con.execute("""
+            SELECT s.* FROM dashboard_summary_table s
+            JOIN dashboard_batch_keys b USING (dimension, dimension_value)""").fetchdf()
+        self.con.unregister("dashboard_batch_keys")
+        stored = {(r.dimension, r.dimension_value): r for r in stored.itertuples(index=False)}
+
+        rows = []
+        for r in batch.itertuples(index=False):
+            previous = stored.get((r.dimension, r.dimension_value))
+            row = {"dimension": r.dimension, "dimension_value": r.dimension_value,
+                   "nb_vols": r.nb_vols + (previous.nb_vols if previous is not None else 0)}
+            for m in MEASURES:
+                sketch = KllSketch().update(getattr(r, f"{m}_values"))
+                total, low, high = float(getattr(r, f"{m}_sum")), float(getattr(r, f"{m}_min")), float(getattr(r, f"{m}_max"))
+                if previous is not None:
+                    sketch.merge(KllSketch.from_json(getattr(previous, f"{m}_sketch")))
+                    total += getattr(previous, f"{m}_sum")
+                    low, high = min(low, getattr(previous, f"{m}_min")), max(high, getattr(previous, f"{m}_max"))
+                row.update({f"{m}_sum": total, f"{m}_min": low, f"{m}_max": high, f"{m}_sketch": sketch.to_json()})
+            rows.append(row)
+
+        self.con.register("dashboard_batch_table", pd.DataFrame(rows))
+        self.con.execute("INSERT OR REPLACE INTO dashboard_summary_table BY NAME SELECT * FROM dashboard_batch_table")
+        self.con.unregister("dashboard_batch_table")
+        return {"new_flights": new_flights, "groups": len(rows)}
+
+    def _summaries(self, dimension):
+        return self.con.execute("SELECT * FROM dashboard_summary_table WHERE dimension = ? ORDER BY nb_vols DESC, dimension_value",
+                                [dimension]).fetchdf()
+
+    def overview(self, measure):
+        """Mean, median, min and max of a measure over all the flights (VU D'ENSEMBLE of dashboard.sql)"""
+        rows = self._summaries("all")
+        if rows.empty:
+            return None
+        r = rows.iloc[0]
+        return {"moyenne": r[f"{measure}_sum"] / r["nb_vols"], "mediane": KllSketch.from_json(r[f"{measure}_sketch"]).quantile(0.5),
+                "valeur_min": r[f"{measure}_min"], "valeur_max": r[f"{measure}_max"]}
+
+    def dashboard(self):
+        """Every query of dashboard.sql, read from the summaries"""
+        airlines = self._summaries("airline")
+        airports = self.con.execute("""
+            SELECT dimension_value AS airport_code, SUM(nb_vols) AS nb_vols FROM dashboard_summary_table
+            WHERE dimension IN ('departure_airport', 'arrival_airport')
+            GROUP BY dimension_value ORDER BY nb_vols DESC, airport_code""").fetchdf()
+        all_rows = self._summaries("all")
+        return {
+            "retard_final": self.overview("final"),
+            "retard_precedent": self.overview("prev"),
+            "duree_de_vol": self.overview("duration"),
+            "nombre_de_lignes": int(all_rows["nb_vols"].iloc[0]) if not all_rows.empty else 0,
+            "nb_aeroports_uniques": len(airports),
+            "nb_compagnie": len(airlines),
+            "nb_routes_uniques": len(self._summaries("route")),
+            "top_compagnies": [(r.dimension_value, int(r.nb_vols)) for r in airlines.head(3).itertuples()],
+            "top_aeroports": [(r.airport_code, int(r.nb_vols)) for r in airports.head(3).itertuples()],
+        }
+
+    def export_api(self, path=API_SUMMARIES_PATH):
+        """
+        PURPOSE :
+            Summaries of the final delay per dimension value, for the fallback predictions of the API
+        ARGS:
+            path (str) : JSON file written (temporary file + rename, read by the API at startup)
+        RETURNS:
+            int: Number of dimension values exported
+        """
+        levels = {name: {} for name in DIMENSIONS}
+        rows = self.con.execute("SELECT dimension, dimension_value, nb_vols, final_sum, final_min, final_max, final_sketch "
+                                "FROM dashboard_summary_table").fetchall()
+        for dimension, value, count, total, low, high, sketch in rows:
+            sketch = KllSketch.from_json(sketch)
+            levels[dimension][value] = {"n": count, "mean": total / count, "min": low, "max": high,
+                                        **{name: sketch.quantile(q) for name, q in API_QUANTILES.items()}}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"generated_at": time.time(), "measure": MEASURES["final"], "levels": levels}, f)
+        os.replace(tmp_path, path)
+        return len(rows)
+
+
+def print_dashboard(d):
+    print("\n" + "=" * 60)
+    print("DASHBOARD (résumés incrémentaux)")
+    print("=" * 60)
+    for name in ["retard_final", "retard_precedent", "duree_de_vol"]:
+        o = d[name]
+        if o:
+            print(f"{name:<18} moyenne {o['moyenne']:>8.2f} | médiane {o['mediane']:>8.2f} | min {o['valeur_min']:>8.2f} | max {o['valeur_max']:>8.2f}")
+    print(f"Vols : {d['nombre_de_lignes']} | aéroports : {d['nb_aeroports_uniques']} | compagnies : {d['nb_compagnie']} "
+          f"| routes : {d['nb_routes_uniques']}")
+    print(f"Top compagnies : {d['top_compagnies']}")
+    print(f"Top aéroports : {d['top_aeroports']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Résumés incrémentaux du dashboard (équivalent de dashboard_summaries.sql)")
+    parser.add_argument("--db", default=WAREHOUSE_PATH, help="Base DuckDB de l'entrepôt local (incremental_load.py)")
+    parser.add_argument("--rebuild", action="store_true", help="Recalcul complet des résumés depuis la table nettoyée")
+    parser.add_argument("--api-export", default=None, help="Export des résumés du retard final pour l'API (JSON)")
+    args = parser.parse_args()
+
+    warehouse = IncrementalWarehouse(args.db)
+    summaries = DashboardSummaries(warehouse)
+    result = summaries.rebuild() if args.rebuild else summaries.refresh()
+    print(f"✅ {result['new_flights']} nouveaux vols résumés | {result['groups']} lignes de résumé mises à jour ({result['seconds']:.2f} s)")
+    print_dashboard(summaries.dashboard())
+    if args.api_export:
+        count = summaries.export_api(args.api_export)
+        print(f"✅ {count} résumés exportés -> {args.api_export}")
+    warehouse.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+-- Activation du warehouse
+USE WAREHOUSE Warehouse_dst;
+-- Activation base de données et schema
+USE DATABASE flight_delay_db;
+USE SCHEMA flight_delay_sch;
+
+-- Résumés du dashboard : les agrégats de dashboard.sql (nombre, moyenne, médiane, min, max des retards et durées de vol,
+-- par compagnie, aéroport et route) sont matérialisés et mis à jour avec les seuls vols ajoutés à dataset_curated_table
+-- (incremental_load.sql). Médianes et quantiles : états APPROX_PERCENTILE (t-digest) fusionnables.
+-- Equivalent local (DuckDB, sketch KLL) : dashboard_summaries.py
+
+
+-------------------------------------------------------------------------
+-- TABLES (une seule fois)
+-------------------------------------------------------------------------
+
+-- Une ligne par valeur de dimension : 'all' ('*'), 'airline', 'departure_airport', 'arrival_airport', 'route' (compagnie-départ-arrivée)
+CREATE TABLE IF NOT EXISTS dashboard_summary_table (
+    dimension VARCHAR,
+    dimension_value VARCHAR,
+    nb_vols NUMBER,
+    final_sum NUMBER(18,2), final_min NUMBER(6,2), final_max NUMBER(6,2), final_sketch OBJECT,
+    prev_sum NUMBER(18,2), prev_min NUMBER(6,2), prev_max NUMBER(6,2), prev_sketch OBJECT,
+    duration_sum NUMBER(18,0), duration_min NUMBER, duration_max NUMBER, duration_sketch OBJECT,
+    PRIMARY KEY (dimension, dimension_value)
+);
+
+-- Dernier chargement résumé (les vols insérés après sont nouveaux)
+CREATE TABLE IF NOT EXISTS dashboard_watermark_table (last_loaded_at TIMESTAMP_NTZ);
+
+
+-------------------------------------------------------------------------
+-- RAFRAICHISSEMENT (après incremental_load.sql)
+-------------------------------------------------------------------------
+
+-- ETAPE 1 : Fenêtre des vols nouveaux (premier chargement après le dernier résumé)
+SET watermark = (SELECT COALESCE(MAX(last_loaded_at), '1970-01-01'::TIMESTAMP_NTZ) FROM dashboard_watermark_table);
+SET new_watermark = (SELECT COALESCE(MAX(ds_first_loaded_at), $watermark) FROM dataset_curated_table);
+
+-- ETAPE 2 : Agrégats des vols nouveaux par valeur de dimension
+-- (un vol remplacé plus tard n'est pas recompté ; recalcul complet en fin de fichier pour reprendre ses nouvelles valeurs)
+CREATE OR REPLACE TEMPORARY TABLE dashboard_batch_table AS
+WITH new_rows AS (
+    SELECT * FROM dataset_curated_table
+    WHERE ds_first_loaded_at > $watermark AND ds_first_loaded_at <= $new_watermark
+),
+dims AS (
+    SELECT 'all' AS dimension, '*' AS dimension_value, ds_final_delay_min, ds_prev_delay_min, ds_flight_duration_min FROM new_rows
+    UNION ALL
+    SELECT 'airline', ds_airline_code, ds_final_delay_min, ds_prev_delay_min, ds_flight_duration_min FROM new_rows
+    UNION ALL
+    SELECT 'departure_airport', ds_departure_airport_code, ds_final_delay_min, ds_prev_delay_min, ds_flight_duration_min FROM new_rows
+    UNION ALL
+    SELECT 'arrival_airport', ds_arrival_airport_code, ds_final_delay_min, ds_prev_delay_min, ds_flight_duration_min FROM new_rows
+    UNION ALL
+    SELECT 'route', ds_airline_code || '-' || ds_departure_airport_code || '-' || ds_arrival_airport_code,
+           ds_final_delay_min, ds_prev_delay_min, ds_flight_duration_min FROM new_rows
+)
+SELECT
+    dimension, dimension_value, COUNT(*) AS nb_vols,
+    SUM(ds_final_delay_min) AS final_sum, MIN(ds_final_delay_min) AS final_min, MAX(ds_final_delay_min) AS final_max,
+    APPROX_PERCENTILE_ACCUMULATE(ds_final_delay_min) AS final_sketch,
+    SUM(ds_prev_delay_min) AS prev_sum, MIN(ds_prev_delay_min) AS prev_min, MAX(ds_prev_delay_min) AS prev_max,
+    APPROX_PERCENTILE_ACCUMULATE(ds_prev_delay_min) AS prev_sketch,
+    SUM(ds_flight_duration_min) AS duration_sum, MIN(ds_flight_duration_min) AS duration_min, MAX(ds_flight_duration_min) AS duration_max,
+    APPROX_PERCENTILE_ACCUMULATE(ds_flight_duration_min) AS duration_sketch
+FROM dims
+GROUP BY dimension, dimension_value;
+
+-- ETAPE 3 : Fusion avec les résumés existants des seules valeurs touchées par le lot (états des sketches combinés)
+MERGE INTO dashboard_summary_table t
+USING (
+    SELECT
+        dimension, dimension_value, SUM(nb_vols) AS nb_vols,
+        SUM(final_sum) AS final_sum, MIN(final_min) AS final_min, MAX(final_max) AS final_max,
+        APPROX_PERCENTILE_COMBINE(final_sketch) AS final_sketch,
+        SUM(prev_sum) AS prev_sum, MIN(prev_min) AS prev_min, MAX(prev_max) AS prev_max,
+        APPROX_PERCENTILE_COMBINE(prev_sketch) AS prev_sketch,
+        SUM(duration_sum) AS duration_sum, MIN(duration_min) AS duration_min, MAX(duration_max) AS duration_max,
+        APPROX_PERCENTILE_COMBINE(duration_sketch) AS duration_sketch
+    FROM (
+        SELECT * FROM dashboard_batch_table
+        UNION ALL
+        SELECT s.* FROM dashboard_summary_table s
+        JOIN dashboard_batch_table b ON s.dimension = b.dimension AND s.dimension_value = b.dimension_value
+    )
+    GROUP BY dimension, dimension_value
+) m
+ON t.dimension = m.dimension AND t.dimension_value = m.dimension_value
+WHEN MATCHED THEN UPDATE SET
+    nb_vols = m.nb_vols,
+    final_sum = m.final_sum, final_min = m.final_min, final_max = m.final_max, final_sketch = m.final_sketch,
+    prev_sum = m.prev_sum, prev_min = m.prev_min, prev_max = m.prev_max, prev_sketch = m.prev_sketch,
+    duration_sum = m.duration_sum, duration_min = m.duration_min, duration_max = m.duration_max, duration_sketch = m.duration_sketch
+WHEN NOT MATCHED THEN INSERT VALUES (
+    m.dimension, m.dimension_value, m.nb_vols,
+    m.final_sum, m.final_min, m.final_max, m.final_sketch,
+    m.prev_sum, m.prev_min, m.prev_max, m.prev_sketch,
+    m.duration_sum, m.duration_min, m.duration_max, m.duration_sketch);
+
+-- ETAPE 4 : Nouveau point de reprise
+INSERT INTO dashboard_watermark_table VALUES ($new_watermark);
+
+
+-------------------------------------------------------------------------
+-- EXPORT POUR L'API (prédictions de repli, api/Data/Flight-delay_delay-summaries.json)
+-------------------------------------------------------------------------
+SELECT
+    dimension, dimension_value, nb_vols AS n,
+    final_sum / nb_vols AS mean, final_min AS min, final_max AS max,
+    APPROX_PERCENTILE_ESTIMATE(final_sketch, 0.1) AS p10,
+    APPROX_PERCENTILE_ESTIMATE(final_sketch, 0.5) AS median,
+    APPROX_PERCENTILE_ESTIMATE(final_sketch, 0.9) AS p90
+FROM dashboard_summary_table;
+
+
+-------------------------------------------------------------------------
+-- RECALCUL COMPLET (optionnel)
+-------------------------------------------------------------------------
+-- DELETE FROM dashboard_summary_table;
+-- DELETE FROM dashboard_watermark_table;
+-- Puis ETAPES 1 à 4 (tous les vols de dataset_curated_table sont nouveaux)
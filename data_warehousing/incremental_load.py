@@ -0,0 +1,259 @@
+import argparse
+import glob
+import json
+import os
+import time
+
+import duckdb
+
+from transformation import (cleaning_sql, norm_text_sql, read_csv_sql, register_ratings, AIRLINE_RATINGS_PATH,
+                            AIRPORT_RATINGS_PATH, DATASET_TYPES, OUTPUT_COLUMNS, NORMALIZED_COLUMNS)
+
+
+#=====================================================================
+# HEADER COMMENT BLOCK
+#=====================================================================
+'''
+Local stand-in (DuckDB) of the incremental warehouse load of incremental_load.sql : only the partitions of the ETL
+not loaded yet are staged, cleaned on their own (same rules as transformation.sql) and merged into the curated table
+on the natural key of the flights. The min/max of the ratings are kept in a statistics table updated with each batch,
+the normalized columns are computed by a view. The work of a refresh depends on the new rows only.
+
+Usage : python incremental_load.py [--source ../pipeline_etl/Flight-delay_dataset] [--export Flight-delay_dataset_post_traitement.csv]
+'''
+
+
+#=====================================================================
+# CONFIGURATION INCREMENTAL LOAD
+#=====================================================================
+
+# FILES : Local warehouse, partitioned dataset of the ETL (Parquet sink, committed batches listed in its manifests)
+WAREHOUSE_PATH = "Flight-delay_warehouse.duckdb"
+SINK_DIR = os.path.join(os.path.dirname(__file__), "..", "pipeline_etl", "Flight-delay_dataset")
+MANIFEST_PREFIX = "_manifest"
+
+# KEY : Natural key of a flight (same as the ETL sink)
+KEY_COLUMNS = ["ds_flight_code", "ds_flight_date", "ds_departure_airport_code"]
+
+# CURATED : Columns of the curated table (key, cleaned columns, ratings not normalized)
+CURATED_COLUMNS = KEY_COLUMNS + [c for c in OUTPUT_COLUMNS if c not in KEY_COLUMNS and not c.endswith("_norm")] + NORMALIZED_COLUMNS
+CURATED_TYPES = {**{c: "VARCHAR" for c in CURATED_COLUMNS}, **DATASET_TYPES, "ds_flight_duration_min": "INTEGER"}
+
+
+class IncrementalWarehouse:
+    """
+    PURPOSE :
+        Curated dataset kept up to date with the new partitions of the ETL (load metadata, MERGE on the natural key,
+        statistics of normalization updated with each batch, normalized columns computed by a view)
+    ARGS:
+        path (str) : DuckDB database file (":memory:" for a test)
+        airline_ratings_path (str) : Ratings of the airlines (AirHelp)
+        airport_ratings_path (str) : Ratings of the airports (AirHelp)
+    """
+
+    def __init__(self, path=WAREHOUSE_PATH, airline_ratings_path=AIRLINE_RATINGS_PATH, airport_ratings_path=AIRPORT_RATINGS_PATH):
+        self.path = path
+        self.con = duckdb.connect(path)
+        register_ratings(self.con, airline_ratings_path, airport_ratings_path)
+        self._create_tables()
+
+    def _create_tables(self):
+        columns = ",\n".join(f"{c} {CURATED_TYPES[c]}" for c in CURATED_COLUMNS)
+        self.con.execute(f"""
+            CREATE TABLE IF NOT EXISTS dataset_curated_table (
+                {columns},
+                ds_load_sequence BIGINT,
+                ds_position BIGINT,
+                ds_first_sequence BIGINT,
+                PRIMARY KEY ({", ".join(KEY_COLUMNS)})
+            )""")
+        # FIRST LOAD : Refresh which inserted the flight (kept when the flight is replaced, read by the dashboard summaries)
+        self.con.execute("ALTER TABLE dataset_curated_table ADD COLUMN IF NOT EXISTS ds_first_sequence BIGINT")
+        # BACKFILL : Flights loaded before the column existed, first load unknown -> refresh of their current version
+        self.con.execute("UPDATE dataset_curated_table SET ds_first_sequence = ds_load_sequence WHERE ds_first_sequence IS NULL")
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS normalization_stats_table (
+                column_name VARCHAR PRIMARY KEY,
+                min_value DECIMAL(3,1),
+                max_value DECIMAL(3,1)
+            )""")
+        # LOAD METADATA : Files already loaded (same loaded_files_table in incremental_load.sql)
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS loaded_files_table (
+                file_name VARCHAR PRIMARY KEY,
+                load_sequence BIGINT,
+                loaded_at TIMESTAMP
+            )""")
+        kept = ", ".join(f"c.{c}" for c in OUTPUT_COLUMNS if not c.endswith("_norm"))
+        normalized = ",\n".join(
+            f"CAST(c.{c} - s{i}.min_value AS DOUBLE) / NULLIF(s{i}.max_value - s{i}.min_value, 0) AS {c}_norm"
+            for i, c in enumerate(NORMALIZED_COLUMNS))
+        stats = "\n".join(
+            f"CROSS JOIN (SELECT min_value, max_value FROM normalization_stats_table WHERE column_name = '{c}') s{i}"
+            for i, c in enumerate(NORMALIZED_COLUMNS))
+        self.con.execute(f"""
+            CREATE OR REPLACE VIEW dataset_post_traitement_view AS
+            SELECT {kept},
+                   {normalized},
+                   c.ds_load_sequence, c.ds_position
+            FROM dataset_curated_table c
+            {stats}""")
+
+    def pending_files(self, source=SINK_DIR):
+        """
+        PURPOSE :
+            Files of the source not loaded yet, in commit order
+        ARGS:
+            source (str) : Parquet sink of the ETL (directory, only the files of its committed batches are read)
+                           or raw CSV file (';', loaded again only when it changed)
+        RETURNS:
+            list: (file name recorded in the load metadata, path)
+        """
+        if os.path.isdir(source):
+            entries = []
+            for path in sorted(glob.glob(os.path.join(source, f"{MANIFEST_PREFIX}_*.jsonl"))):
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            entries.append(json.loads(line))
+                        except ValueError:
+                            continue  # Last line truncated by a crash : batch not committed
+            files = [(file["path"], os.path.join(source, file["path"]))
+                     for entry in sorted(entries, key=lambda e: e["committed_at"]) for file in entry["files"]]
+        else:
+            stat = os.stat(source)
+            files = [(f"{os.path.abspath(source)}@{stat.st_size}-{stat.st_mtime_ns}", source)]
+        loaded = {row[0] for row in self.con.execute("SELECT file_name FROM loaded_files_table").fetchall()}
+        return [(name, path) for name, path in files if name not in loaded]
+
+    def _stage(self, files):
+        """Raw rows of the new files as text (file order, then row order), as the dataset_stage_table of Snowflake"""
+        self.con.execute("DROP TABLE IF EXISTS dataset_stage_table")
+        paths = [path for _, path in files]
+        if all(path.endswith(".parquet") for path in paths):
+            listed = ", ".join("'" + p.replace("'", "''") + "'" for p in paths)
+            self.con.execute(f"""
+                CREATE TEMP TABLE dataset_stage_table AS
+                SELECT COLUMNS(* EXCLUDE (filename, file_row_number))::VARCHAR
+                FROM read_parquet([{listed}], union_by_name=true, filename=true, file_row_number=true)
+                ORDER BY list_position([{listed}], filename), file_row_number""")
+        else:
+            sources = " UNION ALL BY NAME ".join(f"SELECT * FROM {read_csv_sql(p)}" for p in paths)
+            self.con.execute(f"CREATE TEMP TABLE dataset_stage_table AS {sources}")
+        return self.con.execute("SELECT count(*) FROM dataset_stage_table").fetchone()[0]
+
+    def _clean(self):
+        """Batch cleaned on its own, one version per flight (the last one of the batch)"""
+        key = ", ".join(f"{c}" for c in KEY_COLUMNS)
+        self.con.execute("DROP TABLE IF EXISTS dataset_batch_table")
+        self.con.execute(f"""
+            CREATE TEMP TABLE dataset_batch_table AS
+            SELECT * REPLACE (upper(trim(ds_flight_code)) AS ds_flight_code, trim(ds_flight_date) AS ds_flight_date,
+                              upper(trim(ds_departure_airport_code)) AS ds_departure_airport_code)
+            FROM ({cleaning_sql("dataset_stage_table", "airline_ratings_raw", "airport_ratings_raw", KEY_COLUMNS)})
+            WHERE ds_flight_code IS NOT NULL AND ds_flight_date IS NOT NULL AND ds_departure_airport_code IS NOT NULL
+            QUALIFY row_number() OVER (PARTITION BY upper(trim(ds_flight_code)), trim(ds_flight_date),
+                                                    upper(trim(ds_departure_airport_code)) ORDER BY position DESC) = 1
+            ORDER BY position""")
+        rows = self.con.execute("SELECT count(*) FROM dataset_batch_table").fetchone()[0]
+        new = self.con.execute(f"SELECT count(*) FROM dataset_batch_table ANTI JOIN dataset_curated_table USING ({key})").fetchone()[0]
+        return rows, new
+
+    def _merge(self, sequence):
+        """MERGE of the batch into the curated table and of its min/max into the statistics"""
+        on = " AND ".join(f"c.{k} = b.{k}" for k in KEY_COLUMNS)
+        updates = ", ".join(f"{c} = b.{c}" for c in CURATED_COLUMNS if c not in KEY_COLUMNS)
+        inserted = ", ".join(f"b.{c}" for c in CURATED_COLUMNS)
+        self.con.execute(f"""
+            MERGE INTO dataset_curated_table c
+            USING (SELECT *, {sequence} AS ds_load_sequence, position AS ds_position FROM dataset_batch_table) b
+            ON {on}
+            WHEN MATCHED THEN UPDATE SET {updates}, ds_load_sequence = b.ds_load_sequence, ds_position = b.ds_position
+            WHEN NOT MATCHED THEN INSERT ({", ".join(CURATED_COLUMNS)}, ds_load_sequence, ds_position, ds_first_sequence)
+                                  VALUES ({inserted}, b.ds_load_sequence, b.ds_position, b.ds_load_sequence)""")
+        self._merge_stats("dataset_batch_table", widen=True)
+
+    def _merge_stats(self, relation, widen):
+        """Min/max of the ratings of a relation merged into the statistics (widened, or replaced by a full recomputation)"""
+        batch = " UNION ALL ".join(f"SELECT '{c}' AS column_name, MIN({c}) AS min_value, MAX({c}) AS max_value FROM {relation}"
+                                   for c in NORMALIZED_COLUMNS)
+        update = ("min_value = LEAST(t.min_value, b.min_value), max_value = GREATEST(t.max_value, b.max_value)" if widen
+                  else "min_value = b.min_value, max_value = b.max_value")
+        self.con.execute(f"""
+            MERGE INTO normalization_stats_table t
+            USING ({batch}) b
+            ON t.column_name = b.column_name
+            WHEN MATCHED AND b.min_value IS NOT NULL THEN UPDATE SET {update}
+            WHEN NOT MATCHED AND b.min_value IS NOT NULL THEN INSERT VALUES (b.column_name, b.min_value, b.max_value)""")
+
+    def refresh(self, source=SINK_DIR):
+        """
+        PURPOSE :
+            Load the new files of the source : staging, cleaning of the batch, MERGE into the curated table,
+            update of the statistics of normalization, load metadata (one transaction)
+        ARGS:
+            source (str) : Parquet sink of the ETL or raw CSV file
+        RETURNS:
+            dict: Files and rows of the batch, flights inserted and replaced, rows of the curated table, duration
+        """
+        start = time.perf_counter()
+        files = self.pending_files(source)
+        result = {"files": len(files), "staged_rows": 0, "batch_rows": 0, "inserted": 0, "replaced": 0}
+        if files:
+            self.con.begin()
+            try:
+                sequence = self.con.execute("SELECT COALESCE(MAX(load_sequence), 0) + 1 FROM loaded_files_table").fetchone()[0]
+                result["staged_rows"] = self._stage(files)
+                result["batch_rows"], result["inserted"] = self._clean()
+                result["replaced"] = result["batch_rows"] - result["inserted"]
+                self._merge(sequence)
+                self.con.executemany("INSERT INTO loaded_files_table VALUES (?, ?, current_timestamp)",
+                                     [(name, sequence) for name, _ in files])
+                self.con.commit()
+            except Exception:
+                self.con.rollback()
+                raise
+        result["curated_rows"] = self.con.execute("SELECT count(*) FROM dataset_curated_table").fetchone()[0]
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    def rebuild_stats(self):
+        """Exact min/max over the curated table (the statistics only widen when a replaced flight held an extreme)"""
+        self._merge_stats("dataset_curated_table", widen=False)
+
+    def export(self, output_path):
+        """Training dataset from the view, formatted as Flight-delay_dataset_post_traitement.csv (load order)"""
+        columns = ",\n".join(norm_text_sql(c) + f" AS {c.upper()}" if c.endswith("_norm") else f"{c} AS {c.upper()}"
+                             for c in OUTPUT_COLUMNS)
+        output = output_path.replace("'", "''")
+        return self.con.execute(f"""
+            COPY (SELECT {columns} FROM dataset_post_traitement_view ORDER BY ds_load_sequence, ds_position)
+            TO '{output}' (HEADER, DELIMITER ',', QUOTE '')""").fetchone()[0]
+
+    def close(self):
+        self.con.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chargement incrémental du dataset dans l'entrepôt local (équivalent de incremental_load.sql)")
+    parser.add_argument("--source", default=SINK_DIR, help="Dataset partitionné de l'ETL (parquet) ou fichier csv brut")
+    parser.add_argument("--db", default=WAREHOUSE_PATH, help="Base DuckDB de l'entrepôt local")
+    parser.add_argument("--export", default=None, help="Export du dataset d'entraînement (Flight-delay_dataset_post_traitement.csv)")
+    parser.add_argument("--rebuild-stats", action="store_true", help="Recalcul complet des min/max de normalisation")
+    args = parser.parse_args()
+
+    warehouse = IncrementalWarehouse(args.db)
+    result = warehouse.refresh(args.source)
+    print(f"✅ {result['files']} fichier(s) nouveaux | {result['staged_rows']} lignes chargées | {result['batch_rows']} nettoyées | "
+          f"{result['inserted']} vols ajoutés, {result['replaced']} remplacés | {result['curated_rows']} vols au total "
+          f"({result['seconds']:.2f} s)")
+    if args.rebuild_stats:
+        warehouse.rebuild_stats()
+    if args.export:
+        rows = warehouse.export(args.export)
+        print(f"✅ {rows} lignes exportées -> {args.export}")
+    warehouse.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+-- Activation du warehouse
+USE WAREHOUSE Warehouse_dst;
+-- Activation base de données et schema
+USE DATABASE flight_delay_db;
+USE SCHEMA flight_delay_sch;
+
+-- Chargement incrémental : seuls les nouveaux fichiers des lots validés de l'ETL (Flight-delay_dataset/, parquet, listés
+-- dans ses manifestes _manifest_<writer>.jsonl) sont chargés,
+-- nettoyées (mêmes règles que transformation.sql) puis fusionnées dans la table nettoyée sur la clé naturelle du vol
+-- (code de vol, date, aéroport de départ). Le coût d'un rafraîchissement dépend des nouvelles lignes uniquement.
+-- Pré-requis : setup.sql (stage, tables des notes) et les parties AIRLINE_RATING_TABLE / AIRPORT_RATING_TABLE de transformation.sql (notes numériques)
+-- Equivalent local (DuckDB) : incremental_load.py
+
+
+-------------------------------------------------------------------------
+-- TABLES (une seule fois)
+-------------------------------------------------------------------------
+
+-- Table de chargement : colonnes brutes utiles de l'ETL (types de setup.sql) + fichier et ligne d'origine
+CREATE TABLE IF NOT EXISTS dataset_stage_table (
+    ds_flight_code VARCHAR,
+    ds_flight_date VARCHAR,
+    ds_airline_code VARCHAR(2),
+    ds_departure_airport_code VARCHAR(3),
+    ds_arrival_airport_code VARCHAR(3),
+    ds_flight_duration VARCHAR,
+    ds_departure_airport_temp_cel NUMBER(5,2),
+    ds_departure_airport_rain_mmHour NUMBER(5,2),
+    ds_departure_airport_wind_kmh NUMBER(5,2),
+    ds_departure_airport_vis_km NUMBER(5,2),
+    ds_arrival_airport_temp_cel NUMBER(5,2),
+    ds_arrival_airport_rain_mmHour NUMBER(5,2),
+    ds_arrival_airport_wind_kmh NUMBER(5,2),
+    ds_arrival_airport_vis_km NUMBER(5,2),
+    ds_prev_delay_min NUMBER(6,2),
+    ds_final_delay_min NUMBER(6,2),
+    ds_file_name VARCHAR,
+    ds_file_row NUMBER
+);
+
+-- Table nettoyée : une ligne par vol, notes non normalisées
+CREATE TABLE IF NOT EXISTS dataset_curated_table (
+    ds_flight_code VARCHAR,
+    ds_flight_date VARCHAR,
+    ds_departure_airport_code VARCHAR(3),
+    ds_airline_code VARCHAR(2),
+    ds_arrival_airport_code VARCHAR(3),
+    ds_departure_airport_temp_cel NUMBER(5,2),
+    ds_departure_airport_rain_mmHour NUMBER(5,2),
+    ds_departure_airport_wind_kmh NUMBER(5,2),
+    ds_departure_airport_vis_km NUMBER(5,2),
+    ds_arrival_airport_temp_cel NUMBER(5,2),
+    ds_arrival_airport_rain_mmHour NUMBER(5,2),
+    ds_arrival_airport_wind_kmh NUMBER(5,2),
+    ds_arrival_airport_vis_km NUMBER(5,2),
+    ds_prev_delay_min NUMBER(6,2),
+    ds_final_delay_min NUMBER(6,2),
+    ds_flight_duration_min NUMBER,
+    ds_airline_rating NUMBER(3,1),
+    ds_departure_airport_rating NUMBER(3,1),
+    ds_arrival_airport_rating NUMBER(3,1),
+    ds_loaded_at TIMESTAMP_NTZ,
+    ds_first_loaded_at TIMESTAMP_NTZ,
+    PRIMARY KEY (ds_flight_code, ds_flight_date, ds_departure_airport_code)
+);
+
+-- Premier chargement de chaque vol (non modifié quand le vol est remplacé : résumés du dashboard, dashboard_summaries.sql)
+ALTER TABLE dataset_curated_table ADD COLUMN IF NOT EXISTS ds_first_loaded_at TIMESTAMP_NTZ;
+-- Vols chargés avant l'ajout de la colonne : premier chargement inconnu -> chargement de leur version actuelle
+UPDATE dataset_curated_table SET ds_first_loaded_at = ds_loaded_at WHERE ds_first_loaded_at IS NULL;
+
+-- Métadonnées de chargement : fichiers des manifestes déjà chargés (les fichiers d'un lot non validé ne sont jamais listés)
+CREATE TABLE IF NOT EXISTS loaded_files_table (
+    file_name VARCHAR PRIMARY KEY,
+    loaded_at TIMESTAMP_NTZ
+);
+
+-- Lecture des manifestes ligne par ligne (une entrée JSON par lot validé, dernière ligne tronquée par un crash ignorée)
+CREATE FILE FORMAT IF NOT EXISTS manifest_line_format
+    TYPE = 'CSV'
+    FIELD_DELIMITER = NONE
+    ESCAPE_UNENCLOSED_FIELD = NONE;
+
+-- Statistiques de normalisation : min/max de chaque note, mis à jour à chaque rafraîchissement
+CREATE TABLE IF NOT EXISTS normalization_stats_table (
+    column_name VARCHAR PRIMARY KEY,
+    min_value NUMBER(3,1),
+    max_value NUMBER(3,1)
+);
+
+-- Dataset d'entraînement : normalisation calculée à la lecture avec les statistiques (plus de UPDATE sur toute la table)
+CREATE OR REPLACE VIEW dataset_post_traitement_view AS
+SELECT
+    c.ds_airline_code, c.ds_departure_airport_code, c.ds_arrival_airport_code,
+    c.ds_departure_airport_temp_cel, c.ds_departure_airport_rain_mmHour, c.ds_departure_airport_wind_kmh, c.ds_departure_airport_vis_km,
+    c.ds_arrival_airport_temp_cel, c.ds_arrival_airport_rain_mmHour, c.ds_arrival_airport_wind_kmh, c.ds_arrival_airport_vis_km,
+    c.ds_prev_delay_min, c.ds_final_delay_min, c.ds_flight_duration_min,
+    CAST((c.ds_airline_rating - al.min_value) / NULLIF(al.max_value - al.min_value, 0) AS FLOAT) AS ds_airline_rating_norm,
+    CAST((c.ds_departure_airport_rating - dep.min_value) / NULLIF(dep.max_value - dep.min_value, 0) AS FLOAT) AS ds_departure_airport_rating_norm,
+    CAST((c.ds_arrival_airport_rating - arr.min_value) / NULLIF(arr.max_value - arr.min_value, 0) AS FLOAT) AS ds_arrival_airport_rating_norm
+FROM dataset_curated_table c
+CROSS JOIN (SELECT min_value, max_value FROM normalization_stats_table WHERE column_name = 'ds_airline_rating') al
+CROSS JOIN (SELECT min_value, max_value FROM normalization_stats_table WHERE column_name = 'ds_departure_airport_rating') dep
+CROSS JOIN (SELECT min_value, max_value FROM normalization_stats_table WHERE column_name = 'ds_arrival_airport_rating') arr;
+
+
+-------------------------------------------------------------------------
+-- RAFRAICHISSEMENT (à chaque nouvelle passe de l'ETL)
+-------------------------------------------------------------------------
+
+-- ETAPE 1 : Fichiers des lots validés pas encore chargés, dans l'ordre de validation (comme incremental_load.py) :
+-- entrées des manifestes triées par validation, puis fichiers dans l'ordre de l'entrée
+-- (un fichier présent sur le stage mais absent des manifestes appartient à un lot en cours ou échoué : jamais chargé)
+CREATE OR REPLACE TEMPORARY TABLE dataset_pending_files_table AS
+WITH entries AS (
+    SELECT TRY_PARSE_JSON(m.$1) AS entry
+    FROM @FLIGHT_DELAY_SCH/Flight-delay_dataset/ (FILE_FORMAT => 'manifest_line_format', PATTERN => '.*_manifest_[^/]*[.]jsonl') m
+),
+files AS (
+    SELECT
+        f.value:path::VARCHAR AS ds_file_path,
+        e.entry:committed_at::FLOAT AS committed_at,
+        e.entry:writer::VARCHAR AS writer,
+        e.entry:batch::NUMBER AS batch,
+        f.index AS file_index
+    FROM entries e, LATERAL FLATTEN(input => e.entry:files) f
+    WHERE e.entry IS NOT NULL
+)
+SELECT ds_file_path, ROW_NUMBER() OVER (ORDER BY committed_at, writer, batch, file_index) AS ds_file_order
+FROM files
+WHERE ds_file_path NOT IN (SELECT file_name FROM loaded_files_table)
+QUALIFY ROW_NUMBER() OVER (PARTITION BY ds_file_path ORDER BY committed_at) = 1;
+
+-- ETAPE 2 : Chargement de ces fichiers uniquement (FILES, 1000 fichiers max par COPY INTO)
+-- FORCE : loaded_files_table décide des fichiers à charger, pas les métadonnées de COPY INTO
+-- (un fichier copié sur le stage avant la validation de son lot doit être chargé une fois le lot validé)
+DELETE FROM dataset_stage_table;
+EXECUTE IMMEDIATE $$
+DECLARE
+    chunks CURSOR FOR
+        SELECT LISTAGG('''' || ds_file_path || '''', ', ') AS files
+        FROM dataset_pending_files_table
+        GROUP BY FLOOR((ds_file_order - 1) / 1000);
+BEGIN
+    FOR chunk IN chunks DO
+        LET copy_sql VARCHAR := 'COPY INTO dataset_stage_table FROM @FLIGHT_DELAY_SCH/Flight-delay_dataset/ '
+            || 'FILES = (' || chunk.files || ') '
+            || 'FILE_FORMAT = (TYPE = ''PARQUET'') MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE '
+            || 'INCLUDE_METADATA = (ds_file_name = METADATA$FILENAME, ds_file_row = METADATA$FILE_ROW_NUMBER) '
+            || 'FORCE = TRUE ON_ERROR = ''CONTINUE''';
+        EXECUTE IMMEDIATE :copy_sql;
+    END FOR;
+END;
+$$;
+
+-- ETAPE 3 : Nettoyage du lot seul (jointures des notes, lignes vides, durée en min, imputation par médiane, valeurs aberrantes)
+-- Une version par vol : la dernière validée du lot (ordre des fichiers dans les manifestes puis ligne du fichier, pas le nom
+-- du fichier : part-<writer>-<seq> ne suit pas l'ordre de validation entre plusieurs writers)
+CREATE OR REPLACE TEMPORARY TABLE dataset_batch_table AS
+WITH medians AS (
+    SELECT
+        (SELECT MEDIAN(ponctuality_rating) FROM airline_rating_table WHERE ponctuality_rating IS NOT NULL) AS airline,
+        (SELECT MEDIAN(ponctuality_rating) FROM airport_rating_table WHERE ponctuality_rating IS NOT NULL) AS airport
+)
+SELECT
+    UPPER(TRIM(s.ds_flight_code)) AS ds_flight_code,
+    TRIM(s.ds_flight_date) AS ds_flight_date,
+    UPPER(TRIM(s.ds_departure_airport_code)) AS ds_departure_airport_code,
+    s.ds_airline_code, s.ds_arrival_airport_code,
+    s.ds_departure_airport_temp_cel, s.ds_departure_airport_rain_mmHour, s.ds_departure_airport_wind_kmh, s.ds_departure_airport_vis_km,
+    s.ds_arrival_airport_temp_cel, s.ds_arrival_airport_rain_mmHour, s.ds_arrival_airport_wind_kmh, s.ds_arrival_airport_vis_km,
+    s.ds_prev_delay_min, s.ds_final_delay_min,
+    CAST(SPLIT_PART(s.ds_flight_duration, ':', 1) AS INT) * 60 + CAST(SPLIT_PART(s.ds_flight_duration, ':', 2) AS INT) AS ds_flight_duration_min,
+    CAST(COALESCE(al.ponctuality_rating, m.airline) AS NUMBER(3,1)) AS ds_airline_rating,
+    CAST(COALESCE(dep.ponctuality_rating, m.airport) AS NUMBER(3,1)) AS ds_departure_airport_rating,
+    CAST(COALESCE(arr.ponctuality_rating, m.airport) AS NUMBER(3,1)) AS ds_arrival_airport_rating,
+    CURRENT_TIMESTAMP()::TIMESTAMP_NTZ AS ds_loaded_at
+FROM dataset_stage_table s
+JOIN dataset_pending_files_table p ON s.ds_file_name = 'Flight-delay_dataset/' || p.ds_file_path
+CROSS JOIN medians m
+LEFT JOIN airline_rating_table al ON s.ds_airline_code = al.iata_airline_code
+LEFT JOIN airport_rating_table dep ON s.ds_departure_airport_code = dep.iata_airport_code
+LEFT JOIN airport_rating_table arr ON s.ds_arrival_airport_code = arr.iata_airport_code
+WHERE s.ds_prev_delay_min IS NOT NULL
+  AND s.ds_final_delay_min IS NOT NULL
+  AND s.ds_arrival_airport_vis_km IS NOT NULL
+  AND s.ds_arrival_airport_wind_kmh IS NOT NULL
+  AND s.ds_arrival_airport_rain_mmHour IS NOT NULL
+  AND s.ds_arrival_airport_temp_cel IS NOT NULL
+  AND s.ds_departure_airport_vis_km IS NOT NULL
+  AND s.ds_departure_airport_wind_kmh IS NOT NULL
+  AND s.ds_departure_airport_rain_mmHour IS NOT NULL
+  AND s.ds_departure_airport_temp_cel IS NOT NULL
+  AND TRIM(COALESCE(s.ds_flight_duration, '')) <> ''
+  AND s.ds_final_delay_min BETWEEN -550 AND 550
+  AND s.ds_prev_delay_min BETWEEN -550 AND 550
+QUALIFY ROW_NUMBER() OVER (
+    PARTITION BY UPPER(TRIM(s.ds_flight_code)), TRIM(s.ds_flight_date), UPPER(TRIM(s.ds_departure_airport_code))
+    ORDER BY p.ds_file_order DESC, s.ds_file_row DESC) = 1;
+
+-- ETAPES 4 à 6 : une seule transaction (fusion, statistiques et métadonnées de chargement validées ensemble)
+BEGIN TRANSACTION;
+
+-- ETAPE 4 : Fusion dans la table nettoyée sur la clé naturelle (nouveau vol inséré, vol connu remplacé)
+MERGE INTO dataset_curated_table c
+USING dataset_batch_table b
+ON c.ds_flight_code = b.ds_flight_code
+   AND c.ds_flight_date = b.ds_flight_date
+   AND c.ds_departure_airport_code = b.ds_departure_airport_code
+WHEN MATCHED THEN UPDATE SET
+    ds_airline_code = b.ds_airline_code,
+    ds_arrival_airport_code = b.ds_arrival_airport_code,
+    ds_departure_airport_temp_cel = b.ds_departure_airport_temp_cel,
+    ds_departure_airport_rain_mmHour = b.ds_departure_airport_rain_mmHour,
+    ds_departure_airport_wind_kmh = b.ds_departure_airport_wind_kmh,
+    ds_departure_airport_vis_km = b.ds_departure_airport_vis_km,
+    ds_arrival_airport_temp_cel = b.ds_arrival_airport_temp_cel,
+    ds_arrival_airport_rain_mmHour = b.ds_arrival_airport_rain_mmHour,
+    ds_arrival_airport_wind_kmh = b.ds_arrival_airport_wind_kmh,
+    ds_arrival_airport_vis_km = b.ds_arrival_airport_vis_km,
+    ds_prev_delay_min = b.ds_prev_delay_min,
+    ds_final_delay_min = b.ds_final_delay_min,
+    ds_flight_duration_min = b.ds_flight_duration_min,
+    ds_airline_rating = b.ds_airline_rating,
+    ds_departure_airport_rating = b.ds_departure_airport_rating,
+    ds_arrival_airport_rating = b.ds_arrival_airport_rating,
+    ds_loaded_at = b.ds_loaded_at
+WHEN NOT MATCHED THEN INSERT VALUES (
+    b.ds_flight_code, b.ds_flight_date, b.ds_departure_airport_code, b.ds_airline_code, b.ds_arrival_airport_code,
+    b.ds_departure_airport_temp_cel, b.ds_departure_airport_rain_mmHour, b.ds_departure_airport_wind_kmh, b.ds_departure_airport_vis_km,
+    b.ds_arrival_airport_temp_cel, b.ds_arrival_airport_rain_mmHour, b.ds_arrival_airport_wind_kmh, b.ds_arrival_airport_vis_km,
+    b.ds_prev_delay_min, b.ds_final_delay_min, b.ds_flight_duration_min,
+    b.ds_airline_rating, b.ds_departure_airport_rating, b.ds_arrival_airport_rating, b.ds_loaded_at, b.ds_loaded_at);
+
+-- ETAPE 5 : Mise à jour des statistiques de normalisation avec le min/max du lot
+MERGE INTO normalization_stats_table t
+USING (
+    SELECT 'ds_airline_rating' AS column_name, MIN(ds_airline_rating) AS min_value, MAX(ds_airline_rating) AS max_value FROM dataset_batch_table
+    UNION ALL
+    SELECT 'ds_departure_airport_rating', MIN(ds_departure_airport_rating), MAX(ds_departure_airport_rating) FROM dataset_batch_table
+    UNION ALL
+    SELECT 'ds_arrival_airport_rating', MIN(ds_arrival_airport_rating), MAX(ds_arrival_airport_rating) FROM dataset_batch_table
+) b
+ON t.column_name = b.column_name
+WHEN MATCHED AND b.min_value IS NOT NULL THEN UPDATE SET
+    min_value = LEAST(t.min_value, b.min_value),
+    max_value = GREATEST(t.max_value, b.max_value)
+WHEN NOT MATCHED AND b.min_value IS NOT NULL THEN INSERT (column_name, min_value, max_value) VALUES (b.column_name, b.min_value, b.max_value);
+
+-- ETAPE 6 : Fichiers du lot enregistrés comme chargés, table de chargement vidée
+INSERT INTO loaded_files_table (file_name, loaded_at)
+SELECT ds_file_path, CURRENT_TIMESTAMP()::TIMESTAMP_NTZ FROM dataset_pending_files_table;
+DELETE FROM dataset_stage_table;
+
+COMMIT;
+
+
+-------------------------------------------------------------------------
+-- RECALCUL COMPLET DES STATISTIQUES (optionnel)
+-------------------------------------------------------------------------
+-- Un vol remplacé peut avoir porté le min ou le max d'une note : les statistiques restent alors plus larges
+-- que les données (normalisation toujours dans [0, 1]). Recalcul exact sur la table nettoyée si besoin.
+-- MERGE INTO normalization_stats_table t
+-- USING (
+--     SELECT 'ds_airline_rating' AS column_name, MIN(ds_airline_rating) AS min_value, MAX(ds_airline_rating) AS max_value FROM dataset_curated_table
+--     UNION ALL
+--     SELECT 'ds_departure_airport_rating', MIN(ds_departure_airport_rating), MAX(ds_departure_airport_rating) FROM dataset_curated_table
+--     UNION ALL
+--     SELECT 'ds_arrival_airport_rating', MIN(ds_arrival_airport_rating), MAX(ds_arrival_airport_rating) FROM dataset_curated_table
+-- ) b
+-- ON t.column_name = b.column_name
+-- WHEN MATCHED THEN UPDATE SET min_value = b.min_value, max_value = b.max_value
+-- WHEN NOT MATCHED THEN INSERT (column_name, min_value, max_value) VALUES (b.column_name, b.min_value, b.max_value);
+
+
+-- Verification finale
+SELECT COUNT(*) AS nb_vols FROM dataset_curated_table;
+SELECT * FROM normalization_stats_table;
+SELECT * FROM dataset_post_traitement_view LIMIT 5;
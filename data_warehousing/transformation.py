@@ -0,0 +1,253 @@
+import argparse
+import os
+import time
+
+import duckdb
+import pandas as pd
+
+
+#=====================================================================
+# HEADER COMMENT BLOCK
+#=====================================================================
+'''
+Local engine of the warehouse transformation (DuckDB, in process) : same logic as setup.sql (ingestion) and
+transformation.sql (cleaning), run as one vectorized query over the raw ETL dataset instead of a dozen
+DELETE/UPDATE passes on Snowflake. Produces Flight-delay_dataset_post_traitement.csv (training set) locally.
+
+Usage : python transformation.py [--input Flight-delay_dataset_pre_traitement.csv] [--output Flight-delay_dataset_post_traitement.csv]
+'''
+
+
+#=====================================================================
+# CONFIGURATION TRANSFORMATION
+#=====================================================================
+
+# FILES : Raw dataset of the ETL, ratings of AirHelp, cleaned dataset
+DATASET_PATH = "Flight-delay_dataset_pre_traitement.csv"
+AIRLINE_RATINGS_PATH = os.path.join(os.path.dirname(__file__), "..", "pipeline_etl", "Data", "Flight-delay_airlines-ratings.csv")
+AIRPORT_RATINGS_PATH = os.path.join(os.path.dirname(__file__), "..", "pipeline_etl", "Data", "Flight-delay_airports-ratings.csv")
+OUTPUT_PATH = "Flight-delay_dataset_post_traitement.csv"
+
+# FILE FORMAT : Values read as NULL (flight_delay_fileformat of setup.sql)
+NULL_VALUES = ["NULL", "null", "", "-", "--", "__"]
+
+# OUTLIERS : Delays kept (ETAPE 7 of transformation.sql)
+DELAY_LIMIT_MIN = 550
+
+# TYPES : Numeric columns of dataset_table (setup.sql), a row whose value does not fit is not loaded (ON_ERROR = 'CONTINUE')
+DATASET_TYPES = {
+    "ds_airline_rating": "DECIMAL(3,1)",
+    "ds_departure_airport_rating": "DECIMAL(3,1)",
+    "ds_arrival_airport_rating": "DECIMAL(3,1)",
+    "ds_departure_airport_lat": "DECIMAL(9,6)",
+    "ds_departure_airport_long": "DECIMAL(9,6)",
+    "ds_arrival_airport_lat": "DECIMAL(9,6)",
+    "ds_arrival_airport_long": "DECIMAL(9,6)",
+    "ds_departure_airport_temp_cel": "DECIMAL(5,2)",
+    "ds_departure_airport_rain_mmhour": "DECIMAL(5,2)",
+    "ds_departure_airport_wind_kmh": "DECIMAL(5,2)",
+    "ds_departure_airport_vis_km": "DECIMAL(5,2)",
+    "ds_arrival_airport_temp_cel": "DECIMAL(5,2)",
+    "ds_arrival_airport_rain_mmhour": "DECIMAL(5,2)",
+    "ds_arrival_airport_wind_kmh": "DECIMAL(5,2)",
+    "ds_arrival_airport_vis_km": "DECIMAL(5,2)",
+    "ds_prev_delay_min": "DECIMAL(6,2)",
+    "ds_final_delay_min": "DECIMAL(6,2)",
+}
+
+# CODES : Maximum length of the code columns (VARCHAR(n) of setup.sql)
+DATASET_CODE_LENGTHS = {"ds_airline_code": 2, "ds_departure_airport_code": 3, "ds_arrival_airport_code": 3}
+
+# REQUIRED : Columns whose empty rows are deleted (ETAPE 4 of transformation.sql)
+REQUIRED_COLUMNS = [
+    "ds_prev_delay_min", "ds_final_delay_min",
+    "ds_arrival_airport_vis_km", "ds_arrival_airport_wind_kmh", "ds_arrival_airport_rain_mmhour", "ds_arrival_airport_temp_cel",
+    "ds_departure_airport_vis_km", "ds_departure_airport_wind_kmh", "ds_departure_airport_rain_mmhour", "ds_departure_airport_temp_cel",
+    "ds_flight_duration",
+]
+
+# OUTPUT : Columns of the cleaned dataset, in the order of dataset_table at the end of transformation.sql
+OUTPUT_COLUMNS = [
+    "ds_airline_code", "ds_departure_airport_code", "ds_arrival_airport_code",
+    "ds_departure_airport_temp_cel", "ds_departure_airport_rain_mmhour", "ds_departure_airport_wind_kmh", "ds_departure_airport_vis_km",
+    "ds_arrival_airport_temp_cel", "ds_arrival_airport_rain_mmhour", "ds_arrival_airport_wind_kmh", "ds_arrival_airport_vis_km",
+    "ds_prev_delay_min", "ds_final_delay_min", "ds_flight_duration_min",
+    "ds_airline_rating_norm", "ds_departure_airport_rating_norm", "ds_arrival_airport_rating_norm",
+]
+
+# NORMALIZATION : Ratings normalized with min/max (ETAPE 7 bis of transformation.sql)
+NORMALIZED_COLUMNS = ["ds_airline_rating", "ds_departure_airport_rating", "ds_arrival_airport_rating"]
+
+
+#=====================================================================
+# QUERIES
+#=====================================================================
+
+def read_csv_sql(path):
+    """Raw reading of a CSV of the project (every column as text, NULL_IF of the file format)"""
+    nulls = ", ".join(f"'{v}'" for v in NULL_VALUES)
+    path = path.replace("'", "''")
+    return f"read_csv('{path}', delim=';', quote='\"', header=true, all_varchar=true, nullstr=[{nulls}])"
+
+
+def register_ratings(con, airline_ratings_path=AIRLINE_RATINGS_PATH, airport_ratings_path=AIRPORT_RATINGS_PATH):
+    """Raw ratings files as the relations airline_ratings_raw and airport_ratings_raw (latin-1, read as the ETL does)"""
+    for name, path in [("airline_ratings_raw", airline_ratings_path), ("airport_ratings_raw", airport_ratings_path)]:
+        df = pd.read_csv(path, encoding="latin-1", sep=";", dtype=str, keep_default_na=False, na_values=NULL_VALUES)
+        con.register(name, df)
+
+
+def ratings_sql(source, code_column, code_length):
+    """
+    PURPOSE :
+        Ratings table after ingestion and conversion str->float (AIRLINE_RATING_TABLE / AIRPORT_RATING_TABLE of transformation.sql)
+    ARGS:
+        source (str) : Relation of the raw ratings
+        code_column (str) : IATA code column
+        code_length (int) : Maximum length of the code (VARCHAR(n))
+    RETURNS:
+        str: Query with the columns code, rating and position (file order)
+    """
+    return f"""
+        SELECT {code_column} AS code,
+               CAST(CAST(REPLACE(ponctuality_rating, ',', '.') AS DECIMAL(10,1)) AS DECIMAL(3,1)) AS rating,
+               row_number() OVER () AS position
+        FROM {source}
+        WHERE {code_column} IS NULL OR length({code_column}) <= {code_length}
+    """
+
+
+def norm_text_sql(expr):
+    """Normalized value as text, formatted as the FLOAT of the Snowflake export (7 decimals at most, no trailing zero)"""
+    return f"rtrim(rtrim(CAST(CAST(ROUND({expr}, 7) AS DECIMAL(8,7)) AS VARCHAR), '0'), '.')"
+
+
+def cleaning_sql(dataset, airline_ratings, airport_ratings, key_columns=()):
+    """
+    PURPOSE :
+        One query doing the ingestion of setup.sql and the row-level steps of transformation.sql :
+        joins of the ratings, deletion of the empty rows, flight duration in minutes, median imputation,
+        deletion of the outliers. Every step depends on the row alone (and the ratings tables), so a batch
+        of new rows can be cleaned on its own.
+    ARGS:
+        dataset (str) : Relation of the raw dataset (all the columns as text)
+        airline_ratings (str) : Relation of the raw airline ratings
+        airport_ratings (str) : Relation of the raw airport ratings
+        key_columns (tuple) : Raw columns kept as is in addition (natural key of the flights)
+    RETURNS:
+        str: Query of the cleaned rows (position in the input, key columns, OUTPUT_COLUMNS with the ratings not normalized)
+    """
+    typed = ",\n".join(f"TRY_CAST({c} AS {t}) AS {c}" for c, t in DATASET_TYPES.items() if c not in NORMALIZED_COLUMNS)
+    loadable = " AND ".join([f"({c} IS NULL OR TRY_CAST({c} AS {t}) IS NOT NULL)" for c, t in DATASET_TYPES.items()]
+                            + [f"({c} IS NULL OR length({c}) <= {n})" for c, n in DATASET_CODE_LENGTHS.items()])
+    required = " AND ".join(f"{c} IS NOT NULL" if c in DATASET_TYPES else f"TRIM(COALESCE({c}, '')) <> ''" for c in REQUIRED_COLUMNS)
+    keys = "".join(f"{c}, " for c in key_columns if c not in DATASET_CODE_LENGTHS)
+
+    return f"""
+    WITH
+    -- INGESTION : COPY INTO dataset_table, rows not fitting the types skipped (ON_ERROR = 'CONTINUE')
+    loaded AS (
+        SELECT row_number() OVER () AS position, {keys}ds_airline_code, ds_departure_airport_code, ds_arrival_airport_code,
+               ds_flight_duration,
+               {typed},
+               {loadable} AS loadable
+        FROM {dataset}
+    ),
+    airline_rating_table AS ({ratings_sql(airline_ratings, "IATA_airline_code", 2)}),
+    airport_rating_table AS ({ratings_sql(airport_ratings, "IATA_airport_code", 3)}),
+    -- ETAPE 1 : Joins of the ratings (first rating of the file for a code given twice)
+    airline_ratings AS (SELECT code, arg_min(rating, position) AS rating FROM airline_rating_table GROUP BY code),
+    airport_ratings AS (SELECT code, arg_min(rating, position) AS rating FROM airport_rating_table GROUP BY code),
+    -- ETAPE 6 : Medians of the ratings tables, rounded as the NUMBER(3,1) columns
+    medians AS (
+        SELECT (SELECT CAST(ROUND(median(CAST(rating * 10 AS INTEGER))) / 10 AS DECIMAL(3,1)) FROM airline_rating_table WHERE rating IS NOT NULL) AS airline,
+               (SELECT CAST(ROUND(median(CAST(rating * 10 AS INTEGER))) / 10 AS DECIMAL(3,1)) FROM airport_rating_table WHERE rating IS NOT NULL) AS airport
+    )
+    SELECT d.* EXCLUDE (loadable, ds_flight_duration),
+           -- ETAPE 5 : Flight duration "hh:mm" -> minutes
+           CAST(split_part(ds_flight_duration, ':', 1) AS INTEGER) * 60
+               + CAST(split_part(ds_flight_duration, ':', 2) AS INTEGER) AS ds_flight_duration_min,
+           COALESCE(al.rating, m.airline) AS ds_airline_rating,
+           COALESCE(dep.rating, m.airport) AS ds_departure_airport_rating,
+           COALESCE(arr.rating, m.airport) AS ds_arrival_airport_rating
+    FROM loaded d
+    CROSS JOIN medians m
+    LEFT JOIN airline_ratings al ON d.ds_airline_code = al.code
+    LEFT JOIN airport_ratings dep ON d.ds_departure_airport_code = dep.code
+    LEFT JOIN airport_ratings arr ON d.ds_arrival_airport_code = arr.code
+    -- ETAPE 4 : Empty rows / ETAPE 7 : Outliers of the delays
+    WHERE loadable AND {required}
+      AND ds_final_delay_min BETWEEN -{DELAY_LIMIT_MIN} AND {DELAY_LIMIT_MIN}
+      AND ds_prev_delay_min BETWEEN -{DELAY_LIMIT_MIN} AND {DELAY_LIMIT_MIN}
+    """
+
+
+def transformation_sql(dataset, airline_ratings, airport_ratings):
+    """
+    PURPOSE :
+        Whole transformation.sql in one query : cleaning of the rows, then min/max normalization over the rows kept
+    ARGS:
+        dataset (str) : Relation of the raw dataset (all the columns as text)
+        airline_ratings (str) : Relation of the raw airline ratings
+        airport_ratings (str) : Relation of the raw airport ratings
+    RETURNS:
+        str: Query of the cleaned dataset (columns of OUTPUT_COLUMNS, values formatted as the Snowflake export)
+    """
+    normalized = ",\n".join(
+        f"{norm_text_sql(f'CAST({c} - MIN({c}) OVER () AS DOUBLE) / NULLIF(MAX({c}) OVER () - MIN({c}) OVER (), 0)')} AS {c.upper()}_NORM"
+        for c in NORMALIZED_COLUMNS)
+    kept = ",\n".join(f"{c} AS {c.upper()}" for c in OUTPUT_COLUMNS if not c.endswith("_norm"))
+
+    return f"""
+    WITH cleaned AS ({cleaning_sql(dataset, airline_ratings, airport_ratings)})
+    -- ETAPE 7 bis : Min/max normalization over the rows kept
+    SELECT {kept},
+           {normalized}
+    FROM cleaned
+    ORDER BY position
+    """
+
+
+#=====================================================================
+# TRANSFORMATION
+#=====================================================================
+
+def transform(dataset_path=DATASET_PATH, output_path=OUTPUT_PATH, airline_ratings_path=AIRLINE_RATINGS_PATH,
+              airport_ratings_path=AIRPORT_RATINGS_PATH, con=None):
+    """
+    PURPOSE :
+        Build the cleaned dataset from the raw ETL dataset, locally (same result as setup.sql + transformation.sql)
+    ARGS:
+        dataset_path (str) : Raw dataset of the ETL (';' separated)
+        output_path (str) : Cleaned dataset written (',' separated, header in upper case as the Snowflake export)
+        airline_ratings_path (str) : Ratings of the airlines (AirHelp)
+        airport_ratings_path (str) : Ratings of the airports (AirHelp)
+        con (duckdb.DuckDBPyConnection) : Connection used (new in-memory database by default)
+    RETURNS:
+        dict: Rows read and written, duration
+    """
+    con = con or duckdb.connect()
+    start = time.perf_counter()
+    register_ratings(con, airline_ratings_path, airport_ratings_path)
+    query = transformation_sql(read_csv_sql(dataset_path), "airline_ratings_raw", "airport_ratings_raw")
+    output = output_path.replace("'", "''")
+    rows_out = con.execute(f"COPY ({query}) TO '{output}' (HEADER, DELIMITER ',', QUOTE '')").fetchone()[0]
+    seconds = time.perf_counter() - start
+    rows_in = con.execute(f"SELECT count(*) FROM {read_csv_sql(dataset_path)}").fetchone()[0]
+    return {"rows_in": rows_in, "rows_out": rows_out, "seconds": seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transformation locale du dataset (équivalent de transformation.sql)")
+    parser.add_argument("--input", default=DATASET_PATH, help="Dataset brut de l'ETL (csv ';')")
+    parser.add_argument("--output", default=OUTPUT_PATH, help="Dataset nettoyé pour l'entraînement")
+    parser.add_argument("--airline-ratings", default=AIRLINE_RATINGS_PATH, help="Notes des compagnies (AirHelp)")
+    parser.add_argument("--airport-ratings", default=AIRPORT_RATINGS_PATH, help="Notes des aéroports (AirHelp)")
+    args = parser.parse_args()
+
+    result = transform(args.input, args.output, args.airline_ratings, args.airport_ratings)
+    print(f"✅ {result['rows_out']} lignes conservées sur {result['rows_in']} -> {args.output} ({result['seconds']:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,12 @@ from sklearn.pipeline import Pipeline
 from sklearn.inspection import permutation_importance
 import matplotlib.pyplot as plt
 import joblib
+import os
+import sys
+
+# REGISTRY : Versioned models served by the API (api/fonc_model_registry.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from fonc_model_registry import ModelRegistry, GOLDEN_PREDICTION_COL, GOLDEN_ROWS
 
 # ==============================================================
 # DATASET LOADING
@@ -120,6 +126,16 @@ print(feature_importance_df.head(15))
 joblib.dump(model, "flight_delay_pipeline.joblib")
 print("Pipeline complet sauvegardé sous 'flight_delay_pipeline.joblib'")
 
+# REGISTRY : New version (artifact, metadata, golden set of test rows with their predictions), served once activated
+golden = X_test.head(GOLDEN_ROWS).copy()
+golden[GOLDEN_PREDICTION_COL] = model.predict(golden)
+registry_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api", "models")
+os.makedirs(registry_dir, exist_ok=True)
+version = ModelRegistry(registry_dir).publish("flight_delay_pipeline.joblib", mae=float(mae),
+                                              features=X.columns.tolist(), golden=golden)
+print(f"Version publiée dans le registre de l'API : {version}")
+print(f"Activation : python ../api/fonc_model_registry.py --registry ../api/models --activate-version {version}")
+
 
 # ==============================================================
 # DATA VISUALIZATION
@@ -0,0 +1,155 @@
+import argparse
+import json
+import time
+from collections import defaultdict
+
+import main as etl
+from fonc_http import configure_http, get_archive, set_reference_time, MODE_OFFLINE
+from fonc_negative_cache import set_negative_cache, NegativeCache
+
+
+#=====================================================================
+# HEADER COMMENT BLOCK
+#=====================================================================
+'''
+Benchmark of the ETL pipeline per flight code, fully offline.
+The pages and weather responses recorded in a raw archive (python main.py --archive-dir DIR, or
+FLIGHT_DELAY_HTTP_MODE=record) are replayed locally with an artificial latency per exchange.
+The breaks against rate limiting are skipped : the timings are the ones of the pipeline itself.
+
+Usage : python bench_etl.py --archive-dir DIR [--latency-ms 80] [--codes AF1234 TK1822] [--json results.json]
+'''
+
+#=====================================================================
+# STAGES TIMING
+#=====================================================================
+
+# STAGES : Functions of main.py timed (name in main.py -> stage reported)
+TIMED_FUNCTIONS = {
+    "scrape_flight_code": "scrape",
+    "transform_flight_data": "transform",
+    "delay": "final_delay",
+    "prev_delay": "prev_delay",
+    "airport_coordinate": "reference_joins",
+    "airport_rating": "reference_joins",
+    "airline_rating": "reference_joins",
+    "weather_dep_temp": "weather",
+    "weather_dep_vis": "weather",
+    "weather_dep_wind": "weather",
+    "weather_dep_rain": "weather",
+    "weather_arr_temp": "weather",
+    "weather_arr_vis": "weather",
+    "weather_arr_wind": "weather",
+    "weather_arr_rain": "weather",
+}
+
+stage_seconds = defaultdict(float)
+stage_calls = defaultdict(int)
+
+
+def timed(stage, func):
+    """Wrap a function of the pipeline to add its duration to the stage"""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stage_seconds[stage] += time.perf_counter() - start
+            stage_calls[stage] += 1
+    return wrapper
+
+
+def instrument_pipeline():
+    """Replace the functions of main.py by their timed version"""
+    for name, stage in TIMED_FUNCTIONS.items():
+        setattr(etl, name, timed(stage, getattr(etl, name)))
+
+
+#=====================================================================
+# BENCHMARK
+#=====================================================================
+
+def select_entries(codes=None):
+    """Last archived flight history page of each code (all the codes of the archive by default)"""
+    latest = {}
+    for entry in get_archive().entries(etl.FLIGHT_URL_PREFIX):
+        latest[entry["url"][len(etl.FLIGHT_URL_PREFIX):]] = entry
+    if codes:
+        missing = [c for c in codes if c not in latest]
+        if missing:
+            print(f"⚠️ Codes absents de l'archive : {missing}")
+        return [latest[c] for c in codes if c in latest]
+    return list(latest.values())
+
+
+def run_benchmark(entries, repeat=1):
+    """Process each archived code with the pipeline of main.py and return the results"""
+    num_codes = 0
+    num_rows = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for entry in entries:
+            code = entry["url"][len(etl.FLIGHT_URL_PREFIX):]
+            set_reference_time(entry["fetched_at"])
+            df_data_prov = etl.process_flight_code(code)
+            num_codes += 1
+            num_rows += 0 if df_data_prov is None else len(df_data_prov)
+    total_seconds = time.perf_counter() - start
+
+    return {
+        "codes": num_codes,
+        "rows": num_rows,
+        "total_seconds": total_seconds,
+        "codes_per_second": num_codes / total_seconds if total_seconds else None,
+        "rows_per_second": num_rows / total_seconds if total_seconds else None,
+        "stages": {
+            stage: {
+                "seconds": seconds,
+                "calls": stage_calls[stage],
+                "ms_per_code": 1000 * seconds / num_codes if num_codes else None,
+                "share": seconds / total_seconds if total_seconds else None,
+            }
+            for stage, seconds in sorted(stage_seconds.items(), key=lambda x: -x[1])
+        },
+    }
+
+
+def print_report(results, latency_ms):
+    print("\n" + "=" * 60)
+    print(f"BENCHMARK ETL (replay, latence {latency_ms} ms / échange)")
+    print("=" * 60)
+    print(f"{'Etape':<18}{'Total (s)':>12}{'ms / code':>12}{'Appels':>10}{'Part':>8}")
+    for stage, r in results["stages"].items():
+        print(f"{stage:<18}{r['seconds']:>12.3f}{r['ms_per_code']:>12.1f}{r['calls']:>10}{r['share']:>8.1%}")
+    print("-" * 60)
+    print(f"Codes : {results['codes']}  |  Lignes : {results['rows']}  |  Durée : {results['total_seconds']:.2f} s")
+    print(f"Débit : {results['codes_per_second']:.2f} codes/s  |  {results['rows_per_second']:.2f} lignes/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hors ligne du pipeline ETL par code de vol")
+    parser.add_argument("--archive-dir", required=True, help="Archive enregistrée (mode record)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latence artificielle par échange rejoué")
+    parser.add_argument("--codes", nargs="*", default=None, help="Codes à rejouer (tous les codes archivés par défaut)")
+    parser.add_argument("--repeat", type=int, default=1, help="Nombre de passages sur les codes")
+    parser.add_argument("--json", default=None, help="Fichier de sortie des résultats (JSON)")
+    args = parser.parse_args()
+
+    # REPLAY : Archive served locally, negative cache disabled (same work for each pass)
+    configure_http(MODE_OFFLINE, args.archive_dir, args.latency_ms)
+    set_negative_cache(NegativeCache(path=None, ttl_hours=0))
+    instrument_pipeline()
+
+    entries = select_entries(args.codes)
+    if not entries:
+        print("Aucune page de vol à rejouer dans l'archive")
+        return
+    results = run_benchmark(entries, args.repeat)
+    print_report(results, args.latency_ms)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+#=====================================================================
+# CONFIGURATION ARCHIVE
+#=====================================================================
+
+# INDEX : One JSON line per archived exchange (request key, url, fetch time, status, file)
+ARCHIVE_INDEX_FILE = "index.jsonl"
+
+# VOLATILE PARAMS : Ignored for the fallback lookup (depend on the date of the fetch)
+VOLATILE_PARAMS = ("past_days",)
+
+
+class ArchiveMissError(Exception):
+    """No archived exchange for the request (offline mode)"""
+
+
+def request_key(url, params=None, ignore=()):
+    """Build the key of a request from its URL and its sorted parameters"""
+    if not params:
+        return url
+    kept = {k: v for k, v in params.items() if k not in ignore}
+    return f"{url}?{json.dumps(kept, sort_keys=True, default=str)}"
+
+
+class ArchivedResponse:
+    """
+    PURPOSE :
+        Minimal response object built from an archived exchange, with the attributes used by the scrapers
+        (requests) and the Open-Meteo client (niquests)
+    """
+
+    def __init__(self, url, status_code, content, headers=None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.ok = status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"{self.status_code} Error for url: {self.url}")
+
+
+class RawArchive:
+    """
+    PURPOSE :
+        Local archive of the raw pages (Flightradar24) and weather responses (Open-Meteo) fetched by the ETL.
+        Each body is compressed (gzip) in a file keyed by the request and its fetch time, and referenced in an index.
+    ARGS:
+        root (str) : Directory of the archive
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.index_path = os.path.join(root, ARCHIVE_INDEX_FILE)
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._loose_entries = {}
+        os.makedirs(root, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """Load the index in memory (entries sorted by fetch time for each key)"""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    self._register(json.loads(line))
+
+    def _register(self, entry):
+        self._entries.setdefault(entry["key"], []).append(entry)
+        self._loose_entries.setdefault(entry["loose_key"], []).append(entry)
+
+    def store(self, url, params, status_code, content):
+        """Compress and archive the body of a response, then reference it in the index"""
+        key = request_key(url, params)
+        fetched_at = time.time()
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        rel_path = os.path.join(digest[:2], f"{digest}_{int(fetched_at * 1000)}.gz")
+        abs_path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+        with gzip.open(abs_path, "wb") as f:
+            f.write(content or b"")
+
+        entry = {
+            "key": key,
+            "loose_key": request_key(url, params, ignore=VOLATILE_PARAMS),
+            "url": url,
+            "params": params,
+            "fetched_at": fetched_at,
+            "status_code": status_code,
+            "file": rel_path,
+        }
+        with self._lock:
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+            self._register(entry)
+        return entry
+
+    def lookup(self, url, params=None, reference_time=None):
+        """
+        PURPOSE :
+            Find the archived exchange of a request. With a reference time, the first exchange fetched after it
+            is selected (the one of the same ETL pass), else the last one.
+        RETURNS:
+            dict: Index entry or None if the request was never archived
+        """
+        candidates = self._entries.get(request_key(url, params))
+        if not candidates:
+            candidates = self._loose_entries.get(request_key(url, params, ignore=VOLATILE_PARAMS))
+        if not candidates:
+            return None
+        if reference_time is not None:
+            for entry in candidates:
+                if entry["fetched_at"] >= reference_time:
+                    return entry
+        return candidates[-1]
+
+    def read(self, entry):
+        """Return the archived response of an index entry"""
+        with gzip.open(os.path.join(self.root, entry["file"]), "rb") as f:
+            content = f.read()
+        return ArchivedResponse(entry["url"], entry["status_code"], content)
+
+    def entries(self, url_prefix=""):
+        """Return all the index entries whose URL starts with the prefix, sorted by fetch time"""
+        selected = [e for entries in self._entries.values() for e in entries if e["url"].startswith(url_prefix)]
+        return sorted(selected, key=lambda e: e["fetched_at"])
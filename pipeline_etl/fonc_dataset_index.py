@@ -0,0 +1,70 @@
+import hashlib
+import threading
+
+
+#=====================================================================
+# CONFIGURATION INDEX
+#=====================================================================
+
+# NATURAL KEY : A flight of the dataset is identified by its code, its date and its departure airport
+KEY_COLUMNS = ["ds_flight_code", "ds_flight_date", "ds_departure_airport_code"]
+
+
+def flight_key(ds_flight_code, ds_flight_date, ds_departure_airport_code):
+    """Build the natural key of a flight (normalized strings)"""
+    return (str(ds_flight_code).strip().upper(), str(ds_flight_date).strip(), str(ds_departure_airport_code).strip().upper())
+
+
+def key_hash(key):
+    """64 bits hash of a natural key (compact entry of the indexes)"""
+    return int.from_bytes(hashlib.blake2b("|".join(key).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def key_hashes(df_data_prov):
+    """Hashes of the natural keys of the rows of a dataframe"""
+    return [key_hash(flight_key(c, d, a)) for c, d, a in zip(df_data_prov["ds_flight_code"],
+                                                             df_data_prov["ds_flight_date"],
+                                                             df_data_prov["ds_departure_airport_code"])]
+
+
+class DatasetIndex:
+    """
+    PURPOSE :
+        Index of the flights already collected in the dataset (hashes of the natural keys), loaded at startup and
+        updated as rows are written. The new rows of a page are filtered against it before any enrichment
+        (previous delay scraping, weather calls). Seeded with the key hashes of the sinks.
+    """
+
+    def __init__(self):
+        self._keys = set()
+        self._lock = threading.Lock()  # Filtered by the scraping workers while the writer adds keys
+        self.hits = 0    # Rows filtered out (already collected)
+        self.misses = 0  # Rows kept for the enrichment
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key_hash(key) in self._keys
+
+    def filter_new(self, df_data_prov):
+        """Return the rows of the dataframe not collected yet (duplicates of the page removed too)"""
+        is_new = []
+        seen = set()
+        keys = key_hashes(df_data_prov)
+        with self._lock:
+            for key in keys:
+                is_new.append(key not in self._keys and key not in seen)
+                seen.add(key)
+            self.misses += sum(is_new)
+            self.hits += len(is_new) - sum(is_new)
+        return df_data_prov[is_new]
+
+    def add(self, df_data_prov):
+        """Add the keys of the rows written in the dataset"""
+        self.add_hashes(key_hashes(df_data_prov))
+
+    def add_hashes(self, hashes):
+        """Add key hashes read from the index of a sink"""
+        with self._lock:
+            self._keys.update(hashes)
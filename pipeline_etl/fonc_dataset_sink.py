@@ -0,0 +1,368 @@
+import fcntl
+import glob
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from fonc_dataset_index import KEY_COLUMNS, key_hashes
+
+
+#=====================================================================
+# CONFIGURATION SINK
+#=====================================================================
+
+# DIRECTORY : Partitioned Parquet dataset of the collection
+SINK_DIR = "Flight-delay_dataset"
+
+# SINKS : Partitioned Parquet (default) or append-CSV (previous format)
+SINK_PARQUET = "parquet"
+SINK_CSV = "csv"
+
+# MANIFEST : One JSON-lines manifest per writer, a batch is committed once its line is written
+MANIFEST_PREFIX = "_manifest"
+
+# KEY INDEX : One binary file per writer next to the data (hash of the natural key, completeness, batch of the version)
+KEYS_PREFIX = "_keys"
+KEY_RECORD = np.dtype([("hash", "<u8"), ("completeness", "<u2"), ("batch", "<u4")])
+
+# LEGACY : Writer of the rows imported from the append-CSV datasets (previous format), marker of each file imported
+LEGACY_WRITER = "legacy"
+IMPORTED_PREFIX = "_imported"
+IMPORT_CHUNK_ROWS = 50000
+
+# NUMBER COLUMNS : Numeric columns of dataset_table (data_warehousing/setup.sql), the others are VARCHAR
+NUMERIC_COLUMNS = ["ds_airline_rating", "ds_departure_airport_rating", "ds_arrival_airport_rating",
+                   "ds_departure_airport_lat", "ds_departure_airport_long", "ds_arrival_airport_lat", "ds_arrival_airport_long",
+                   "ds_departure_airport_temp_cel", "ds_departure_airport_rain_mmHour", "ds_departure_airport_wind_kmh",
+                   "ds_departure_airport_vis_km", "ds_arrival_airport_temp_cel", "ds_arrival_airport_rain_mmHour",
+                   "ds_arrival_airport_wind_kmh", "ds_arrival_airport_vis_km", "ds_prev_delay_min", "ds_final_delay_min"]
+
+
+def select_versions(hashes, completeness, stored):
+    """
+    PURPOSE :
+        Upsert rule on the natural key : a row is kept if its key is new, or if it is at least as complete
+        as the version stored (the most recent wins when equally complete). Inside a batch, same rule.
+    ARGS:
+        hashes (list) : Key hashes of the rows
+        completeness (list) : Number of fields filled of the rows
+        stored (dict) : Completeness of the stored version of each key already written
+    RETURNS:
+        tuple: (positions of the rows kept, number of keys new, number of keys replaced, number of rows dropped)
+    """
+    selected = {}
+    for i, (h, c) in enumerate(zip(hashes, completeness)):
+        if h in stored and c < stored[h]:
+            continue
+        if h in selected and c < completeness[selected[h]]:
+            continue
+        selected[h] = i
+    positions = sorted(selected.values())
+    inserted = sum(1 for h in selected if h not in stored)
+    return positions, inserted, len(positions) - inserted, len(hashes) - len(positions)
+
+
+def _safe(value):
+    """Partition value usable in a directory name"""
+    value = str(value).strip() if pd.notna(value) else ""
+    return re.sub(r'[^A-Za-z0-9_-]', '_', value) or "unknown"
+
+
+class CsvSink:
+    """
+    PURPOSE :
+        Append-CSV dataset (sep ';', header written once), with the row counter kept in memory.
+        A CSV is not rewritten : the rows whose key is already in the file are dropped (insert only).
+    ARGS:
+        path (str) : CSV file
+        columns (list) : Columns of the dataset, in order
+    """
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self._lock = threading.Lock()
+        if not os.path.exists(path):
+            pd.DataFrame(columns=columns).to_csv(path, index=False, sep=';')
+        # COUNTER, KEYS : File read once at startup (key columns only)
+        self._keys = set(key_hashes(pd.read_csv(path, sep=';', usecols=KEY_COLUMNS, dtype=str)))
+        with open(path, "rb") as f:
+            self.rows = max(0, sum(1 for _ in f) - 1)
+
+    def write(self, df_batch):
+        hashes = key_hashes(df_batch)
+        completeness = df_batch[self.columns].notna().sum(axis=1).tolist()
+        with self._lock:
+            positions = [i for i in select_versions(hashes, completeness, {})[0] if hashes[i] not in self._keys]
+            df_batch.iloc[positions][self.columns].to_csv(self.path, mode='a', index=False, header=False, sep=';')
+            self._keys.update(hashes[i] for i in positions)
+            self.rows += len(positions)
+        return {"rows": len(positions), "inserted": len(positions), "replaced": 0, "dropped": len(hashes) - len(positions)}
+
+    def key_hashes(self):
+        """Key hashes of the rows of the dataset"""
+        return set(self._keys)
+
+
+class ParquetSink:
+    """
+    PURPOSE :
+        Parquet dataset partitioned by flight month and airline (flight_month=YYYY-MM/airline=XX/part-*.parquet),
+        with upsert on the natural key (flight code, flight date, departure airport).
+        Each batch is written in new files (temporary name + rename), then committed by one line appended
+        in the manifest of the writer : files not listed in a manifest (crash during a batch) are ignored.
+        A compact key index (hash, completeness, batch of the version kept) is persisted next to the data :
+        a row already stored is written again only if it is at least as complete, and the readers skip
+        the versions replaced. The cost of a batch does not depend on the size of the dataset.
+    ARGS:
+        root (str) : Directory of the dataset
+        columns (list) : Columns of the dataset, in order
+        writer_id (str) : Writer of the files (one manifest and one key index per ETL worker)
+        read_only (bool) : Dataset only read (nothing created nor cut off, write refused)
+    """
+
+    def __init__(self, root=SINK_DIR, columns=None, writer_id="main", read_only=False):
+        self.root = root
+        self.columns = columns
+        self.writer_id = _safe(writer_id)
+        self.manifest_path = os.path.join(root, f"{MANIFEST_PREFIX}_{self.writer_id}.jsonl")
+        self.keys_path = os.path.join(root, f"{KEYS_PREFIX}_{self.writer_id}.bin")
+        self._lock = threading.Lock()
+        self.read_only = read_only
+        if not read_only:
+            os.makedirs(root, exist_ok=True)
+
+        # COUNTERS : Manifests read once at startup
+        self.stored_rows = 0
+        self.replaced = 0
+        self.batches = 0
+        self.partition_rows = Counter()
+        self._own_batches = 0
+        committed = {}
+        keys_end = {}  # Committed length of the key file of each writer (records)
+        for entry in self._entries():
+            self._count(entry)
+            # KEY RECORDS : Slice of the key file of the writer (entries without offset : records follow each other)
+            offset = entry.get("keys_offset", keys_end.get(entry["writer"], 0))
+            keys_end[entry["writer"]] = max(keys_end.get(entry["writer"], 0), offset + entry["rows"])
+            committed[(entry["writer"], entry["batch"])] = (entry["committed_at"], offset, entry["rows"])
+            if entry["writer"] == self.writer_id:
+                self._own_batches = max(self._own_batches, entry["batch"] + 1)
+
+        # RECOVERY : Key records of a batch never committed (crash before its manifest line) cut off
+        self._keys_end = keys_end.get(self.writer_id, 0)
+        if not read_only and os.path.exists(self.keys_path) and os.path.getsize(self.keys_path) > self._keys_end * KEY_RECORD.itemsize:
+            os.truncate(self.keys_path, self._keys_end * KEY_RECORD.itemsize)
+
+        # KEY INDEX : Version kept for each key (hash -> (completeness, (writer, batch)))
+        self._index = {}
+        self._load_index(committed)
+
+    @property
+    def rows(self):
+        """Number of flights of the dataset (one version per key)"""
+        return len(self._index)
+
+    def _manifest_paths(self):
+        return sorted(glob.glob(os.path.join(self.root, f"{MANIFEST_PREFIX}_*.jsonl")))
+
+    def _entries(self):
+        """Batches committed by all the writers"""
+        for path in self._manifest_paths():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue  # Last line truncated by a crash : batch not committed
+
+    def _count(self, entry):
+        self.stored_rows += entry["rows"]
+        self.replaced += entry.get("replaced", 0)
+        self.batches += 1
+        for file in entry["files"]:
+            self.partition_rows[file["partition"]] += file["rows"]
+
+    def _load_index(self, committed):
+        """
+        Replay the key records of the committed batches, in commit order (the last version of a key is kept).
+        Only the slice listed in the manifest entry of a batch is read : records written after it are ignored.
+        """
+        versions = []
+        for path in glob.glob(os.path.join(self.root, f"{KEYS_PREFIX}_*.bin")):
+            writer = os.path.basename(path)[len(KEYS_PREFIX) + 1:-len(".bin")]
+            records = np.fromfile(path, dtype=KEY_RECORD)
+            for (entry_writer, batch), (committed_at, offset, count) in committed.items():
+                if entry_writer == writer:
+                    batch_records = records[offset:offset + count]
+                    versions.append((committed_at, (writer, batch), batch_records[batch_records["batch"] == batch]))
+        for _, version, records in sorted(versions, key=lambda v: v[0]):
+            for h, c in zip(records["hash"].tolist(), records["completeness"].tolist()):
+                self._index[h] = (c, version)
+
+    def key_hashes(self):
+        """Key hashes of the flights of the dataset"""
+        with self._lock:
+            return set(self._index)
+
+    def _typed(self, df_batch):
+        """Same schema in every file : NUMBER columns as float, the others as strings"""
+        df_batch = df_batch.reindex(columns=self.columns) if self.columns else df_batch.copy()
+        for column in df_batch.columns:
+            if column in NUMERIC_COLUMNS:
+                df_batch[column] = pd.to_numeric(df_batch[column], errors="coerce").astype("float64")
+            else:
+                df_batch[column] = df_batch[column].astype("string")
+        return df_batch
+
+    def write(self, df_batch):
+        """
+        PURPOSE :
+            Upsert a batch of rows : new keys inserted, keys already stored replaced by a version at least as
+            complete, the other rows dropped. The rows kept are written and committed.
+        ARGS:
+            df_batch (df) : Rows of the batch
+        RETURNS:
+            dict: Manifest entry of the batch (rows written, keys inserted and replaced, rows dropped)
+        """
+        if self.read_only:
+            raise PermissionError(f"Dataset {self.root} ouvert en lecture seule")
+        df_batch = self._typed(df_batch).reset_index(drop=True)
+        hashes = key_hashes(df_batch)
+        completeness = df_batch.notna().sum(axis=1).tolist()
+
+        with self._lock:
+            stored = {h: self._index[h][0] for h in hashes if h in self._index}
+            positions, inserted, replaced, dropped = select_versions(hashes, completeness, stored)
+            sequence = self._own_batches
+            entry = {"writer": self.writer_id, "batch": sequence, "committed_at": time.time(), "rows": len(positions),
+                     "inserted": inserted, "replaced": replaced, "dropped": dropped, "keys_offset": self._keys_end,
+                     "files": []}
+            if not positions:
+                return entry
+
+            df_batch = df_batch.iloc[positions]
+            months = pd.to_datetime(df_batch["ds_flight_date"], format="%d/%m/%y", errors="coerce").dt.strftime("%Y-%m")
+            for (month, airline), df_part in df_batch.groupby([months.fillna("unknown"), df_batch["ds_airline_code"].map(_safe)]):
+                partition = f"flight_month={_safe(month)}/airline={airline}"
+                os.makedirs(os.path.join(self.root, partition), exist_ok=True)
+                rel_path = f"{partition}/part-{self.writer_id}-{sequence:06d}-{uuid.uuid4().hex[:8]}.parquet"
+                tmp_path = os.path.join(self.root, f"{rel_path}.tmp")
+                df_part.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, os.path.join(self.root, rel_path))
+                entry["files"].append({"path": rel_path, "partition": partition, "rows": len(df_part)})
+
+            # KEY INDEX : Records of the batch appended after the committed ones (slice listed in the manifest entry,
+            # records of a failed batch cut off first)
+            records = np.empty(len(positions), dtype=KEY_RECORD)
+            records["hash"] = [hashes[i] for i in positions]
+            records["completeness"] = [completeness[i] for i in positions]
+            records["batch"] = sequence
+            with open(self.keys_path, "ab") as f:
+                f.truncate(self._keys_end * KEY_RECORD.itemsize)
+                f.write(records.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            # COMMIT : Manifest line written and synced after the files and the key records
+            entry["committed_at"] = time.time()
+            with open(self.manifest_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._own_batches += 1
+            self._keys_end += len(positions)
+            self._count(entry)
+            version = (self.writer_id, sequence)
+            for i in positions:
+                self._index[hashes[i]] = (completeness[i], version)
+        return entry
+
+    def _committed_files(self):
+        """Committed files with the version (writer, batch) of their rows"""
+        for entry in self._entries():
+            for file in entry["files"]:
+                yield os.path.join(self.root, file["path"]), (entry["writer"], entry["batch"])
+
+    def _current_rows(self, df_part, version):
+        """Rows of a file still current (not replaced by a later version of their key)"""
+        with self._lock:
+            current = [self._index.get(h, (None, None))[1] == version for h in key_hashes(df_part)]
+        return df_part[current]
+
+    def files(self):
+        """Paths of the committed files"""
+        return [path for path, _ in self._committed_files()]
+
+    def read(self, columns=None):
+        """Return the current rows, one per key (all the columns by default)"""
+        frames = []
+        for path, version in self._committed_files():
+            df_part = self._current_rows(pd.read_parquet(path), version)
+            frames.append(df_part[columns] if columns else df_part)
+        if not frames:
+            return pd.DataFrame(columns=columns or self.columns)
+        return pd.concat(frames, ignore_index=True)
+
+    def export_csv(self, path):
+        """
+        PURPOSE :
+            Export of the dataset for the ingestion in Snowflake (COPY INTO dataset_table of setup.sql) :
+            header line, sep ';', fields enclosed by '"' when needed, empty fields for the missing values.
+            Only the current version of each flight is exported.
+        ARGS:
+            path (str) : CSV file written
+        RETURNS:
+            int: Number of rows exported
+        """
+        tmp_path = f"{path}.tmp"
+        num_rows = 0
+        pd.DataFrame(columns=self.columns).to_csv(tmp_path, index=False, sep=';')
+        # STREAMING : One file at a time, the dataset is never loaded entirely
+        for file_path, version in self._committed_files():
+            df_part = self._current_rows(pd.read_parquet(file_path), version)
+            df_part = df_part.reindex(columns=self.columns) if self.columns else df_part
+            df_part.to_csv(tmp_path, mode='a', index=False, header=False, sep=';', quotechar='"', na_rep='')
+            num_rows += len(df_part)
+        os.replace(tmp_path, path)
+        return num_rows
+
+
+def import_csv_once(csv_path, root=SINK_DIR, columns=None, chunksize=IMPORT_CHUNK_ROWS):
+    """
+    PURPOSE :
+        One-time import of an append-CSV dataset (previous format) in the Parquet dataset, with the upsert of the
+        sink (writer "legacy"). A marker file next to the data records the import, the next runs skip the file.
+        The import is serialized between the processes of the host (lock file) ; an import interrupted by a crash
+        is done again from the start (rows already imported replaced by themselves)
+    ARGS:
+        csv_path (str) : Append-CSV dataset (sep ';', header line)
+        root (str) : Directory of the Parquet dataset
+        columns (list) : Columns of the dataset, in order
+        chunksize (int) : Rows read and written per batch
+    RETURNS:
+        int: Number of rows imported (0 if no file or already imported)
+    """
+    if not os.path.exists(csv_path):
+        return 0
+    os.makedirs(root, exist_ok=True)
+    marker = os.path.join(root, f"{IMPORTED_PREFIX}_{_safe(os.path.basename(csv_path))}.json")
+    with open(f"{marker}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.exists(marker):
+            return 0
+        # SINK : Opened under the lock (batches of an interrupted import already in its manifest)
+        sink = ParquetSink(root, columns, LEGACY_WRITER)
+        num_rows = 0
+        for df_chunk in pd.read_csv(csv_path, sep=';', dtype=str, chunksize=chunksize):
+            num_rows += sink.write(df_chunk)["rows"]
+        with open(marker, "w", encoding="utf-8") as f:
+            json.dump({"source": csv_path, "rows": num_rows, "imported_at": time.time()}, f)
+    return num_rows
@@ -0,0 +1,151 @@
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+from fonc_archive import RawArchive, ArchiveMissError
+from fonc_telemetry import get_telemetry
+
+
+#=====================================================================
+# CONFIGURATION HTTP
+#=====================================================================
+
+# MODES : "live" (network only), "record" (network + raw archive), "offline" (raw archive only, no network)
+MODE_LIVE = "live"
+MODE_RECORD = "record"
+MODE_OFFLINE = "offline"
+
+# ALIAS : "replay" is the offline mode used by the benchmarks (archive served locally, with artificial latency)
+MODE_ALIASES = {"replay": MODE_OFFLINE}
+
+# ENVIRONMENT : Configuration without code change (API under uvicorn, benchmarks)
+HTTP_MODE_ENV = "FLIGHT_DELAY_HTTP_MODE"
+HTTP_ARCHIVE_DIR_ENV = "FLIGHT_DELAY_HTTP_ARCHIVE_DIR"
+HTTP_LATENCY_MS_ENV = "FLIGHT_DELAY_HTTP_LATENCY_MS"
+
+# UPSTREAMS : Breaks paced per upstream, shared by all the threads of the process
+UPSTREAM_FLIGHTRADAR = "flightradar24"
+
+_mode = MODE_LIVE
+_archive = None
+_reference_time = None
+_latency_seconds = 0.0
+_pace_lock = threading.Lock()
+_next_slot = {}
+
+
+def configure_http(mode=MODE_LIVE, archive_dir=None, latency_ms=0):
+    """
+    PURPOSE :
+        Select how the scrapers and the Open-Meteo client reach the network, for the whole process
+    ARGS:
+        mode (str) : "live", "record" or "offline" ("replay")
+        archive_dir (str) : Directory of the raw archive (mandatory for "record" and "offline")
+        latency_ms (float) : Artificial latency of each archived response served (offline mode)
+    """
+    global _mode, _archive, _latency_seconds
+    mode = MODE_ALIASES.get(mode, mode)
+    if mode not in (MODE_LIVE, MODE_RECORD, MODE_OFFLINE):
+        raise ValueError(f"Mode HTTP inconnu : '{mode}'")
+    if mode != MODE_LIVE and not archive_dir:
+        raise ValueError(f"Le mode '{mode}' nécessite un dossier d'archive")
+    _mode = mode
+    _archive = RawArchive(archive_dir) if mode != MODE_LIVE else None
+    _latency_seconds = float(latency_ms or 0) / 1000
+
+
+def configure_http_from_env():
+    """Configure the HTTP mode from the environment variables (live mode when not defined)"""
+    configure_http(
+        os.environ.get(HTTP_MODE_ENV, MODE_LIVE),
+        os.environ.get(HTTP_ARCHIVE_DIR_ENV),
+        float(os.environ.get(HTTP_LATENCY_MS_ENV, 0)),
+    )
+
+
+def get_archive():
+    """Return the raw archive configured (None in live mode)"""
+    return _archive
+
+
+def is_live():
+    """True when the HTTP calls go to the network without archive"""
+    return _mode == MODE_LIVE
+
+
+def is_offline():
+    """True when no network call is made (re-process from the archive)"""
+    return _mode == MODE_OFFLINE
+
+
+def set_reference_time(timestamp):
+    """Pin the "now" of the process on a fetch time (offline mode), None to use the real time"""
+    global _reference_time
+    _reference_time = timestamp
+
+
+def reference_now():
+    """Return the current datetime, or the pinned fetch time when re-processing the archive"""
+    if _reference_time is not None:
+        return datetime.fromtimestamp(_reference_time)
+    return datetime.now()
+
+
+def pause(min_seconds, max_seconds, upstream=UPSTREAM_FLIGHTRADAR):
+    """
+    PURPOSE :
+        Break to avoid blocking or error 429 (skipped when nothing is fetched on the network).
+        The breaks of an upstream are chained between the threads : with one thread it is a plain sleep,
+        with several workers the request rate to the upstream stays the one of a single worker.
+    ARGS:
+        min_seconds (float) : Minimum break
+        max_seconds (float) : Maximum break
+        upstream (str) : Upstream paced (Flightradar24 by default)
+    """
+    if is_offline():
+        return
+    with _pace_lock:
+        now = time.monotonic()
+        slot = max(now, _next_slot.get(upstream, now)) + random.uniform(min_seconds, max_seconds)
+        _next_slot[upstream] = slot
+    time.sleep(slot - now)
+
+
+class ArchiveSession:
+    """
+    PURPOSE :
+        Wrapper of a requests/niquests session: archives every response in "record" mode,
+        serves the archived responses without network in "offline" mode, counts the requests per host (telemetry)
+    ARGS:
+        session : Session wrapped (requests.Session or niquests.Session)
+    """
+
+    def __init__(self, session):
+        self._session = session
+
+    def __getattr__(self, name):
+        # DELEGATION : headers, close(), etc. of the wrapped session
+        return getattr(self._session, name)
+
+    def get(self, url, params=None, **kwargs):
+        get_telemetry().count_request(urlparse(url).hostname)
+        if _mode == MODE_OFFLINE:
+            entry = _archive.lookup(url, params, reference_time=_reference_time)
+            if _latency_seconds:
+                time.sleep(_latency_seconds)  # Simulated network round trip
+            if entry is None:
+                raise ArchiveMissError(f"Absent de l'archive : {url}")
+            return _archive.read(entry)
+
+        response = self._session.get(url, params=params, **kwargs)
+        if _mode == MODE_RECORD:
+            _archive.store(url, params, response.status_code, response.content)
+        return response
+
+
+def http_session(session=None):
+    """Return the session to use for the HTTP calls (archive of the mode configured, requests counted)"""
+    return ArchiveSession(session)
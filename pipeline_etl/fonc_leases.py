@@ -0,0 +1,169 @@
+import json
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import closing, contextmanager
+
+
+#=====================================================================
+# CONFIGURATION LEASES
+#=====================================================================
+
+# FILE : Lease table shared by the ETL workers (SQLite, on a shared storage for several hosts)
+LEASE_DB_PATH = "Flight-delay_leases.sqlite"
+
+# DURATION : A batch not renewed during this time (crashed worker) is given to another worker
+LEASE_TTL_SECONDS = 15 * 60
+
+# SIZE : Number of flight codes per batch claimed
+LEASE_BATCH_SIZE = 20
+
+# LEASE : Batch of flight codes claimed by a worker (previous_owner set when taken back from an expired lease)
+Lease = namedtuple("Lease", ["batch_id", "codes", "previous_owner"])
+
+
+def default_worker_id():
+    """Identifier of the worker : host name and process id"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def partition_path(dataset_path, worker_id):
+    """Output partition of a worker, next to the dataset of the collection"""
+    stem, ext = os.path.splitext(dataset_path)
+    return f"{stem}_{re.sub(r'[^A-Za-z0-9_-]', '_', worker_id)}{ext}"
+
+
+class LeaseTable:
+    """
+    PURPOSE :
+        Work distribution of the flight code list between several ETL workers (one host or many).
+        The list is cut in batches; a worker claims a batch with a lease, renews it while working on it, and
+        marks it done. The batch of a crashed worker is claimed again by another one once its lease expired.
+    ARGS:
+        path (str) : SQLite database of the leases
+        worker_id (str) : Identifier of this worker (host name and process id by default)
+        ttl_seconds (float) : Duration of a lease without renewal
+    """
+
+    def __init__(self, path=LEASE_DB_PATH, worker_id=None, ttl_seconds=LEASE_TTL_SECONDS):
+        self.path = path
+        self.worker_id = worker_id or default_worker_id()
+        self.ttl_seconds = ttl_seconds
+        with closing(self._connect()) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    batch_id INTEGER PRIMARY KEY,
+                    codes TEXT NOT NULL,
+                    owner TEXT,
+                    expires_at REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    done_at REAL,
+                    done_by TEXT
+                )""")
+
+    def _connect(self):
+        # AUTOCOMMIT : Transactions opened explicitly with BEGIN IMMEDIATE (one writer at a time)
+        return sqlite3.connect(self.path, timeout=60, isolation_level=None)
+
+    @contextmanager
+    def _transaction(self):
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def seed(self, codes, batch_size=LEASE_BATCH_SIZE):
+        """
+        PURPOSE :
+            Create the batches of a pass (first worker started), or of a new pass once all the batches are done
+        ARGS:
+            codes (list) : Flight code list
+            batch_size (int) : Number of codes per batch
+        RETURNS:
+            int: Number of batches of the pass
+        """
+        with self._transaction() as conn:
+            total, remaining = conn.execute(
+                "SELECT COUNT(*), COUNT(*) - COUNT(done_at) FROM leases").fetchone()
+            if total and remaining:
+                return total
+            conn.execute("DELETE FROM leases")
+            batches = [codes[i:i + batch_size] for i in range(0, len(codes), batch_size)]
+            conn.executemany("INSERT INTO leases (batch_id, codes) VALUES (?, ?)",
+                             [(i, json.dumps(batch)) for i, batch in enumerate(batches)])
+            return len(batches)
+
+    def claim(self):
+        """Claim the first batch free or with an expired lease (None when every batch is done or leased)"""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT batch_id, codes, owner FROM leases "
+                "WHERE done_at IS NULL AND (owner IS NULL OR expires_at < ?) ORDER BY batch_id LIMIT 1",
+                (now,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE leases SET owner = ?, expires_at = ?, attempts = attempts + 1 WHERE batch_id = ?",
+                         (self.worker_id, now + self.ttl_seconds, row[0]))
+        batch_id, codes, previous_owner = row
+        return Lease(batch_id, json.loads(codes), previous_owner)
+
+    def renew(self, lease):
+        """Extend the lease (False if it expired and was claimed by another worker)"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE leases SET expires_at = ? WHERE batch_id = ? AND owner = ? AND done_at IS NULL",
+                (time.time() + self.ttl_seconds, lease.batch_id, self.worker_id))
+            return cursor.rowcount == 1
+
+    def complete(self, lease):
+        """Mark the batch done"""
+        with self._transaction() as conn:
+            conn.execute("UPDATE leases SET done_at = ?, done_by = ?, owner = NULL WHERE batch_id = ? AND owner = ?",
+                         (time.time(), self.worker_id, lease.batch_id, self.worker_id))
+
+    def release(self, lease):
+        """Give the batch back before the end of the lease (worker stopped)"""
+        with self._transaction() as conn:
+            conn.execute("UPDATE leases SET owner = NULL, expires_at = NULL WHERE batch_id = ? AND owner = ? "
+                         "AND done_at IS NULL", (lease.batch_id, self.worker_id))
+
+    def progress(self):
+        """Return the number of batches done, leased and pending"""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            done, leased, total = conn.execute(
+                "SELECT COUNT(done_at), SUM(done_at IS NULL AND owner IS NOT NULL AND expires_at >= ?), COUNT(*) "
+                "FROM leases", (now,)).fetchone()
+        leased = leased or 0
+        return {"done": done, "leased": leased, "pending": total - done - leased}
+
+    @contextmanager
+    def hold(self, lease):
+        """Renew the lease in the background while the batch is processed"""
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(self.ttl_seconds / 3):
+                try:
+                    if not self.renew(lease):
+                        print(f"⚠️ Bail du lot {lease.batch_id} perdu (expiré et repris par un autre worker)")
+                        return
+                except sqlite3.Error as e:
+                    print(f"Erreur lors du renouvellement du bail du lot {lease.batch_id}: {e}")
+
+        thread = threading.Thread(target=heartbeat, name=f"lease-{lease.batch_id}", daemon=True)
+        thread.start()
+        try:
+            yield lease
+        finally:
+            stop.set()
+            thread.join()
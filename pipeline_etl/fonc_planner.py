@@ -0,0 +1,140 @@
+import json
+import math
+import os
+
+from fonc_quota import OPENMETEO_LIMITS
+
+
+#=====================================================================
+# CONFIGURATION PLANNER
+#=====================================================================
+
+# BREAKS : Average of the breaks against rate limiting on Flightradar24 (pause(min, max) of the pipeline)
+PAGE_BREAK_SECONDS = 5.0             # After the flight history page, pause(3, 7)
+PREV_DELAY_BREAK_SECONDS = 7.5       # Before the previous delays of a page, pause(6, 9)
+REGISTRATION_BREAK_SECONDS = 6.5     # Around each aircraft page, pause(1, 2) + pause(3, 7)
+
+# CALLS : Open-Meteo calls per new flight (temperature, visibility, wind, rain at departure and arrival)
+WEATHER_CALLS_PER_ROW = 8
+
+# LATENCIES : Duration of one request when no previous run measured it
+DEFAULT_PAGE_LATENCY_SECONDS = 1.0
+DEFAULT_WEATHER_LATENCY_SECONDS = 0.3
+
+# PROCESSES : Sizes compared (one Flightradar24 pacing per process, Open-Meteo quotas shared)
+PLAN_PROCESSES = [1, 2, 4, 8]
+
+
+def last_metrics(metrics_path):
+    """Last snapshot of the metrics file of the previous runs (None if no run measured)"""
+    if not metrics_path or not os.path.exists(metrics_path):
+        return None
+    last = None
+    with open(metrics_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                last = json.loads(line)
+            except ValueError:
+                continue
+    return last
+
+
+def quota_seconds(calls, limits=None):
+    """Minimum duration of a number of calls under the quotas (each full window has to elapse)"""
+    limits = limits or OPENMETEO_LIMITS
+    return max((max(0, math.ceil(calls / limit) - 1) * window for window, limit in limits.items()), default=0)
+
+
+def plan_run(codes, scheduler, negative_cache, journal, budget=None, dataset_rows=0, metrics_path=None,
+             flight_url_prefix="", enrich_workers=1):
+    """
+    PURPOSE :
+        Estimate of a collection run without any network call : requests to Flightradar24 and Open-Meteo,
+        requests answered by the caches, wall time under the rate limits
+    ARGS:
+        codes (list) : Flight code list
+        scheduler (CodeScheduler) : State of the codes (expected new flights, backoff)
+        negative_cache (NegativeCache) : Dead codes recently
+        journal (RunJournal) : Pass in progress (codes already done)
+        budget (int) : Maximum number of codes of the run
+        dataset_rows (int) : Flights already in the dataset
+        metrics_path (str) : Metrics of the previous runs (hit rates and latencies measured)
+        flight_url_prefix (str) : URL of the flight history pages
+        enrich_workers (int) : Enrichment threads (overlap of the Flightradar24 and Open-Meteo lanes)
+    RETURNS:
+        dict: Estimate of the run
+    """
+    done = [c for c in codes if journal.is_done(c)]
+    pending = [c for c in codes if not journal.is_done(c)]
+    dead = {c for c in pending if negative_cache.lookup(f"{flight_url_prefix}{c}")}
+    alive = [c for c in pending if c not in dead]
+    scheduled = scheduler.order(alive, budget)
+    backoff = len(alive) - len(scheduler.order(alive))
+    expected_rows = sum(scheduler.expected_flights(c) for c in scheduled)
+
+    # MEASURED : Hit rates and latencies of the previous run, if any
+    metrics = last_metrics(metrics_path)
+    memo_hit_rate = 0.0
+    page_latency = DEFAULT_PAGE_LATENCY_SECONDS
+    weather_latency = DEFAULT_WEATHER_LATENCY_SECONDS
+    if metrics:
+        memo = metrics.get("caches", {}).get("weather_memo", {})
+        memo_hit_rate = memo.get("hit_rate") or 0.0
+        scrape = metrics.get("stages", {}).get("scrape")
+        if scrape and scrape["calls"]:
+            page_latency = max(0.0, scrape["seconds"] / scrape["calls"] - PAGE_BREAK_SECONDS)
+        weather = metrics.get("stages", {}).get("weather")
+        weather_requests = sum(n for host, n in metrics.get("requests", {}).items() if "open-meteo" in host)
+        if weather and weather_requests:
+            weather_latency = weather["seconds"] / weather_requests
+
+    # REQUESTS
+    page_fetches = len(scheduled)
+    registration_fetches = expected_rows
+    weather_requests = WEATHER_CALLS_PER_ROW * expected_rows
+    weather_calls = weather_requests * (1 - memo_hit_rate)
+
+    # WALL TIME : Flightradar24 paced per process, Open-Meteo paced by the quotas shared by all the processes
+    # (SharedQuotaLimiter of the lease workers) : only the latency of the weather calls is divided by the processes
+    fr24_seconds = (page_fetches * (PAGE_BREAK_SECONDS + PREV_DELAY_BREAK_SECONDS + page_latency)
+                    + registration_fetches * (REGISTRATION_BREAK_SECONDS + page_latency))
+    by_processes = {}
+    for processes in PLAN_PROCESSES:
+        lane = fr24_seconds / processes
+        weather_seconds = max(quota_seconds(weather_calls),
+                              weather_calls * weather_latency / (max(1, enrich_workers) * processes))
+        by_processes[processes] = max(lane, weather_seconds) if enrich_workers > 1 else lane + weather_seconds
+
+    return {
+        "codes": {"total": len(codes), "done_in_pass": len(done), "negative_cache": len(dead),
+                  "backoff": backoff, "scheduled": len(scheduled)},
+        "dataset_rows": dataset_rows,
+        "expected_new_rows": expected_rows,
+        "flightradar24": {"page_fetches": page_fetches, "registration_fetches": registration_fetches,
+                          "answered_by_negative_cache": len(dead), "latency_seconds": page_latency},
+        "open_meteo": {"requests": weather_requests, "answered_by_memo": weather_requests - weather_calls,
+                       "calls": weather_calls, "memo_hit_rate": memo_hit_rate, "latency_seconds": weather_latency,
+                       "quota_seconds": quota_seconds(weather_calls)},
+        "wall_seconds_by_processes": by_processes,
+        "measured_from": metrics["run_id"] if metrics else None,
+    }
+
+
+def print_plan(plan):
+    """Display of the estimate of a run"""
+    c, fr, om = plan["codes"], plan["flightradar24"], plan["open_meteo"]
+    print("\n" + "=" * 60)
+    print("PLAN DE COLLECTE (aucun appel réseau)")
+    print("=" * 60)
+    print(f"Codes : {c['total']} | déjà faits dans la passe : {c['done_in_pass']} | cache négatif : {c['negative_cache']} "
+          f"| en backoff : {c['backoff']} | planifiés : {c['scheduled']}")
+    print(f"Vols dans le dataset : {plan['dataset_rows']} | nouveaux vols attendus : {plan['expected_new_rows']:.0f}")
+    print(f"Flightradar24 : {fr['page_fetches']} pages de vol + {fr['registration_fetches']:.0f} pages avion "
+          f"(latence {fr['latency_seconds']:.2f} s), {fr['answered_by_negative_cache']} évitées par le cache négatif")
+    print(f"Open-Meteo : {om['requests']:.0f} requêtes, {om['answered_by_memo']:.0f} servies par la mémoire "
+          f"({om['memo_hit_rate']:.0%}), {om['calls']:.0f} appels (quotas : {om['quota_seconds'] / 3600:.1f} h minimum)")
+    print("-" * 60)
+    for processes, seconds in plan["wall_seconds_by_processes"].items():
+        print(f"{processes} processus : {seconds / 3600:>8.1f} h  ({seconds / 86400:.2f} jours)")
+    if plan["measured_from"] is None:
+        print("(latences par défaut : aucun run mesuré dans le fichier de métriques)")
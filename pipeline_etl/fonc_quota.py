@@ -0,0 +1,207 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import closing
+
+from fonc_archive import ArchivedResponse, request_key
+
+
+#=====================================================================
+# CONFIGURATION QUOTAS
+#=====================================================================
+
+# LIMITS : Open-Meteo free tier (calls per minute, hour and day), configurable for a commercial key
+OPENMETEO_LIMITS = {
+    60: int(os.environ.get("FLIGHT_DELAY_OPENMETEO_PER_MINUTE", 600)),
+    3600: int(os.environ.get("FLIGHT_DELAY_OPENMETEO_PER_HOUR", 5000)),
+    86400: int(os.environ.get("FLIGHT_DELAY_OPENMETEO_PER_DAY", 10000)),
+}
+
+# MEMO : Weather responses kept in memory (same airport, same period => same request)
+WEATHER_MEMO_SIZE = 4096
+WEATHER_MEMO_TTL_SECONDS = 3600
+
+
+class QuotaLimiter:
+    """
+    PURPOSE :
+        Sliding windows over the calls actually made to an upstream. A call waits only when one of the limits
+        would be exceeded, until the oldest call of the window leaves it : the queued calls are released at the
+        highest rate allowed, and there is no wait at all below the limits.
+    ARGS:
+        limits (dict) : Maximum number of calls per window (window duration in seconds -> calls)
+    """
+
+    def __init__(self, limits=None):
+        self.limits = dict(limits or OPENMETEO_LIMITS)
+        self._calls = {window: deque() for window in self.limits}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def _delay(self, now):
+        """Time to wait before the next call (0 if allowed now)"""
+        delay = 0.0
+        for window, limit in self.limits.items():
+            calls = self._calls[window]
+            while calls and calls[0] <= now - window:
+                calls.popleft()
+            if len(calls) >= limit:
+                delay = max(delay, calls[len(calls) - limit] + window - now)
+        return delay
+
+    def _take(self):
+        """Count a call if every window allows it now, else return the time to wait"""
+        with self._lock:
+            now = time.monotonic()
+            delay = self._delay(now)
+            if delay <= 0:
+                for calls in self._calls.values():
+                    calls.append(now)
+            return delay
+
+    def acquire(self):
+        """Block until a call is allowed by every window, then count it"""
+        waited = 0.0
+        while True:
+            delay = self._take()
+            if delay <= 0:
+                with self._lock:
+                    self.calls += 1
+                    if waited:
+                        self.waits += 1
+                        self.wait_seconds += waited
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    def usage(self):
+        """Calls made in each window (window duration in seconds -> (calls, limit))"""
+        with self._lock:
+            now = time.monotonic()
+            self._delay(now)
+            return {window: (len(self._calls[window]), limit) for window, limit in self.limits.items()}
+
+
+class SharedQuotaLimiter(QuotaLimiter):
+    """
+    PURPOSE :
+        Same sliding windows, kept in a SQLite table shared by the workers of a distributed collection (database
+        of the lease table) : the limits apply to all the processes together, not to each one. A call is checked
+        against every window and counted in one transaction.
+    ARGS:
+        path (str) : SQLite database shared by the workers
+        upstream (str) : Name of the quotas in the table
+        limits (dict) : Maximum number of calls per window (window duration in seconds -> calls)
+    """
+
+    def __init__(self, path, upstream="openmeteo", limits=None):
+        super().__init__(limits)
+        self.path = path
+        self.upstream = upstream
+        with closing(self._connect()) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS quota_calls (upstream TEXT NOT NULL, called_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS quota_calls_time ON quota_calls (upstream, called_at)")
+
+    def _connect(self):
+        # AUTOCOMMIT : Transactions opened explicitly with BEGIN IMMEDIATE (one writer at a time)
+        return sqlite3.connect(self.path, timeout=60, isolation_level=None)
+
+    def _take(self):
+        # CLOCK : Wall clock, the same for all the processes (monotonic clocks are per process)
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM quota_calls WHERE upstream = ? AND called_at <= ?",
+                             (self.upstream, now - max(self.limits, default=0)))
+                delay = 0.0
+                for window, limit in self.limits.items():
+                    # FULL WINDOW : Wait until the limit-th most recent call leaves it
+                    row = conn.execute("SELECT called_at FROM quota_calls WHERE upstream = ? AND called_at > ? "
+                                       "ORDER BY called_at DESC LIMIT 1 OFFSET ?",
+                                       (self.upstream, now - window, limit - 1)).fetchone()
+                    if row is not None:
+                        delay = max(delay, row[0] + window - now)
+                if delay <= 0:
+                    conn.execute("INSERT INTO quota_calls (upstream, called_at) VALUES (?, ?)", (self.upstream, now))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return delay
+
+    def usage(self):
+        now = time.time()
+        with closing(self._connect()) as conn:
+            return {window: (conn.execute("SELECT COUNT(*) FROM quota_calls WHERE upstream = ? AND called_at > ?",
+                                          (self.upstream, now - window)).fetchone()[0], limit)
+                    for window, limit in self.limits.items()}
+
+
+class QuotaSession:
+    """
+    PURPOSE :
+        Wrapper of a requests/niquests session : each call to the network takes a slot of the limiter first
+    ARGS:
+        session : Session wrapped
+        limiter (QuotaLimiter) : Quotas of the upstream
+    """
+
+    def __init__(self, session, limiter):
+        self._session = session
+        self._limiter = limiter
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def get(self, url, params=None, **kwargs):
+        self._limiter.acquire()
+        return self._session.get(url, params=params, **kwargs)
+
+
+class MemoSession:
+    """
+    PURPOSE :
+        Wrapper of a session answering the identical requests from memory (bounded, with expiry).
+        Only the successful responses are kept; an answer from memory costs no call and no wait.
+    ARGS:
+        session : Session wrapped
+        size (int) : Maximum number of responses kept
+        ttl_seconds (float) : Duration of validity of a response
+    """
+
+    def __init__(self, session, size=WEATHER_MEMO_SIZE, ttl_seconds=WEATHER_MEMO_TTL_SECONDS):
+        self._session = session
+        self._size = size
+        self._ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def get(self, url, params=None, **kwargs):
+        key = request_key(url, params)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self._ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return ArchivedResponse(url, entry[1], entry[2])
+            self.misses += 1
+
+        response = self._session.get(url, params=params, **kwargs)
+        if response.status_code == 200:
+            with self._lock:
+                self._entries[key] = (now, response.status_code, response.content)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self._size:
+                    self._entries.popitem(last=False)
+        return response
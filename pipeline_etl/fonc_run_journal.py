@@ -0,0 +1,110 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+import pandas as pd
+
+
+#=====================================================================
+# CONFIGURATION JOURNAL
+#=====================================================================
+
+# FILE : Journal of the current collection pass (one JSON line per state change of a code)
+JOURNAL_PATH = "Flight-delay_run-journal.jsonl"
+
+# STATES : Life cycle of a flight code during a pass
+STATE_PENDING = "pending"      # Not processed yet in this pass
+STATE_SCRAPED = "scraped"      # Page scraped and transformed, batch persisted (before enrichment)
+STATE_ENRICHED = "enriched"    # Batch enriched and persisted (before writing in the dataset)
+STATE_WRITTEN = "written"      # Rows written in the dataset
+STATE_SKIPPED = "skipped"      # No data for this code (scraping failed, dead code in negative cache)
+
+FINAL_STATES = (STATE_WRITTEN, STATE_SKIPPED)
+
+
+class RunJournal:
+    """
+    PURPOSE :
+        Checkpoints of a collection pass over the flight code list. After a crash or a recycled instance,
+        the next run resumes from the first incomplete code and reuses the batches already scraped or enriched.
+    ARGS:
+        path (str) : JSON-lines journal (the batches are persisted in a directory next to it)
+    """
+
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self.batch_dir = f"{os.path.splitext(path)[0]}_batches"
+        self._lock = threading.Lock()
+        self._states = {}
+        self._load()
+
+    def _load(self):
+        """Replay the journal to get the last state of each code"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Last line truncated by the crash
+                self._states[entry["code"]] = entry["state"]
+
+    def _batch_path(self, code):
+        return os.path.join(self.batch_dir, f"{re.sub(r'[^A-Za-z0-9_-]', '_', code)}.pkl")
+
+    def state(self, code):
+        """Return the state of the code in the current pass"""
+        return self._states.get(code, STATE_PENDING)
+
+    def is_done(self, code):
+        return self.state(code) in FINAL_STATES
+
+    def count(self, state):
+        return sum(1 for s in self._states.values() if s == state)
+
+    def mark(self, code, state, df_batch=None, rows=None):
+        """
+        PURPOSE :
+            Record the new state of a code (batch persisted before the journal line, to never reference a missing file)
+        ARGS:
+            code (str) : Flight code
+            state (str) : New state
+            df_batch (df) : Batch of the code to persist (scraped or enriched states)
+            rows (int) : Number of rows (information)
+        """
+        with self._lock:
+            if df_batch is not None:
+                os.makedirs(self.batch_dir, exist_ok=True)
+                tmp_path = f"{self._batch_path(code)}.tmp"
+                df_batch.to_pickle(tmp_path)
+                os.replace(tmp_path, self._batch_path(code))
+            elif state in FINAL_STATES and os.path.exists(self._batch_path(code)):
+                os.remove(self._batch_path(code))
+
+            entry = {"code": code, "state": state, "at": time.time()}
+            if rows is not None:
+                entry["rows"] = int(rows)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._states[code] = state
+
+    def load_batch(self, code):
+        """Return the batch persisted for the code (scraped or enriched state)"""
+        return pd.read_pickle(self._batch_path(code))
+
+    def complete(self):
+        """
+        End of the pass : the journal is kept with a suffix and the next run starts a new pass. The batches still
+        persisted (codes whose enrichment failed, left in the scraped state) are removed : a new pass scrapes again.
+        """
+        with self._lock:
+            if os.path.exists(self.path):
+                os.replace(self.path, f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}.done")
+            shutil.rmtree(self.batch_dir, ignore_errors=True)
+            self._states = {}
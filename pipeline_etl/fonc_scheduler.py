@@ -0,0 +1,133 @@
+import heapq
+import json
+import os
+import threading
+import time
+
+
+#=====================================================================
+# CONFIGURATION SCHEDULER
+#=====================================================================
+
+# FILE : State of each flight code between the runs (last scraping, rows gained, failures, flights per day)
+SCHEDULE_PATH = os.environ.get("FLIGHT_DELAY_SCHEDULE_PATH", "Flight-delay_code-schedule.json")
+
+# HISTORY : Number of days of landed flights shown by a flight history page (flights older are lost)
+HISTORY_DAYS = 7
+
+# PRIOR : Flights per day assumed for a code never scraped (explored before the codes known as rare)
+DEFAULT_FLIGHTS_PER_DAY = 1.0
+
+# FLOOR : Flights per day kept for a code without new flights (revisited after a few days, never starved)
+MIN_FLIGHTS_PER_DAY = 1 / HISTORY_DAYS
+
+# ESTIMATE : Weight of the last observation in the flights per day (exponential moving average)
+EWMA_ALPHA = 0.5
+
+# BACKOFF : Delay before a new try of a failing code, doubled at each failure in a row
+BACKOFF_BASE_HOURS = float(os.environ.get("FLIGHT_DELAY_BACKOFF_BASE_HOURS", 6))
+BACKOFF_MAX_HOURS = float(os.environ.get("FLIGHT_DELAY_BACKOFF_MAX_HOURS", 24 * 14))
+
+
+class CodeScheduler:
+    """
+    PURPOSE :
+        Choose which flight codes the ETL scrapes next. Each page fetched returns the landed flights of the last days,
+        so the new flights expected for a code are its flights per day times the days since its last scraping
+        (capped by the history of the page). The codes are taken from a priority queue on this expected gain;
+        the codes failing are put aside with an exponential backoff.
+    ARGS:
+        path (str) : JSON file used to persist the state of the codes (None : in memory only)
+    """
+
+    def __init__(self, path=SCHEDULE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._states = self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        """Write the states on disk (temporary file + rename to never leave a truncated file)"""
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._states, f)
+        os.replace(tmp_path, self.path)
+
+    def state(self, code):
+        """Return the state of a code (empty dict if never scraped)"""
+        return dict(self._states.get(code, {}))
+
+    def expected_flights(self, code, now=None):
+        """New landed flights expected on the page of the code"""
+        now = now or time.time()
+        state = self._states.get(code, {})
+        flights_per_day = max(MIN_FLIGHTS_PER_DAY, state.get("flights_per_day", DEFAULT_FLIGHTS_PER_DAY))
+        last_scraped = state.get("last_scraped")
+        days = HISTORY_DAYS if last_scraped is None else min(HISTORY_DAYS, (now - last_scraped) / 86400)
+        return flights_per_day * days
+
+    def next_attempt(self, code):
+        """Time before which a failing code is not tried again (None if not in backoff)"""
+        state = self._states.get(code, {})
+        streak = state.get("failure_streak", 0)
+        if not streak:
+            return None
+        delay_hours = min(BACKOFF_MAX_HOURS, BACKOFF_BASE_HOURS * 2 ** (streak - 1))
+        return state["last_attempt"] + delay_hours * 3600
+
+    def order(self, codes, budget=None, now=None):
+        """
+        PURPOSE :
+            Codes to scrape in this pass, by decreasing expected gain (one page request each)
+        ARGS:
+            codes (list) : Flight code list
+            budget (int) : Maximum number of codes (all the codes eligible by default)
+            now (float) : Time of the decision (current time by default)
+        RETURNS:
+            list: Codes eligible (not in backoff), highest priority first
+        """
+        now = now or time.time()
+        with self._lock:
+            queue = []
+            for position, code in enumerate(codes):
+                next_attempt = self.next_attempt(code)
+                if next_attempt is not None and next_attempt > now:
+                    continue
+                # PRIORITY : Highest expected gain first, file order for the ties
+                heapq.heappush(queue, (-self.expected_flights(code, now), position, code))
+        count = len(queue) if budget is None else min(budget, len(queue))
+        return [heapq.heappop(queue)[2] for _ in range(count)]
+
+    def record_success(self, code, rows_gained, now=None):
+        """Update the state of a code after its page was scraped (new flights written in the dataset)"""
+        now = now or time.time()
+        with self._lock:
+            state = self._states.setdefault(code, {})
+            last_scraped = state.get("last_scraped")
+            days = HISTORY_DAYS if last_scraped is None else min(HISTORY_DAYS, max((now - last_scraped) / 86400, 1 / 24))
+            observed = rows_gained / days
+            if "flights_per_day" in state:
+                state["flights_per_day"] = EWMA_ALPHA * observed + (1 - EWMA_ALPHA) * state["flights_per_day"]
+            else:
+                state["flights_per_day"] = observed
+            state.update({"last_scraped": now, "last_attempt": now, "rows_gained_last": int(rows_gained), "failure_streak": 0})
+            self._save()
+
+    def record_failure(self, code, now=None):
+        """Update the state of a code whose scraping failed (backoff doubled)"""
+        now = now or time.time()
+        with self._lock:
+            state = self._states.setdefault(code, {})
+            state["failure_streak"] = state.get("failure_streak", 0) + 1
+            state["last_attempt"] = now
+            self._save()
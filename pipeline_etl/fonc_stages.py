@@ -0,0 +1,196 @@
+import queue
+import threading
+import time
+
+
+#=====================================================================
+# CONFIGURATION STAGES
+#=====================================================================
+
+# END OF STREAM : Marker sent by the last worker of a stage to the next one
+_END = object()
+
+
+class Stage:
+    """
+    PURPOSE :
+        Stage of the streaming pipeline : a pool of worker threads reading the input queue, applying the function,
+        and putting the results (None = item dropped) in the bounded output queue (backpressure when full)
+    ARGS:
+        name (str) : Name of the stage (reports)
+        func (callable) : Processing of one item
+        workers (int) : Concurrency limit of the stage
+        queue_size (int) : Capacity of the output queue
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=8):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.output = queue.Queue(maxsize=queue_size)
+        self.input = None
+        self.busy_seconds = 0.0
+        self.processed = 0
+        self.failed = 0
+        self.max_depth = 0
+        self._depth_sum = 0
+        self._depth_samples = 0
+        self._lock = threading.Lock()
+        self._remaining = self.workers
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            item = self.input.get()
+            if item is _END:
+                self.input.put(_END)  # For the other workers of the stage
+                break
+            start = time.perf_counter()
+            try:
+                result = self.func(item)
+            except Exception as e:
+                print(f"Erreur dans l'étape {self.name}: {e}")
+                result = None
+                with self._lock:
+                    self.failed += 1
+            with self._lock:
+                self.busy_seconds += time.perf_counter() - start
+                self.processed += 1
+            if result is not None:
+                self.output.put(result)
+
+        # END OF STREAM : Propagated once all the workers of the stage are finished
+        with self._lock:
+            self._remaining -= 1
+            last = self._remaining == 0
+        if last:
+            self.output.put(_END)
+
+    def sample_depth(self):
+        depth = self.output.qsize()
+        self.max_depth = max(self.max_depth, depth)
+        self._depth_sum += depth
+        self._depth_samples += 1
+
+    def stats(self, elapsed):
+        return {
+            "workers": self.workers,
+            "processed": self.processed,
+            "failed": self.failed,
+            "utilization": self.busy_seconds / (self.workers * elapsed) if elapsed else 0.0,
+            "queue_depth": self.output.qsize(),
+            "queue_capacity": self.output.maxsize,
+            "queue_depth_avg": self._depth_sum / self._depth_samples if self._depth_samples else 0.0,
+            "queue_depth_max": self.max_depth,
+        }
+
+
+class StagedPipeline:
+    """
+    PURPOSE :
+        Concurrent stages connected by bounded queues, fed by a source of items and drained by one batched writer.
+        Queue depth and utilization of each stage are reported periodically and at the end.
+    ARGS:
+        stages (list) : Stages in the order of the pipeline
+        writer (callable) : Writing of a batch (list of items), in one thread
+        write_batch (int) : Maximum number of items per batch written
+        source_queue_size (int) : Capacity of the queue between the source and the first stage
+        report_interval (float) : Period of the report line (seconds, 0 to disable)
+    """
+
+    def __init__(self, stages, writer, write_batch=10, source_queue_size=8, report_interval=60):
+        self.stages = stages
+        self.writer = writer
+        self.write_batch = max(1, write_batch)
+        self.source = queue.Queue(maxsize=source_queue_size)
+        self.report_interval = report_interval
+        self.written = 0
+        self._start = None
+        self._done = threading.Event()
+
+        # CHAINING : Output queue of a stage = input queue of the next one
+        previous = self.source
+        for stage in stages:
+            stage.input = previous
+            previous = stage.output
+        self._writer_input = previous
+
+    def _write_loop(self):
+        finished = False
+        while not finished:
+            batch = []
+            item = self._writer_input.get()
+            # BATCH : Items already waiting gathered in the same write
+            while item is not _END:
+                batch.append(item)
+                if len(batch) >= self.write_batch:
+                    break
+                try:
+                    item = self._writer_input.get(timeout=1)
+                except queue.Empty:
+                    break
+            finished = item is _END
+            if batch:
+                try:
+                    self.writer(batch)
+                    self.written += len(batch)
+                except Exception as e:
+                    print(f"Erreur dans l'écriture du lot: {e}")
+
+    def _report_loop(self):
+        next_report = self._start + self.report_interval
+        while not self._done.wait(1):
+            for stage in self.stages:
+                stage.sample_depth()
+            if self.report_interval and time.perf_counter() >= next_report:
+                print(self.report_line())
+                next_report += self.report_interval
+
+    def report_line(self):
+        """One line summary : processed items, utilization and queue depth of each stage"""
+        elapsed = time.perf_counter() - self._start
+        parts = []
+        for stage in self.stages:
+            s = stage.stats(elapsed)
+            parts.append(f"{stage.name} {s['processed']} ({s['utilization']:.0%} x{s['workers']}) "
+                         f"-> file {s['queue_depth']}/{s['queue_capacity']}")
+        parts.append(f"écrits {self.written}")
+        return f"📊 [{elapsed:,.0f}s] " + " | ".join(parts)
+
+    def run(self, items):
+        """Feed the pipeline with the items (blocking when the first queue is full) and wait for the end"""
+        self._start = time.perf_counter()
+        for stage in self.stages:
+            stage.start()
+        writer_thread = threading.Thread(target=self._write_loop, name="writer", daemon=True)
+        writer_thread.start()
+        reporter_thread = threading.Thread(target=self._report_loop, name="reporter", daemon=True)
+        reporter_thread.start()
+
+        for item in items:
+            self.source.put(item)
+        self.source.put(_END)
+
+        writer_thread.join()
+        self._done.set()
+        # END OF STREAM : Markers left by the last worker of each stage removed from the final depths
+        for stage in self.stages:
+            while not stage.input.empty():
+                stage.input.get_nowait()
+        reporter_thread.join()
+        print(self.report_line())
+        return self.stats()
+
+    def stats(self):
+        elapsed = time.perf_counter() - self._start
+        return {
+            "elapsed_seconds": elapsed,
+            "written": self.written,
+            "stages": {stage.name: stage.stats(elapsed) for stage in self.stages},
+        }
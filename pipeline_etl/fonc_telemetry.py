@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+#=====================================================================
+# CONFIGURATION TELEMETRY
+#=====================================================================
+
+# FILE : Metrics of the runs (one JSON line per snapshot)
+METRICS_PATH = os.environ.get("FLIGHT_DELAY_METRICS_PATH", "Flight-delay_etl-metrics.jsonl")
+
+# PERIOD : Seconds between two snapshots (JSON line + summary line)
+METRICS_INTERVAL_SECONDS = 60
+
+# STAGES : Stages of the pipeline timed
+STAGES = ["scrape", "parse", "prev_delay", "reference_joins", "weather", "write"]
+
+
+class Telemetry:
+    """
+    PURPOSE :
+        Metrics of an ETL run : wall time per stage, requests per upstream, hit rates of the caches, codes and rows
+        per hour, ETA of the remaining codes. A snapshot is appended to a JSON-lines file and summed up in one line
+        periodically and at the end.
+    ARGS:
+        path (str) : JSON-lines metrics file (None : summary line only)
+        interval (float) : Seconds between two snapshots
+    """
+
+    def __init__(self, path=None, interval=METRICS_INTERVAL_SECONDS):
+        self.path = path
+        self.interval = interval
+        self.run_id = time.strftime("%Y%m%d-%H%M%S")
+        self._lock = threading.Lock()
+        self._stage_seconds = defaultdict(float)
+        self._stage_calls = defaultdict(int)
+        self._requests = defaultdict(int)
+        self._sources = {}
+        self._start = time.time()
+        self._codes_total = 0
+        self._codes_done = 0
+        self._rows = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block of the pipeline (sum over the worker threads)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._stage_seconds[name] += time.perf_counter() - start
+                self._stage_calls[name] += 1
+
+    def count_request(self, upstream):
+        """Count a request sent to an upstream (host name)"""
+        with self._lock:
+            self._requests[upstream] += 1
+
+    def add_source(self, name, func):
+        """Register a cache whose hits and misses are read at each snapshot (func returns (hits, misses))"""
+        self._sources[name] = func
+
+    def code_done(self, rows):
+        """Count a flight code completed and its rows written"""
+        with self._lock:
+            self._codes_done += 1
+            self._rows += rows
+
+    def snapshot(self):
+        """Current metrics of the run"""
+        now = time.time()
+        elapsed = max(now - self._start, 1e-9)
+        with self._lock:
+            codes_per_hour = 3600 * self._codes_done / elapsed
+            remaining = max(self._codes_total - self._codes_done, 0)
+            snapshot = {
+                "run_id": self.run_id,
+                "at": now,
+                "elapsed_seconds": elapsed,
+                "stages": {name: {"seconds": self._stage_seconds[name], "calls": self._stage_calls[name]}
+                           for name in sorted(self._stage_seconds, key=lambda n: STAGES.index(n) if n in STAGES else len(STAGES))},
+                "requests": dict(self._requests),
+                "codes": {"done": self._codes_done, "total": self._codes_total, "per_hour": codes_per_hour},
+                "rows": {"written": self._rows, "per_hour": 3600 * self._rows / elapsed},
+                "eta_seconds": remaining / codes_per_hour * 3600 if codes_per_hour else None,
+            }
+        caches = {}
+        for name, func in self._sources.items():
+            hits, misses = func()
+            caches[name] = {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses else None}
+        snapshot["caches"] = caches
+        return snapshot
+
+    def summary_line(self, snapshot=None):
+        """One line summary of a snapshot"""
+        s = snapshot or self.snapshot()
+        eta = "?" if s["eta_seconds"] is None else f"{s['eta_seconds'] / 3600:.1f}h"
+        total_stages = sum(v["seconds"] for v in s["stages"].values()) or 1
+        stages = " ".join(f"{name} {v['seconds'] / total_stages:.0%}" for name, v in s["stages"].items())
+        requests = " ".join(f"{host} {n}" for host, n in s["requests"].items())
+        caches = " ".join(f"{name} {v['hit_rate']:.0%}" for name, v in s["caches"].items() if v["hit_rate"] is not None)
+        return (f"⏱️ [{s['elapsed_seconds'] / 3600:.2f}h] codes {s['codes']['done']}/{s['codes']['total']} "
+                f"({s['codes']['per_hour']:.0f}/h) | lignes {s['rows']['written']} ({s['rows']['per_hour']:.0f}/h) | "
+                f"ETA {eta} | requêtes {requests or '-'} | caches {caches or '-'} | étapes {stages or '-'}")
+
+    def emit(self):
+        """Append a snapshot to the metrics file and print its summary line"""
+        snapshot = self.snapshot()
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(snapshot) + "\n")
+        print(self.summary_line(snapshot))
+        return snapshot
+
+    def start(self, codes_total):
+        """Start the run : number of codes to process, periodic snapshots"""
+        self._start = time.time()
+        self._codes_total = codes_total
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(self.interval):
+                self.emit()
+
+        self._thread = threading.Thread(target=loop, name="telemetry", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """End of the run : last snapshot"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self.emit()
+
+
+_telemetry = Telemetry()
+
+
+def get_telemetry():
+    """Return the telemetry shared by the modules of the process"""
+    return _telemetry
+
+
+def set_telemetry(telemetry):
+    """Replace the shared telemetry (metrics file of the run)"""
+    global _telemetry
+    _telemetry = telemetry
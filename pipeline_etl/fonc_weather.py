@@ -1,8 +1,52 @@
 import openmeteo_requests
+import niquests
 import pandas as pd
 from datetime import datetime
 import numpy as np
 
+import threading
+
+from fonc_http import get_archive, http_session, is_offline, reference_now
+from fonc_quota import QuotaLimiter, SharedQuotaLimiter, QuotaSession, MemoSession
+
+
+# QUOTAS : Calls to Open-Meteo counted for the whole process, identical requests answered from memory
+openmeteo_limiter = QuotaLimiter()
+_session = None
+_session_archive = None
+_session_lock = threading.Lock()
+
+
+def openmeteo_session():
+    """
+    PURPOSE :
+        Session shared by the weather functions : memory of the responses, then quotas of Open-Meteo
+        (only when a call reaches the network), then HTTP mode of the ETL (live, record or offline archive).
+        Built again when the HTTP mode is configured again (new archive).
+    """
+    global _session, _session_archive
+    with _session_lock:
+        if _session is None or _session_archive is not get_archive():
+            session = http_session(niquests.Session())
+            if not is_offline():
+                session = QuotaSession(session, openmeteo_limiter)
+            _session = MemoSession(session)
+            _session_archive = get_archive()
+        return _session
+
+
+def share_openmeteo_quotas(path):
+    """QUOTAS : Calls to Open-Meteo counted in a table shared by the workers of a distributed collection"""
+    global openmeteo_limiter, _session
+    with _session_lock:
+        openmeteo_limiter = SharedQuotaLimiter(path, "openmeteo")
+        _session = None
+
+
+def openmeteo_client():
+    """Open-Meteo client following the HTTP mode of the ETL (live, record or offline archive)"""
+    return openmeteo_requests.Client(session=openmeteo_session())
+
 
 
 #=============================
@@ -32,10 +76,10 @@ def weather_dep_temp(ds_flight_date, ds_departure_plan, ds_departure_airport_lat
         hour = date_obj.hour
         
         # CLIENT API
-        openmeteo = openmeteo_requests.Client()
+        openmeteo = openmeteo_client()
         
         # URL : Definition of the URL depending of the historic date
-        days_diff = (datetime.now() - date_obj).days
+        days_diff = (reference_now() - date_obj).days
         
         if days_diff > 92:
             # DATA : Historical 
@@ -113,10 +157,10 @@ def weather_dep_vis(ds_flight_date, ds_departure_plan, ds_departure_airport_lat,
         hour = date_obj.hour
         
         # CLIENT API
-        openmeteo = openmeteo_requests.Client()
+        openmeteo = openmeteo_client()
         
         # URL : Definition of the URL depending of the historic date
-        days_diff = (datetime.now() - date_obj).days
+        days_diff = (reference_now() - date_obj).days
         
         if days_diff > 92:
             # DATA : Historical
@@ -198,10 +242,10 @@ def weather_dep_wind(ds_flight_date, ds_departure_plan, ds_departure_airport_lat
         hour = date_obj.hour
         
         # CLIENT API
-        openmeteo = openmeteo_requests.Client()
+        openmeteo = openmeteo_client()
         
         # URL : Definition of the URL depending of the historic date
-        days_diff = (datetime.now() - date_obj).days
+        days_diff = (reference_now() - date_obj).days
         
         if days_diff > 92:
             # DATA : Historical
@@ -279,10 +323,10 @@ def weather_dep_rain(ds_flight_date, ds_departure_plan, ds_departure_airport_lat
         hour = date_obj.hour
         
         # CLIENT API
-        openmeteo = openmeteo_requests.Client()
+        openmeteo = openmeteo_client()
         
         # URL : Definition of the URL depending of the historic date
-        days_diff = (datetime.now() - date_obj).days
+        days_diff = (reference_now() - date_obj).days
         
         if days_diff > 92:
             # DATA : Historical
@@ -356,10 +400,10 @@ def weather_arr_temp(ds_flight_date, ds_arrival_plan, ds_arrival_airport_lat, ds
         hour = date_obj.hour
         
         # CLIENT API
-        openmeteo = openmeteo_requests.Client()
+        openmeteo = openmeteo_client()
         
         # URL : Definition of the URL depending of the historic date
-        days_diff = (datetime.now() - date_obj).days
+        days_diff = (reference_now() - date_obj).days
         
         if days_diff > 92:
             # DATA : Historical
@@ -428,10 +472,10 @@ def weather_arr_vis(ds_flight_date, ds_arrival_plan, ds_arrival_airport_lat, ds_
         hour = date_obj.hour
         
         # CLIENT API
-        openmeteo = openmeteo_requests.Client()
+        openmeteo = openmeteo_client()
         
         # URL : Definition of the URL depending of the historic date
-        days_diff = (datetime.now() - date_obj).days
+        days_diff = (reference_now() - date_obj).days
         
         if days_diff > 92:
             # DATA : Historical
@@ -504,10 +548,10 @@ def weather_arr_wind(ds_flight_date, ds_arrival_plan, ds_arrival_airport_lat, ds
         hour = date_obj.hour
         
         # CLIENT API
-        openmeteo = openmeteo_requests.Client()
+        openmeteo = openmeteo_client()
         
         # URL : Definition of the URL depending of the historic date
-        days_diff = (datetime.now() - date_obj).days
+        days_diff = (reference_now() - date_obj).days
         
         if days_diff > 92:
             # DATA : Historical
@@ -576,10 +620,10 @@ def weather_arr_rain(ds_flight_date, ds_arrival_plan, ds_arrival_airport_lat, ds
         hour = date_obj.hour
         
         # CLIENT API
-        openmeteo = openmeteo_requests.Client()
+        openmeteo = openmeteo_client()
         
         # URL : Definition of the URL depending of the historic date
-        days_diff = (datetime.now() - date_obj).days
+        days_diff = (reference_now() - date_obj).days
         
         if days_diff > 92:
             # DATA : Historical
@@ -1,12 +1,14 @@
 import requests
 import pandas as pd
 import time
-import random
 import json
 from urllib.parse import urljoin
 import logging
 import numpy as np
 import os
+import glob
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from bs4 import BeautifulSoup
 from datetime import datetime
 
@@ -15,8 +17,20 @@ from fonc_airport_coordinate import airport_coordinate
 from fonc_airport_rating import airport_rating
 from fonc_airline_rating import airline_rating
 from fonc_weather import weather_dep_temp, weather_dep_vis, weather_dep_wind, weather_dep_rain
-from fonc_weather import weather_arr_temp, weather_arr_vis, weather_arr_wind, weather_arr_rain
+from fonc_weather import weather_arr_temp, weather_arr_vis, weather_arr_wind, weather_arr_rain, openmeteo_session
+from fonc_weather import share_openmeteo_quotas
 from fonc_prev_delay import prev_delay
+from fonc_negative_cache import get_negative_cache, set_negative_cache, NegativeCache, OUTCOME_NO_DATA, OUTCOME_NOT_FOUND
+from fonc_archive import RawArchive
+from fonc_dataset_index import DatasetIndex, key_hashes
+from fonc_run_journal import RunJournal, JOURNAL_PATH, STATE_SCRAPED, STATE_ENRICHED, STATE_WRITTEN, STATE_SKIPPED
+from fonc_http import configure_http, configure_http_from_env, http_session, pause, set_reference_time, MODE_RECORD, MODE_OFFLINE
+from fonc_stages import Stage, StagedPipeline
+from fonc_leases import LeaseTable, LEASE_DB_PATH, LEASE_BATCH_SIZE, LEASE_TTL_SECONDS, partition_path
+from fonc_dataset_sink import CsvSink, ParquetSink, SINK_DIR, SINK_PARQUET, SINK_CSV, select_versions, import_csv_once
+from fonc_scheduler import CodeScheduler, SCHEDULE_PATH
+from fonc_telemetry import Telemetry, get_telemetry, set_telemetry, METRICS_PATH, METRICS_INTERVAL_SECONDS
+from fonc_planner import plan_run, print_plan
 
 
 
@@ -47,14 +61,18 @@ This file is main.py of the ETL pipeline. Its purpose is to collect and consolid
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# TRANSIENT : Scraping failure to try again (network error, 429, 5xx), neither cached nor journaled as skipped
+FAILURE_TRANSIENT = "transient"
+
 
 #=====================================================================
 # SCRAPING FUNCTIONS
 #=====================================================================
 
 class SimpleFlightScraper:
-    def __init__(self):
-        self.session = requests.Session()
+    def __init__(self, negative_cache=None):
+        self.session = http_session(requests.Session())
+        self.negative_cache = negative_cache if negative_cache is not None else get_negative_cache()
         # Headers to look like a browser
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -66,13 +84,27 @@ class SimpleFlightScraper:
         })
 
     
-    def scrape_flight_data(self, url):
+    def scrape_flight_data(self, url, check_negative_cache=True):
         """
         Try to scrap flight data with requests/BeautifulSoup
+        (check_negative_cache False when the caller already looked the URL up : one lookup counted per fetch)
         """
+        # FAILURE : Kind of the last failure (definitive outcome of the negative cache, or transient)
+        self.failure = None
+
+        # NEGATIVE CACHE : URL without data recently, no new fetch before the TTL expires
+        outcome = self.negative_cache.lookup(url) if check_negative_cache else None
+        if outcome:
+            logger.info(f"Page ignorée (échec récent '{outcome}' en cache): {url}")
+            self.failure = outcome
+            return None
+
         try:
             logger.info(f"Récupération de la page: {url}")
             response = self.session.get(url, timeout=10)
+            if response.status_code in (404, 410):
+                self.negative_cache.record_failure(url, OUTCOME_NOT_FOUND)
+                self.failure = OUTCOME_NOT_FOUND
             response.raise_for_status()
             
             soup = BeautifulSoup(response.content, 'html.parser')
@@ -98,10 +130,14 @@ class SimpleFlightScraper:
                 return self._extract_from_elements(flight_elements)
             
             logger.warning("Aucune donnée trouvée avec BeautifulSoup")
+            self.negative_cache.record_failure(url, OUTCOME_NO_DATA)
+            self.failure = OUTCOME_NO_DATA
             return None
             
         except Exception as e:
             logger.error(f"Erreur lors du scraping simple: {e}")
+            # TRANSIENT : Network error, 429, 5xx... (not cached, the code is tried again)
+            self.failure = self.failure or FAILURE_TRANSIENT
             return None
     
     def _extract_from_tables(self, tables):
@@ -208,277 +244,753 @@ class SimpleFlightScraper:
         return None
     
 #=====================================================================
-# MAIN (Pipeline ETL execution)
+# CONFIGURATION DATASET
 #=====================================================================
 
+# FILE : Dataset of the collection (append mode, header already written)
+DATASET_PATH = "Flight-delay_dataset-save.csv"
 
-def main():
-    """Main to test different methods"""
+# FILE : Dataset rebuilt from the raw archive (re-process mode)
+REBUILD_PATH = "Flight-delay_dataset-rebuild.csv"
 
-    
-    # CSV LOADING : Flight code list 
-    df_flight_codes_list=pd.read_csv('Data/Flight-delay_flight-code.csv', sep=";")
+# SOURCE : Flight history page of a flight code on Flightradar24
+FLIGHT_URL_PREFIX = "https://www.flightradar24.com/data/flights/"
+
+# COLUMNS ORDER DEFINITION
+COLUMNS_ORDER = ["ds_flight_code","ds_airline_code","ds_airline_rating","ds_flight_date","ds_flight_aircraft","ds_departure_airport","ds_arrival_airport","ds_departure_airport_code",
+                "ds_arrival_airport_code","ds_flight_duration","ds_departure_plan","ds_departure_real","ds_arrival_plan","ds_arrival_real",
+                "ds_departure_airport_rating","ds_arrival_airport_rating","ds_departure_airport_lat","ds_departure_airport_long",
+                "ds_arrival_airport_lat","ds_arrival_airport_long","ds_departure_airport_temp_cel","ds_departure_airport_rain_mmHour",
+                "ds_departure_airport_wind_kmh","ds_departure_airport_vis_km","ds_arrival_airport_temp_cel","ds_arrival_airport_rain_mmHour",
+                "ds_arrival_airport_wind_kmh","ds_arrival_airport_vis_km","ds_flight_status","ds_prev_delay_min","ds_final_delay_min"]
+
+_reference_data = None
+
+
+def load_reference_data():
+    """Load once the internal csv (airports coordinates, airports and airlines ratings)"""
+    global _reference_data
+    if _reference_data is None:
+        _reference_data = {
+            "airport_coord": pd.read_csv("Data/Flight-delay_airports-general-data.csv"),
+            "airport_rating": pd.read_csv("Data/Flight-delay_airports-ratings.csv", encoding="latin-1", sep=";"),
+            "airline_rating": pd.read_csv("Data/Flight-delay_airlines-ratings.csv", encoding="latin-1", sep=";"),
+        }
+    return _reference_data
 
-    # FLIGHT CODE COLUMN EXTRACT
-    df_flight_code = df_flight_codes_list["flight_code"].dropna().tolist() # Without NAN
 
-    # MAIN LOOP : To inject flight code to access to flight data on fligthradar24 website
-    scraper_log = SimpleFlightScraper()
+#=====================================================================
+# PIPELINE STEPS
+#=====================================================================
+
+def scrape_flight_code(code, check_negative_cache=True):
+    """
+    PURPOSE :
+        EXTRACT 1 : Extraction of main data flight * from Flightradar24
+        Main data flight * : Departure/arrival airports,hours scheduled/real, airline code, aircraft registration code
+    ARGS:
+        code (str) : Flight code
+        check_negative_cache (bool) : Look the page up in the negative cache (False if the caller already did)
+    RETURNS:
+        tuple: (Raw rows of the flight history page or None, kind of failure : OUTCOME_NO_DATA, OUTCOME_NOT_FOUND,
+               FAILURE_TRANSIENT or None if data)
+    """
+    # SCRAPING SOURCE : Injection of the flight code in the following url for data extraction
+    url = f"{FLIGHT_URL_PREFIX}{code}"
+
+    print("=== Tentative avec l'approche simple (requests/BeautifulSoup) ===")
+    simple_scraper = SimpleFlightScraper()
+    simple_data = simple_scraper.scrape_flight_data(url, check_negative_cache)
+    pause(3, 7) # Break to avoid blocking or error 429
+    if simple_data:
+        return simple_data, None
+    return None, simple_scraper.failure or OUTCOME_NO_DATA
+
+
+def transform_flight_data(simple_data, code):
+    """
+    PURPOSE :
+        TRANSFORM 1 & 2 : Dataframe creation, main transformation and formatting of the scraped rows
+    ARGS:
+        simple_data (list) : Raw rows of the flight history page
+        code (str) : Flight code
+    RETURNS:
+        df: Landed flights of the page, with the columns of the dataset
+    """
+    #--------------------
+    # TRANSFORM 1 : Dataframe creation
+    #--------------------
+    df_data_prov = pd.DataFrame(simple_data)
+
+
+    #--------------------
+    # TRANSFORM 2 : Dataframe main transformation and formatting
+    #--------------------
+
+    # TRANSFORM 2a: Useless columns removing 
+    columns_to_remove = ['FLIGHTS HISTORY','', 'Colonne_1', 'Colonne_2','Colonne_3'] 
+    df_data_prov = df_data_prov.drop(columns=columns_to_remove, errors='ignore')
+
+    # TRANSFORM 2b : Useless rows removing (Scheduled flight wituout data)
+    df_data_prov = df_data_prov[df_data_prov['STATUS'].str.contains('Landed|Diverted', na=False)]
+    df_data_prov = df_data_prov[df_data_prov['FLIGHT TIME'] != '—']
+
+    # TRANSFORM 2c : Existing columns renaming
+    df_data_prov = df_data_prov.rename(columns={'FROM': 'ds_departure_airport'})
+    df_data_prov = df_data_prov.rename(columns={'TO': 'ds_arrival_airport'})
+    df_data_prov = df_data_prov.rename(columns={'STD': 'ds_departure_plan'})
+    df_data_prov = df_data_prov.rename(columns={'STA': 'ds_arrival_plan'})
+    df_data_prov = df_data_prov.rename(columns={'ATD': 'ds_departure_real'})
+    df_data_prov = df_data_prov.rename(columns={'STATUS': 'ds_flight_status'})
+    df_data_prov = df_data_prov.rename(columns={'FLIGHT TIME': 'ds_flight_duration'})
+    df_data_prov = df_data_prov.rename(columns={'DATE': 'ds_flight_date'})
+    df_data_prov = df_data_prov.rename(columns={'AIRCRAFT': 'ds_flight_aircraft'})
+
+    # TRANSFORM 2d : Spliting names and codes of departure & arrivals airports
+    # Columns creation for airport codes (copy to then split)
+    df_data_prov['ds_departure_airport_code']=df_data_prov["ds_departure_airport"]
+    df_data_prov['ds_arrival_airport_code']=df_data_prov["ds_arrival_airport"]
+    # Extraction of airports codes aeroport
+    df_data_prov['ds_departure_airport_code'] = df_data_prov['ds_departure_airport_code'].str.strip()
+    df_data_prov['ds_departure_airport_code'] = df_data_prov['ds_departure_airport_code'].str.extract(r'\((.*?)\)')
+    df_data_prov['ds_arrival_airport_code'] = df_data_prov['ds_arrival_airport_code'].str.strip()
+    df_data_prov['ds_arrival_airport_code'] = df_data_prov['ds_arrival_airport_code'].str.extract(r'\((.*?)\)')
+    # Extraction of airports cities names 
+    df_data_prov['ds_departure_airport'] = df_data_prov['ds_departure_airport'].str.strip()
+    df_data_prov['ds_departure_airport'] = df_data_prov['ds_departure_airport'].str.split('(').str[0] 
+    df_data_prov['ds_arrival_airport'] = df_data_prov['ds_arrival_airport'].str.strip()
+    df_data_prov['ds_arrival_airport'] = df_data_prov['ds_arrival_airport'].str.split('(').str[0] 
+
+    # TRANSOFORM 2e : Splitting of plane type and plane registration data
+    df_data_prov['ds_flight_aircraft'] = df_data_prov['ds_flight_aircraft'].str.strip()
+    df_data_prov['ds_flight_aircraft'] = df_data_prov['ds_flight_aircraft'].str.extract(r'\((.*?)\)')
+
+    # TRANSFORM 2f : Splitting status and langing time data
+    df_data_prov['ds_arrival_real'] = df_data_prov['ds_flight_status']
+    df_data_prov['ds_arrival_real'] = df_data_prov['ds_arrival_real'].str.strip() # Removing spaces before and after
+    df_data_prov['ds_arrival_real'] = df_data_prov['ds_arrival_real'].str.extract(r'(\d{2}:\d{2})') # Using regex expression reguliere
+    df_data_prov['ds_flight_status'] = df_data_prov['ds_flight_status'].str.strip()
+    df_data_prov['ds_flight_status'] = df_data_prov['ds_flight_status'].str.split(' ').str[0] # Keep first word
+
+    # TRANSFORM 2g: Date format processing (conversion type str)
+    df_data_prov["ds_flight_date"] = pd.to_datetime(df_data_prov["ds_flight_date"], format="%d %b %Y")
+    df_data_prov["ds_flight_date"] = df_data_prov["ds_flight_date"].dt.strftime("%d/%m/%y") # Data format update en dd/mm/yy
+    df_data_prov['ds_flight_date'] = df_data_prov['ds_flight_date'].astype("string")
+
+    # TRANSOFM 2h : Creation of other new columns for next data extractions
+    df_data_prov['ds_airline_rating']=np.nan
+    df_data_prov['ds_final_delay_min']=np.nan
+    df_data_prov['ds_arrival_airport_lat']=np.nan
+    df_data_prov['ds_arrival_airport_long']=np.nan
+    df_data_prov['ds_departure_airport_lat']=np.nan
+    df_data_prov['ds_departure_airport_long']=np.nan
+    df_data_prov['ds_departure_airport_rating']=np.nan
+    df_data_prov['ds_arrival_airport_rating']=np.nan
+    df_data_prov['ds_departure_airport_temp_cel']=np.nan
+    df_data_prov['ds_departure_airport_rain_mmHour']=np.nan
+    df_data_prov['ds_departure_airport_wind_kmh']=np.nan
+    df_data_prov['ds_departure_airport_vis_km']=np.nan
+    df_data_prov['ds_arrival_airport_temp_cel']=np.nan
+    df_data_prov['ds_arrival_airport_rain_mmHour']=np.nan
+    df_data_prov['ds_arrival_airport_wind_kmh']=np.nan
+    df_data_prov['ds_arrival_airport_vis_km']=np.nan
+    df_data_prov['ds_prev_delay_min']=np.nan
+
+    # TRANSOFM 2i : Upper letters
+    df_data_prov['ds_flight_code']=code.upper()
+
+    return df_data_prov
+
+
+def enrich_flight_data(df_data_prov):
+    """
+    PURPOSE :
+        TRANSFORM 3 & 4, EXTRACT 2 to 5 : Delays calculation and enrichment (coordinates, ratings, weather)
+    ARGS:
+        df_data_prov (df) : Landed flights of the page
+    RETURNS:
+        df: Flights enriched, with the columns in the order of the dataset
+    """
+    telemetry = get_telemetry()
+
+    #--------------------
+    # TRANSFORM 3 : Final flight delay calculation (for each flight listed)
+    #--------------------     
+    with telemetry.stage("parse"):
+        df_data_prov['ds_final_delay_min'] = df_data_prov.apply(lambda row: delay(row['ds_flight_date'],
+                                                                        row['ds_departure_plan'],
+                                                                        row['ds_departure_real'],
+                                                                        row['ds_flight_duration'],
+                                                                        row['ds_arrival_plan']),axis=1)
     
 
-    for code in df_flight_code:
+    #--------------------
+    # TRANSFORM 4 : Previous flight delay calculation (for each flight listed)
+    #--------------------   
+    with telemetry.stage("prev_delay"):
+        pause(6, 9) # Break to avoid blocking or error 429
+        df_data_prov['ds_prev_delay_min'] = df_data_prov.apply(lambda row: prev_delay(row['ds_flight_aircraft'],
+                                                                        row['ds_flight_date'],
+                                                                        row['ds_departure_airport_code'],
+                                                                        row['ds_flight_code'],
+                                                                        row['ds_flight_duration']),axis=1)
+    
 
-        try:
+    #--------------------
+    # EXTRACT 2 : Extraction of airports coordinates (from csv)
+    #--------------------     
+    # CSV LOADING :  Airports coordinates, ratings of airports and airlines (loaded once)
+    reference_data = load_reference_data()
+    # DATASET ENRICHMENT : For arrival and departure airports 
+    with telemetry.stage("reference_joins"):
+        df_data_prov = airport_coordinate(df_data_prov, reference_data["airport_coord"])  
+
+
+    #--------------------
+    # EXTRACT 3 : Extraction of airports poncutality rating (from csv)
+    #--------------------    
+    with telemetry.stage("reference_joins"):
+        df_data_prov = airport_rating(df_data_prov, reference_data["airport_rating"])
+
+
+    #--------------------
+    # EXTRACT 4 : Extraction of airlines poncutality rating (from csv)
+    #--------------------    
+    with telemetry.stage("reference_joins"):
+        df_data_prov = airline_rating(df_data_prov, reference_data["airline_rating"])
+
+
+    #--------------------
+    # EXTRACT 5 : Extraction of airports weather data (from api) ==> Linked to latitude & longitude airports extraction (TRANSFORM 5)
+    # (no fixed break : the calls are paced by the Open-Meteo quotas, the identical requests answered from memory)
+    #--------------------  
+    with telemetry.stage("weather"):
+        df_data_prov['ds_departure_airport_temp_cel'] = df_data_prov.apply(lambda row: weather_dep_temp(row['ds_flight_date'],
+                                                                        row['ds_departure_plan'],
+                                                                        row['ds_departure_airport_lat'],
+                                                                        row['ds_departure_airport_long']),axis=1)
+
+        df_data_prov['ds_departure_airport_vis_km'] = df_data_prov.apply(lambda row: weather_dep_vis(row['ds_flight_date'],
+                                                                        row['ds_departure_plan'],
+                                                                        row['ds_departure_airport_lat'],
+                                                                        row['ds_departure_airport_long']),axis=1)
+
+        df_data_prov['ds_departure_airport_wind_kmh'] = df_data_prov.apply(lambda row: weather_dep_wind(row['ds_flight_date'],
+                                                                        row['ds_departure_plan'],
+                                                                        row['ds_departure_airport_lat'],
+                                                                        row['ds_departure_airport_long']),axis=1)
+
+        df_data_prov['ds_departure_airport_rain_mmHour'] = df_data_prov.apply(lambda row: weather_dep_rain(row['ds_flight_date'],
+                                                                        row['ds_departure_plan'],
+                                                                        row['ds_departure_airport_lat'],
+                                                                        row['ds_departure_airport_long']),axis=1)
+
+        df_data_prov['ds_arrival_airport_temp_cel'] = df_data_prov.apply(lambda row: weather_arr_temp(row['ds_flight_date'],
+                                                                        row['ds_arrival_plan'],
+                                                                        row['ds_arrival_airport_lat'],
+                                                                        row['ds_arrival_airport_long']),axis=1)
+
+        df_data_prov['ds_arrival_airport_vis_km'] = df_data_prov.apply(lambda row: weather_arr_vis(row['ds_flight_date'],
+                                                                        row['ds_arrival_plan'],
+                                                                        row['ds_arrival_airport_lat'],
+                                                                        row['ds_arrival_airport_long']),axis=1)
+
+        df_data_prov['ds_arrival_airport_wind_kmh'] = df_data_prov.apply(lambda row: weather_arr_wind(row['ds_flight_date'],
+                                                                        row['ds_arrival_plan'],
+                                                                        row['ds_arrival_airport_lat'],
+                                                                        row['ds_arrival_airport_long']),axis=1)
+
+        df_data_prov['ds_arrival_airport_rain_mmHour'] = df_data_prov.apply(lambda row: weather_arr_rain(row['ds_flight_date'],
+                                                                        row['ds_arrival_plan'],
+                                                                        row['ds_arrival_airport_lat'],
+                                                                        row['ds_arrival_airport_long']),axis=1)
+
+    # COLUMNS ORDER APPLICATION  
+    return df_data_prov[COLUMNS_ORDER]
+
+
+def open_sink(kind=SINK_PARQUET, writer_id=None):
+    """
+    PURPOSE :
+        LOAD : Dataset of the collection, or output partition of a worker in distributed mode
+    ARGS:
+        kind (str) : "parquet" (partitioned Parquet dataset) or "csv" (append-CSV)
+        writer_id (str) : Worker writing in the dataset (None for a single collection)
+    RETURNS:
+        ParquetSink or CsvSink
+    """
+    if kind == SINK_CSV:
+        return CsvSink(partition_path(DATASET_PATH, writer_id) if writer_id else DATASET_PATH, COLUMNS_ORDER)
+    return ParquetSink(SINK_DIR, COLUMNS_ORDER, writer_id or "main")
+
+
+def dataset_rows(kind=SINK_PARQUET):
+    """Number of flights of the dataset, read only (0 if it does not exist yet : nothing created)"""
+    if kind == SINK_CSV:
+        if not os.path.exists(DATASET_PATH):
+            return 0
+        with open(DATASET_PATH, "rb") as f:
+            return max(0, sum(1 for _ in f) - 1)
+    if not os.path.isdir(SINK_DIR):
+        return 0
+    return ParquetSink(SINK_DIR, COLUMNS_ORDER, read_only=True).rows
+
+
+def import_legacy_datasets():
+    """
+    PURPOSE :
+        MIGRATION : Append-CSV datasets of the previous runs (collection and output partitions of the workers)
+        imported once in the Parquet dataset, so the flights they hold are not collected again
+    RETURNS:
+        int: Number of rows imported by this call
+    """
+    stem, ext = os.path.splitext(DATASET_PATH)
+    num_rows = 0
+    for path in [DATASET_PATH] + sorted(glob.glob(f"{stem}_*{ext}")):
+        imported = import_csv_once(path, SINK_DIR, COLUMNS_ORDER)
+        if imported:
+            print(f"📥 {imported} vols importés de {path} dans {SINK_DIR}/")
+        num_rows += imported
+    return num_rows
+
+
+def prepare_flight_code(code, dataset_index=None, journal=None, check_negative_cache=True):
+    """
+    PURPOSE :
+        Scraping and transformation of a flight code (or batch reused from the journal), before the enrichment
+    ARGS:
+        code (str) : Flight code
+        dataset_index (DatasetIndex) : Flights already collected, filtered out before the enrichment (optional)
+        journal (RunJournal) : Checkpoints of the pass, to reuse the batches persisted before a crash (optional)
+        check_negative_cache (bool) : Look the page up in the negative cache (False if the caller already did)
+    RETURNS:
+        tuple: (New flights of the page, state of the batch), or (None, kind of failure) if the scraping did not work :
+               OUTCOME_NO_DATA / OUTCOME_NOT_FOUND (definitive) or FAILURE_TRANSIENT (to try again)
+    """
+    state = journal.state(code) if journal is not None else None
+
+    # RESUME : Batch already enriched before the interruption (only the writing is missing)
+    if state == STATE_ENRICHED:
+        df_data_prov = journal.load_batch(code)
+        return (dataset_index.filter_new(df_data_prov) if dataset_index is not None else df_data_prov), STATE_ENRICHED
+
+    # RESUME : Batch already scraped before the interruption (no new fetch of the page)
+    if state == STATE_SCRAPED:
+        return journal.load_batch(code), STATE_SCRAPED
+
+    telemetry = get_telemetry()
+    with telemetry.stage("scrape"):
+        simple_data, failure = scrape_flight_code(code, check_negative_cache)
+    if failure:
+        return None, failure
+    with telemetry.stage("parse"):
+        df_data_prov = transform_flight_data(simple_data, code)
+
+    # INCREMENTAL : Only the flights not collected yet cost previous delay scraping and weather calls
+    if dataset_index is not None:
+        df_data_prov = dataset_index.filter_new(df_data_prov)
+    if journal is not None:
+        journal.mark(code, STATE_SCRAPED, df_data_prov, rows=len(df_data_prov))
+    return df_data_prov, STATE_SCRAPED
+
+
+def complete_flight_code(code, df_data_prov, state, journal=None):
+    """
+    PURPOSE :
+        Enrichment of the batch of a flight code (nothing to do for a batch already enriched)
+    ARGS:
+        code (str) : Flight code
+        df_data_prov (df) : New flights of the page
+        state (str) : State of the batch (scraped or enriched)
+        journal (RunJournal) : Checkpoints of the pass (optional)
+    RETURNS:
+        df: New flights enriched (empty if all already collected)
+    """
+    if state == STATE_ENRICHED:
+        return df_data_prov
+    if df_data_prov.empty:
+        return df_data_prov.reindex(columns=COLUMNS_ORDER)
+    df_data_prov = enrich_flight_data(df_data_prov)
+    if journal is not None:
+        journal.mark(code, STATE_ENRICHED, df_data_prov, rows=len(df_data_prov))
+    return df_data_prov
+
+
+def process_flight_code(code, dataset_index=None, journal=None):
+    """
+    PURPOSE :
+        Complete pipeline (extract, transform, enrichment) of a flight code
+    ARGS:
+        code (str) : Flight code
+        dataset_index (DatasetIndex) : Flights already collected, filtered out before the enrichment (optional)
+        journal (RunJournal) : Checkpoints of the pass, to reuse the batches persisted before a crash (optional)
+    RETURNS:
+        df: New flights enriched (empty if all already collected) or None if the scraping did not work
+    """
+    df_data_prov, state = prepare_flight_code(code, dataset_index, journal)
+    if df_data_prov is None:
+        return None
+    return complete_flight_code(code, df_data_prov, state, journal)
 
-            #--------------------
-            # EXTRACT 1 : Initialisation of the data scraping, and extraction of main data flight * (for each new loop)
-            # Main data flight * : Departure/arrival airports,hours scheduled/real, airline code, aircraft registration code
-            #--------------------
-            
-            # SCRAPING SOURCE : Injection of the flight code in the following url for data extraction
-            url = f"https://www.flightradar24.com/data/flights/{code}"
-        
-            print("=== Tentative avec l'approche simple (requests/BeautifulSoup) ===")
-            simple_scraper = SimpleFlightScraper()
-            simple_data = simple_scraper.scrape_flight_data(url)
-            time.sleep(random.uniform(3, 7)) # Break to avoid blocking or error 429
-
-
-
-            if simple_data:
-                #--------------------
-                # TRANSFORM 1 : Dataframe creation
-                #--------------------
-                df_data_prov = pd.DataFrame(simple_data)
-
-
-                #--------------------
-                # TRANSFORM 2 : Dataframe main transformation and formatting
-                #--------------------
-
-                # TRANSFORM 2a: Useless columns removing 
-                columns_to_remove = ['FLIGHTS HISTORY','', 'Colonne_1', 'Colonne_2','Colonne_3'] 
-                df_data_prov = df_data_prov.drop(columns=columns_to_remove, errors='ignore')
-
-                # TRANSFORM 2b : Useless rows removing (Scheduled flight wituout data)
-                df_data_prov = df_data_prov[df_data_prov['STATUS'].str.contains('Landed|Diverted', na=False)]
-                df_data_prov = df_data_prov[df_data_prov['FLIGHT TIME'] != '—']
-
-                # TRANSFORM 2c : Existing columns renaming
-                df_data_prov = df_data_prov.rename(columns={'FROM': 'ds_departure_airport'})
-                df_data_prov = df_data_prov.rename(columns={'TO': 'ds_arrival_airport'})
-                df_data_prov = df_data_prov.rename(columns={'STD': 'ds_departure_plan'})
-                df_data_prov = df_data_prov.rename(columns={'STA': 'ds_arrival_plan'})
-                df_data_prov = df_data_prov.rename(columns={'ATD': 'ds_departure_real'})
-                df_data_prov = df_data_prov.rename(columns={'STATUS': 'ds_flight_status'})
-                df_data_prov = df_data_prov.rename(columns={'FLIGHT TIME': 'ds_flight_duration'})
-                df_data_prov = df_data_prov.rename(columns={'DATE': 'ds_flight_date'})
-                df_data_prov = df_data_prov.rename(columns={'AIRCRAFT': 'ds_flight_aircraft'})
-
-                # TRANSFORM 2d : Spliting names and codes of departure & arrivals airports
-                # Columns creation for airport codes (copy to then split)
-                df_data_prov['ds_departure_airport_code']=df_data_prov["ds_departure_airport"]
-                df_data_prov['ds_arrival_airport_code']=df_data_prov["ds_arrival_airport"]
-                # Extraction of airports codes aeroport
-                df_data_prov['ds_departure_airport_code'] = df_data_prov['ds_departure_airport_code'].str.strip()
-                df_data_prov['ds_departure_airport_code'] = df_data_prov['ds_departure_airport_code'].str.extract(r'\((.*?)\)')
-                df_data_prov['ds_arrival_airport_code'] = df_data_prov['ds_arrival_airport_code'].str.strip()
-                df_data_prov['ds_arrival_airport_code'] = df_data_prov['ds_arrival_airport_code'].str.extract(r'\((.*?)\)')
-                # Extraction of airports cities names 
-                df_data_prov['ds_departure_airport'] = df_data_prov['ds_departure_airport'].str.strip()
-                df_data_prov['ds_departure_airport'] = df_data_prov['ds_departure_airport'].str.split('(').str[0] 
-                df_data_prov['ds_arrival_airport'] = df_data_prov['ds_arrival_airport'].str.strip()
-                df_data_prov['ds_arrival_airport'] = df_data_prov['ds_arrival_airport'].str.split('(').str[0] 
-
-                # TRANSOFORM 2e : Splitting of plane type and plane registration data
-                df_data_prov['ds_flight_aircraft'] = df_data_prov['ds_flight_aircraft'].str.strip()
-                df_data_prov['ds_flight_aircraft'] = df_data_prov['ds_flight_aircraft'].str.extract(r'\((.*?)\)')
-
-                # TRANSFORM 2f : Splitting status and langing time data
-                df_data_prov['ds_arrival_real'] = df_data_prov['ds_flight_status']
-                df_data_prov['ds_arrival_real'] = df_data_prov['ds_arrival_real'].str.strip() # Removing spaces before and after
-                df_data_prov['ds_arrival_real'] = df_data_prov['ds_arrival_real'].str.extract(r'(\d{2}:\d{2})') # Using regex expression reguliere
-                df_data_prov['ds_flight_status'] = df_data_prov['ds_flight_status'].str.strip()
-                df_data_prov['ds_flight_status'] = df_data_prov['ds_flight_status'].str.split(' ').str[0] # Keep first word
-            
-                # TRANSFORM 2g: Date format processing (conversion type str)
-                df_data_prov["ds_flight_date"] = pd.to_datetime(df_data_prov["ds_flight_date"], format="%d %b %Y")
-                df_data_prov["ds_flight_date"] = df_data_prov["ds_flight_date"].dt.strftime("%d/%m/%y") # Data format update en dd/mm/yy
-                df_data_prov['ds_flight_date'] = df_data_prov['ds_flight_date'].astype("string")
-
-                # TRANSOFM 2h : Creation of other new columns for next data extractions
-                df_data_prov['ds_airline_rating']=np.nan
-                df_data_prov['ds_final_delay_min']=np.nan
-                df_data_prov['ds_arrival_airport_lat']=np.nan
-                df_data_prov['ds_arrival_airport_long']=np.nan
-                df_data_prov['ds_departure_airport_lat']=np.nan
-                df_data_prov['ds_departure_airport_long']=np.nan
-                df_data_prov['ds_departure_airport_rating']=np.nan
-                df_data_prov['ds_arrival_airport_rating']=np.nan
-                df_data_prov['ds_departure_airport_temp_cel']=np.nan
-                df_data_prov['ds_departure_airport_rain_mmHour']=np.nan
-                df_data_prov['ds_departure_airport_wind_kmh']=np.nan
-                df_data_prov['ds_departure_airport_vis_km']=np.nan
-                df_data_prov['ds_arrival_airport_temp_cel']=np.nan
-                df_data_prov['ds_arrival_airport_rain_mmHour']=np.nan
-                df_data_prov['ds_arrival_airport_wind_kmh']=np.nan
-                df_data_prov['ds_arrival_airport_vis_km']=np.nan
-                df_data_prov['ds_prev_delay_min']=np.nan
-
-                # TRANSOFM 2i : Upper letters
-                df_data_prov['ds_flight_code']=code.upper()
-
-
-                #--------------------
-                # TRANSFORM 3 : Final flight delay calculation (for each flight listed)
-                #--------------------     
-                df_data_prov['ds_final_delay_min'] = df_data_prov.apply(lambda row: delay(row['ds_flight_date'],
-                                                                                row['ds_departure_plan'],
-                                                                                row['ds_departure_real'],
-                                                                                row['ds_flight_duration'],
-                                                                                row['ds_arrival_plan']),axis=1)
-                
-
-                #--------------------
-                # TRANSFORM 4 : Previous flight delay calculation (for each flight listed)
-                #--------------------   
-                time.sleep(random.uniform(6, 9)) # Break to avoid blocking or error 429
-                df_data_prov['ds_prev_delay_min'] = df_data_prov.apply(lambda row: prev_delay(row['ds_flight_aircraft'],
-                                                                                row['ds_flight_date'],
-                                                                                row['ds_departure_airport_code'],
-                                                                                row['ds_flight_code'],
-                                                                                row['ds_flight_duration']),axis=1)
-                
-
-                #--------------------
-                # EXTRACT 2 : Extraction of airports coordinates (from csv)
-                #--------------------     
-                # CSV LOADING :  Airports coordinates
-                airport_coord_csv = pd.read_csv("Data/Flight-delay_airports-general-data.csv") 
-                # DATASET ENRICHMENT : For arrival and departure airports 
-                df_data_prov = airport_coordinate(df_data_prov, airport_coord_csv)  
-
-
-                #--------------------
-                # EXTRACT 3 : Extraction of airports poncutality rating (from csv)
-                #--------------------    
-                airport_rating_csv = pd.read_csv("Data/Flight-delay_airports-ratings.csv", encoding="latin-1", sep=";" ) 
-                df_data_prov = airport_rating(df_data_prov, airport_rating_csv)
-
-
-                #--------------------
-                # EXTRACT 4 : Extraction of airlines poncutality rating (from csv)
-                #--------------------    
-                airline_rating_csv = pd.read_csv("Data/Flight-delay_airlines-ratings.csv", encoding="latin-1", sep=";" ) 
-                df_data_prov = airline_rating(df_data_prov, airline_rating_csv)
-
-
-                #--------------------
-                # EXTRACT 5 : Extraction of airports weather data (from api) ==> Linked to latitude & longitude airports extraction (TRANSFORM 5)
-                #--------------------  
-                time.sleep(random.uniform(3, 7)) # Break to avoid blocking or error 429
-                df_data_prov['ds_departure_airport_temp_cel'] = df_data_prov.apply(lambda row: weather_dep_temp(row['ds_flight_date'],
-                                                                                row['ds_departure_plan'],
-                                                                                row['ds_departure_airport_lat'],
-                                                                                row['ds_departure_airport_long']),axis=1)
-                
-                time.sleep(random.uniform(3, 7)) # Break to avoid blocking or error 429
-                df_data_prov['ds_departure_airport_vis_km'] = df_data_prov.apply(lambda row: weather_dep_vis(row['ds_flight_date'],
-                                                                                row['ds_departure_plan'],
-                                                                                row['ds_departure_airport_lat'],
-                                                                                row['ds_departure_airport_long']),axis=1)
-            
-                time.sleep(random.uniform(3, 7)) # Break to avoid blocking or error 429
-                df_data_prov['ds_departure_airport_wind_kmh'] = df_data_prov.apply(lambda row: weather_dep_wind(row['ds_flight_date'],
-                                                                                row['ds_departure_plan'],
-                                                                                row['ds_departure_airport_lat'],
-                                                                                row['ds_departure_airport_long']),axis=1)
-            
-                time.sleep(random.uniform(3, 7)) 
-                df_data_prov['ds_departure_airport_rain_mmHour'] = df_data_prov.apply(lambda row: weather_dep_rain(row['ds_flight_date'],
-                                                                                row['ds_departure_plan'],
-                                                                                row['ds_departure_airport_lat'],
-                                                                                row['ds_departure_airport_long']),axis=1)
-            
-                time.sleep(random.uniform(3, 7)) # Break to avoid blocking or error 429
-                df_data_prov['ds_arrival_airport_temp_cel'] = df_data_prov.apply(lambda row: weather_arr_temp(row['ds_flight_date'],
-                                                                                row['ds_arrival_plan'],
-                                                                                row['ds_arrival_airport_lat'],
-                                                                                row['ds_arrival_airport_long']),axis=1)
-            
-                time.sleep(random.uniform(3, 7))  # Break to avoid blocking or error 429
-                df_data_prov['ds_arrival_airport_vis_km'] = df_data_prov.apply(lambda row: weather_arr_vis(row['ds_flight_date'],
-                                                                                row['ds_arrival_plan'],
-                                                                                row['ds_arrival_airport_lat'],
-                                                                                row['ds_arrival_airport_long']),axis=1)
-            
-                time.sleep(random.uniform(3, 7)) # Break to avoid blocking or error 429
-                df_data_prov['ds_arrival_airport_wind_kmh'] = df_data_prov.apply(lambda row: weather_arr_wind(row['ds_flight_date'],
-                                                                                row['ds_arrival_plan'],
-                                                                                row['ds_arrival_airport_lat'],
-                                                                                row['ds_arrival_airport_long']),axis=1)
-            
-                time.sleep(random.uniform(3, 7)) # Break to avoid blocking or error 429
-                df_data_prov['ds_arrival_airport_rain_mmHour'] = df_data_prov.apply(lambda row: weather_arr_rain(row['ds_flight_date'],
-                                                                                row['ds_arrival_plan'],
-                                                                                row['ds_arrival_airport_lat'],
-                                                                                row['ds_arrival_airport_long']),axis=1)
-                
-
-                #--------------------
-                # LOAD : Local save
-                #-------------------- 
-
-                # COLUMNS ORDER DEFINITION
-                columns_order = ["ds_flight_code","ds_airline_code","ds_airline_rating","ds_flight_date","ds_flight_aircraft","ds_departure_airport","ds_arrival_airport","ds_departure_airport_code",
-                                "ds_arrival_airport_code","ds_flight_duration","ds_departure_plan","ds_departure_real","ds_arrival_plan","ds_arrival_real",
-                                "ds_departure_airport_rating","ds_arrival_airport_rating","ds_departure_airport_lat","ds_departure_airport_long",
-                                "ds_arrival_airport_lat","ds_arrival_airport_long","ds_departure_airport_temp_cel","ds_departure_airport_rain_mmHour",
-                                "ds_departure_airport_wind_kmh","ds_departure_airport_vis_km","ds_arrival_airport_temp_cel","ds_arrival_airport_rain_mmHour",
-                                "ds_arrival_airport_wind_kmh","ds_arrival_airport_vis_km","ds_flight_status","ds_prev_delay_min","ds_final_delay_min"]
-            
-                # COLUMNS ORDER APPLICATION  
-                df_data_prov = df_data_prov[columns_order]
 
-                # COPY : From df_data_prov_save
-                df_data_prov_save = df_data_prov.copy()
+#=====================================================================
+# RE-PROCESS (Dataset rebuilt from the raw archive)
+#=====================================================================
 
-                # SAVING : Final dataset conversion to csv (using append to not write on existing data, without touching columns titles)
-                df_data_prov_save.to_csv("Flight-delay_dataset-save.csv", mode='a', index=False, header=False, sep=';')
+def _init_reprocess_worker(archive_dir):
+    """Worker of the process pool : archive only (no network, no break), negative cache disabled"""
+    configure_http(MODE_OFFLINE, archive_dir)
+    set_negative_cache(NegativeCache(path=None, ttl_hours=0))
 
 
-        
+def _reprocess_entry(entry):
+    """Re-process one archived flight history page, with the "now" pinned on its fetch time"""
+    set_reference_time(entry["fetched_at"])
+    code = entry["url"][len(FLIGHT_URL_PREFIX):]
+    try:
+        return process_flight_code(code)
+    except Exception as e:
+        print(f"Erreur lors du re-traitement de {code}: {e}")
+        return None
 
-                #--------------------
-                # DATA DISPLAY
-                #--------------------  
 
-                print(f"Données extraites avec l'approche simple: {len(df_data_prov)} lignes")
-                print(df_data_prov.head())
+def reprocess_archive(archive_dir, output_path=REBUILD_PATH, workers=None):
+    """
+    PURPOSE :
+        Rebuild the dataset from the raw archive only (no network), in parallel on the CPU cores.
+        Each archived flight history page is processed again with the current transform code. A flight fetched
+        several times (retry, later pass) is kept once, with the upsert rule of the sink : the most complete
+        version, the latest fetch when equally complete.
+    ARGS:
+        archive_dir (str) : Directory of the raw archive
+        output_path (str) : Dataset rebuilt (overwritten)
+        workers (int) : Number of processes (CPU cores by default)
+    RETURNS:
+        int: Number of rows written
+    """
+    entries = RawArchive(archive_dir).entries(FLIGHT_URL_PREFIX)
+    print(f"♻️ Re-traitement de {len(entries)} pages archivées ({workers or os.cpu_count()} processus)")
+
+    # PAGES : Results in the order of the entries (fetch time)
+    frames = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_reprocess_worker, initargs=(archive_dir,)) as executor:
+        for df_data_prov in executor.map(_reprocess_entry, entries, chunksize=8):
+            if df_data_prov is not None and not df_data_prov.empty:
+                frames.append(df_data_prov)
+    df_rebuilt = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS_ORDER)
+
+    # UPSERT : One version per flight (code, date, departure airport), the most complete or the most recent
+    completeness = df_rebuilt[COLUMNS_ORDER].notna().sum(axis=1).tolist()
+    positions, _, _, dropped = select_versions(key_hashes(df_rebuilt), completeness, {})
+    df_rebuilt = df_rebuilt.iloc[positions]
+
+    # HEADER : Same columns titles as the dataset of the collection
+    df_rebuilt[COLUMNS_ORDER].to_csv(output_path, index=False, sep=';')
+
+    print(f"🌐 Nombre de lignes reconstruites dans le CSV : {len(df_rebuilt)} ({dropped} doublons ignorés)")
+    return len(df_rebuilt)
+
 
+#=====================================================================
+# MAIN (Pipeline ETL execution)
+#=====================================================================
 
-                # LOG : Row counter
-                if os.path.exists("Flight-delay_dataset-save.csv"):
-                    df_existing = pd.read_csv("Flight-delay_dataset-save.csv", sep=';')
-                    num_rows = len(df_existing)
-                else:
-                    num_rows = 0
-                
-                print(f"🌐 Nombre de lignes collectés dans le CSV : {num_rows}")
 
+def collect_codes(codes, dataset_index, journal, args, sink, scheduler=None):
+    """
+    PURPOSE :
+        Collection of a list of flight codes through the staged pipeline (scraping, enrichment, writing)
+    ARGS:
+        codes (list) : Flight codes to collect
+        dataset_index (DatasetIndex) : Flights already collected
+        journal (RunJournal) : Checkpoints of the pass
+        args (Namespace) : Command line options (workers, queues, batches)
+        sink (ParquetSink) : Dataset (or output partition of the worker) where the rows are written
+        scheduler (CodeScheduler) : State of the codes updated with the result of each scraping (optional)
+    """
+    negative_cache = get_negative_cache()
+    telemetry = get_telemetry()
+
+
+    #--------------------
+    # STAGE 1 : Scraping and transformation (Flightradar24)
+    #--------------------
+    def scrape_stage(code):
+        # JOURNAL : Code already completed in this pass
+        if journal.is_done(code):
+            return None
+
+        # NEGATIVE CACHE : Dead code recently (no data), skipped without fetch nor break
+        cached_outcome = negative_cache.lookup(f"{FLIGHT_URL_PREFIX}{code}")
+        if cached_outcome:
+            print(f"Code {code} ignoré : échec récent en cache ({cached_outcome})")
+            journal.mark(code, STATE_SKIPPED)
+            return None
+
+        # ONE LOOKUP : Outcome above already counted, not looked up again by the scraper
+        df_data_prov, state = prepare_flight_code(code, dataset_index, journal, check_negative_cache=False)
+        if df_data_prov is None:
+            # TRANSIENT : Not journaled, the code is scraped again when the pass is resumed
+            if state == FAILURE_TRANSIENT:
+                print(f"Code {code} : échec temporaire (réseau, 429...), repris à la reprise de la passe")
+                return None
+            print("L'approche simple n'a pas fonctionné. Le site utilise probablement JavaScript.")
+            print("Utilisez le script Selenium principal pour des résultats fiables.")
+            journal.mark(code, STATE_SKIPPED)
+            if scheduler is not None:
+                scheduler.record_failure(code)
+            return None
+        return code, df_data_prov, state
+
+
+    #--------------------
+    # STAGE 2 : Enrichment (previous delay, reference joins, weather)
+    #--------------------
+    def enrich_stage(item):
+        code, df_data_prov, state = item
+        return code, complete_flight_code(code, df_data_prov, state, journal)
+
+
+    #--------------------
+    # STAGE 3 : LOAD : Local save (one writer, batches of codes written at once)
+    #--------------------
+    def write_stage(batch):
+        frames = [df_data_prov for _, df_data_prov in batch if not df_data_prov.empty]
+        if frames:
+            df_batch = pd.concat(frames, ignore_index=True)
+            # UPSERT : One version per flight (code, date, departure airport), the most complete or most recent
+            with telemetry.stage("write"):
+                written = sink.write(df_batch)
+            dataset_index.add(df_batch)
+            if written["replaced"] or written["dropped"]:
+                print(f"♊ Doublons : {written['replaced']} vols remplacés, {written['dropped']} lignes ignorées")
+
+        for code, df_data_prov in batch:
+            journal.mark(code, STATE_WRITTEN, rows=len(df_data_prov))
+            telemetry.code_done(len(df_data_prov))
+            if scheduler is not None:
+                scheduler.record_success(code, len(df_data_prov))
+
+            # DATA DISPLAY
+            if df_data_prov.empty:
+                print(f"Code {code} : aucun nouveau vol depuis la dernière collecte")
             else:
-                print("L'approche simple n'a pas fonctionné. Le site utilise probablement JavaScript.")
-                print("Utilisez le script Selenium principal pour des résultats fiables.")
-            
-        except Exception as e:
-            print(f"Erreur dans la boucle for du def main(): {e}")
+                print(f"Données extraites avec l'approche simple: {len(df_data_prov)} lignes")
+                print(df_data_prov.head())
+
+        # LOG : Row counter (kept in memory by the sink)
+        if frames:
+            print(f"🌐 Nombre de lignes collectés dans le dataset : {sink.rows}")
+
+
+    # MAIN PIPELINE : Flight codes streamed through bounded queues (backpressure), the breaks of each upstream
+    # are shared by the workers so the request rates stay the same whatever the concurrency
+    pipeline = StagedPipeline(
+        [Stage("scraping", scrape_stage, args.scrape_workers, args.queue_size),
+         Stage("enrichissement", enrich_stage, args.enrich_workers, args.queue_size)],
+        write_stage,
+        write_batch=args.write_batch,
+        source_queue_size=args.queue_size,
+        report_interval=args.report_interval,
+    )
+    pipeline.run(codes)
+
+
+
+def run_lease_worker(codes, args):
+    """
+    PURPOSE :
+        Worker of a distributed collection : batches of flight codes claimed in the shared lease table until
+        the whole list is done. The rows are written in the output partition of the worker.
+    ARGS:
+        codes (list) : Flight code list
+        args (Namespace) : Command line options
+    """
+    leases = LeaseTable(args.lease_db, args.worker_id, args.lease_ttl)
+    num_batches = leases.seed(codes, args.lease_batch)
+    sink = open_sink(args.sink, leases.worker_id)
+    print(f"🧩 Worker {leases.worker_id} : {num_batches} lots dans {args.lease_db}, sortie {args.sink}")
+
+    # INDEX : Flights of the dataset and of the partition of the worker
+    dataset_index = DatasetIndex()
+    dataset_index.add_hashes(open_sink(args.sink).key_hashes())
+    dataset_index.add_hashes(sink.key_hashes())
+    get_telemetry().add_source("dataset_index", lambda: (dataset_index.hits, dataset_index.misses))
+
+    # JOURNAL : One per worker (the batches of a crashed worker are resumed by another one from its lease)
+    journal = RunJournal(partition_path(args.journal, leases.worker_id))
+
+    while True:
+        lease = leases.claim()
+        if lease is None:
+            # WAITING : Batches still leased by other workers, claimed again here if their lease expires
+            if leases.progress()["leased"] == 0:
+                break
+            time.sleep(min(60, args.lease_ttl / 3))
             continue
+
+        # TAKEN BACK : Rows already written by the crashed worker are not collected twice
+        if lease.previous_owner and lease.previous_owner != leases.worker_id:
+            print(f"♻️ Lot {lease.batch_id} repris au worker {lease.previous_owner} (bail expiré)")
+            dataset_index.add_hashes(open_sink(args.sink, lease.previous_owner).key_hashes())
+
+        print(f"📦 Lot {lease.batch_id} : {len(lease.codes)} codes")
+        with leases.hold(lease):
+            try:
+                collect_codes(lease.codes, dataset_index, journal, args, sink)
+            except BaseException:
+                leases.release(lease)
+                raise
+        leases.complete(lease)
+        print(f"✅ Lot {lease.batch_id} terminé | {leases.progress()}")
+
+    journal.complete()
+
+
+def load_flight_codes():
+    """Flight code list of the collection"""
+    # CSV LOADING : Flight code list 
+    df_flight_codes_list=pd.read_csv('Data/Flight-delay_flight-code.csv', sep=";")
+
+    # FLIGHT CODE COLUMN EXTRACT
+    df_flight_code = df_flight_codes_list["flight_code"].dropna().tolist() # Without NAN
+    return list(dict.fromkeys(df_flight_code)) # Without duplicates (one worker per code)
+
+
+def plan_collection(args):
+    """PLAN : Estimate of the run (requests, answers of the caches, wall time) from the local files only, no network call"""
+    plan = plan_run(load_flight_codes(),
+                    CodeScheduler(args.schedule),
+                    get_negative_cache(),
+                    RunJournal(args.journal),
+                    budget=args.budget,
+                    dataset_rows=dataset_rows(args.sink),
+                    metrics_path=args.metrics,
+                    flight_url_prefix=FLIGHT_URL_PREFIX,
+                    enrich_workers=args.enrich_workers)
+    print_plan(plan)
+    return plan
+
+
+def main(args):
+    """Main to test different methods"""
+
+    # HTTP MODE : From the environment (live, record or replay), or raw archive of every page and weather response fetched
+    configure_http_from_env()
+    if args.archive_dir:
+        configure_http(MODE_RECORD, args.archive_dir)
+
     
+    df_flight_code = load_flight_codes()
+
+    # TELEMETRY : Metrics of the run (JSON lines + periodic summary line)
+    telemetry = Telemetry(args.metrics, args.metrics_interval)
+    set_telemetry(telemetry)
+    telemetry.add_source("negative_cache", lambda: (get_negative_cache().hits, get_negative_cache().misses))
+    telemetry.add_source("weather_memo", lambda: (openmeteo_session().hits, openmeteo_session().misses))
+
+    # MIGRATION : Flights of the append-CSV datasets in the Parquet dataset before its index is read
+    if args.sink == SINK_PARQUET:
+        import_legacy_datasets()
+
+    # DISTRIBUTED : Batches of codes claimed in the lease table shared by several workers
+    if args.lease_db:
+        # QUOTAS : Open-Meteo limits applied to all the workers together (table next to the leases)
+        share_openmeteo_quotas(args.lease_db)
+        telemetry.start(len(df_flight_code))
+        run_lease_worker(df_flight_code, args)
+        telemetry.stop()
+        return
+
+    # INDEX : Flights already collected (flight code, flight date, departure airport)
+    sink = open_sink(args.sink)
+    dataset_index = DatasetIndex()
+    dataset_index.add_hashes(sink.key_hashes())
+    telemetry.add_source("dataset_index", lambda: (dataset_index.hits, dataset_index.misses))
+    print(f"📇 Vols déjà collectés : {len(dataset_index)} ({sink.rows} lignes)")
+
+    # JOURNAL : Checkpoints of the pass, the codes already written or skipped are not processed again after a restart
+    journal = RunJournal(args.journal)
+    if journal.count(STATE_WRITTEN) or journal.count(STATE_SKIPPED):
+        print(f"⏯️ Reprise de la passe : {journal.count(STATE_WRITTEN)} codes écrits, {journal.count(STATE_SKIPPED)} ignorés")
+
+    # SCHEDULER : Codes with the most new landed flights expected first, failing codes in backoff, within the budget
+    # (after a restart, the codes already done in the pass are skipped by the journal)
+    scheduler = CodeScheduler(args.schedule)
+    df_flight_code = scheduler.order(df_flight_code, args.budget)
+    print(f"🗓️ Codes planifiés pour cette passe : {len(df_flight_code)}")
+
+    telemetry.start(len(df_flight_code))
+    collect_codes(df_flight_code, dataset_index, journal, args, sink, scheduler)
+    telemetry.stop()
+
+    # JOURNAL : Pass completed, the next run starts from the first code
+    journal.complete()
+    
+
 
+def parse_args():
+    """Command line options of the ETL pipeline"""
+    parser = argparse.ArgumentParser(description="Pipeline ETL du dataset de retards de vols")
+    parser.add_argument("--archive-dir", default=None,
+                        help="Dossier d'archive des pages et réponses météo brutes (enregistrement pendant la collecte)")
+    parser.add_argument("--journal", default=JOURNAL_PATH,
+                        help="Journal de la passe de collecte (reprise après interruption)")
+    parser.add_argument("--plan", action="store_true",
+                        help="Estime les requêtes, les réponses des caches et la durée du run, sans appel réseau")
+    parser.add_argument("--reprocess", action="store_true",
+                        help="Reconstruit le dataset depuis l'archive seule, sans appel réseau")
+    parser.add_argument("--output", default=REBUILD_PATH,
+                        help="CSV reconstruit en mode --reprocess")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Nombre de processus en mode --reprocess (nombre de coeurs par défaut)")
+    parser.add_argument("--scrape-workers", type=int, default=1,
+                        help="Nombre de threads de l'étape de scraping")
+    parser.add_argument("--enrich-workers", type=int, default=1,
+                        help="Nombre de threads de l'étape d'enrichissement")
+    parser.add_argument("--queue-size", type=int, default=4,
+                        help="Capacité des files entre les étapes (contre-pression)")
+    parser.add_argument("--write-batch", type=int, default=10,
+                        help="Nombre maximal de codes écrits dans le CSV en une fois")
+    parser.add_argument("--report-interval", type=float, default=60,
+                        help="Période du rapport des files et de l'utilisation des étapes (secondes, 0 pour désactiver)")
+    parser.add_argument("--sink", choices=[SINK_PARQUET, SINK_CSV], default=SINK_PARQUET,
+                        help=f"Format du dataset : Parquet partitionné ({SINK_DIR}/) ou CSV en ajout ({DATASET_PATH})")
+    parser.add_argument("--export-csv", default=None,
+                        help="Exporte le dataset Parquet en CSV pour le COPY INTO de Snowflake (setup.sql), puis quitte")
+    parser.add_argument("--schedule", default=SCHEDULE_PATH,
+                        help="État des codes (dernier scraping, vols gagnés, échecs) utilisé pour choisir les codes à scraper")
+    parser.add_argument("--budget", type=int, default=None,
+                        help="Nombre maximal de codes scrapés dans la passe (tous les codes éligibles par défaut)")
+    parser.add_argument("--metrics", default=METRICS_PATH,
+                        help="Fichier JSON-lines des métriques du run (temps par étape, requêtes, caches, débit, ETA)")
+    parser.add_argument("--metrics-interval", type=float, default=METRICS_INTERVAL_SECONDS,
+                        help="Période des métriques et de la ligne de résumé (secondes)")
+    parser.add_argument("--lease-db", default=None,
+                        help=f"Table des baux partagée entre workers (SQLite, ex. {LEASE_DB_PATH}) : mode distribué")
+    parser.add_argument("--worker-id", default=None,
+                        help="Identifiant du worker en mode distribué (hôte et pid par défaut)")
+    parser.add_argument("--lease-batch", type=int, default=LEASE_BATCH_SIZE,
+                        help="Nombre de codes par lot réclamé")
+    parser.add_argument("--lease-ttl", type=float, default=LEASE_TTL_SECONDS,
+                        help="Durée d'un bail sans renouvellement avant réattribution du lot (secondes)")
+    args = parser.parse_args()
+    if args.reprocess and not args.archive_dir:
+        parser.error("--reprocess nécessite --archive-dir")
+    return args
 
 
 if __name__ == "__main__":
-    print("Dépendances requises:")
-    print("pip install requests beautifulsoup4 pandas lxml")
-    print("\n" + "="*60)
-    main()
+    args = parse_args()
+    if args.reprocess:
+        reprocess_archive(args.archive_dir, args.output, args.workers)
+    elif args.plan:
+        plan_collection(args)
+    elif args.export_csv:
+        num_rows = open_sink(SINK_PARQUET).export_csv(args.export_csv)
+        print(f"📤 {num_rows} lignes exportées dans {args.export_csv}")
+    else:
+        print("Dépendances requises:")
+        print("pip install requests beautifulsoup4 pandas lxml")
+        print("\n" + "="*60)
+        main(args)
@@ -8,6 +8,15 @@ import time
 # ==============================================================
 API_URL = "https://flight-delay-app.onrender.com/predict-flight"
 
+# Libellés des niveaux de repli historique renvoyés par l'API (status "fallback")
+FALLBACK_LEVEL_LABELS = {
+    "route": "route",
+    "departure_airport": "aéroport de départ",
+    "airline": "compagnie",
+    "arrival_airport": "aéroport d'arrivée",
+    "all": "tous les vols",
+}
+
 st.set_page_config(page_title="Prédiction Retard Vol", page_icon="✈️", layout="centered")
 
 
@@ -256,6 +265,11 @@ if st.session_state.show_results:
                             init_connexion_api_status.markdown("<p class='status-text'>✅ Connexion à l’API",unsafe_allow_html=True)
                             steps_done += 1
 
+                        elif step == "scraping_fr24" and data.get("status") == "not_found":
+                            data_scrap_status.markdown("<p class='status-text'>❌ Vol introuvable (FR24)",unsafe_allow_html=True)
+                            st.error(f"Aucune donnée trouvée pour le vol {flight_number}")
+                            break
+
                         elif step == "scraping_fr24":
                             data_scrap_status.markdown("<p class='status-text'>✅ Scraping des données de vol (FR24)",unsafe_allow_html=True)
                             steps_done += 1
@@ -324,6 +338,23 @@ if st.session_state.show_results:
                             api_prep_status.markdown("<p class='status-text'>✅ Données prêtes pour la prédiction",unsafe_allow_html=True)
                             steps_done += 1
 
+                        elif step == "prediction" and data.get("status") == "error":
+                            api_prediction_status.markdown("<p class='status-text'>❌ Prédiction impossible",unsafe_allow_html=True)
+                            st.error(f"Aucune prédiction ni historique de retard disponible pour le vol {flight_number}")
+                            break
+
+                        elif step == "prediction" and data.get("status") == "fallback":
+                            # Médiane historique (résumés du warehouse) : pas une prédiction du modèle
+                            api_prediction_status.markdown("<p class='status-text'>⚠️ Médiane historique (modèle indisponible pour ce vol)",unsafe_allow_html=True)
+                            steps_done += 1
+                            delay = data.get("predicted_delay_min", None)
+                            level = FALLBACK_LEVEL_LABELS.get(data.get("level"), data.get("level"))
+                            if delay is not None:
+                                st.warning(
+                                    f"📊 Retard médian historique : **{delay:.1f} minutes** pour le vol {flight_number} "
+                                    f"({level} {data.get('key', '')}, {data.get('n', 0)} vols) — estimation historique, pas une prédiction du modèle"
+                                )
+
                         elif step == "prediction":
                             api_prediction_status.markdown("<p class='status-text'>✅ Prédiction effectuée",unsafe_allow_html=True)
                             steps_done += 1